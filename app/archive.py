@@ -0,0 +1,249 @@
+import glob
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import config, metrics
+from .utils import pid_alive
+
+# 原始页面归档：抓到的 HTML 连同 URL、时间与响应头以 WARC/1.0 response 记录追加写入分段文件，
+# 每条记录单独压成一个 gzip member（即常见的 .warc.gz 格式，warcio 等工具可直接读取）。
+# 段写满后滚动新段，总大小超限时删除最旧的段。文件名带毫秒时间戳与 pid，
+# 多个抓取进程可写同一目录互不干扰，按文件名排序即按时间先后。
+
+_SKIP_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+_STOP = object()
+
+_WRITTEN = metrics.ARCHIVE_PAGES.labels('written')
+_DROPPED = metrics.ARCHIVE_PAGES.labels('dropped')
+_FAILED = metrics.ARCHIVE_PAGES.labels('failed')
+
+
+class ArchivedPage(NamedTuple):
+    url: str
+    date: str
+    keyword: str
+    status: int
+    headers: Dict[str, str]  # 键为小写
+    body: bytes
+    truncated: bool
+
+
+def segments(directory: Optional[str] = None) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory or config.ARCHIVE_DIR, 'pages-*.warc.gz')))
+
+
+def _segment_pid(path: str) -> Optional[int]:
+    pid = os.path.basename(path)[: -len('.warc.gz')].rsplit('-', 1)[-1]
+    return int(pid) if pid.isdigit() else None
+
+
+def build_record(url: str, keyword: str, status: int, reason: str, headers: List[Tuple[str, str]],
+                 body: bytes, truncated: bool = False) -> bytes:
+    # 正文已解压，去掉 Content-Encoding/Transfer-Encoding，按实际长度重写 Content-Length
+    http = [f"HTTP/1.1 {status} {reason}"]
+    http.extend(f"{k}: {v}" for k, v in headers if k.lower() not in _SKIP_HEADERS)
+    http.append(f"Content-Length: {len(body)}")
+    block = ("\r\n".join(http) + "\r\n\r\n").encode('utf-8', 'replace') + body
+    warc = [
+        "WARC/1.0",
+        "WARC-Type: response",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        "WARC-Date: " + time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        f"WARC-Target-URI: {url}",
+    ]
+    if truncated:
+        warc.append("WARC-Truncated: length")
+    if keyword:
+        warc.append("X-Crawler-Keyword: " + keyword.replace('\r', ' ').replace('\n', ' '))
+    warc.append("Content-Type: application/http;msgtype=response")
+    warc.append(f"Content-Length: {len(block)}")
+    return ("\r\n".join(warc) + "\r\n\r\n").encode('utf-8') + block + b"\r\n\r\n"
+
+
+def _read_headers(fp) -> Optional[List[str]]:
+    lines = []
+    while True:
+        line = fp.readline()
+        if not line:
+            return None
+        line = line.rstrip(b"\r\n")
+        if not line:
+            if lines:
+                return lines
+            continue  # 记录之间的空行
+        lines.append(line.decode('utf-8', 'replace'))
+
+
+def _header_map(lines: List[str]) -> Dict[str, str]:
+    out = {}
+    for line in lines:
+        k, _, v = line.partition(':')
+        out[k.strip().lower()] = v.strip()
+    return out
+
+
+def read_segment(path: str) -> Iterator[ArchivedPage]:
+    # 顺序读取一个段；正在写入或异常中断的段末尾可能不完整，读到残缺处即停止
+    try:
+        with gzip.open(path, 'rb') as fp:
+            while True:
+                lines = _read_headers(fp)
+                if lines is None:
+                    return
+                warc = _header_map(lines[1:])
+                length = int(warc.get('content-length') or 0)
+                block = fp.read(length)
+                if len(block) < length:
+                    return
+                if warc.get('warc-type') != 'response':
+                    continue
+                head, _, body = block.partition(b"\r\n\r\n")
+                head_lines = head.decode('utf-8', 'replace').split("\r\n")
+                parts = head_lines[0].split(' ', 2)
+                try:
+                    status = int(parts[1])
+                except (IndexError, ValueError):
+                    continue
+                yield ArchivedPage(warc.get('warc-target-uri', ''), warc.get('warc-date', ''),
+                                   warc.get('x-crawler-keyword', ''), status, _header_map(head_lines[1:]), body,
+                                   'warc-truncated' in warc)
+    except (EOFError, ValueError, zlib.error, gzip.BadGzipFile):
+        logging.debug("archive segment ends early: %s", path)
+
+
+# 写入放在专用线程：压缩与落盘不占用事件循环；队列满时丢弃该页（归档是尽力而为，不给抓取施加背压）
+class PageArchive:
+    def __init__(self, directory: Optional[str] = None, segment_bytes: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.directory = directory or config.ARCHIVE_DIR
+        self.segment_bytes = segment_bytes or config.ARCHIVE_SEGMENT_BYTES
+        self.max_bytes = max_bytes or config.ARCHIVE_MAX_BYTES
+        os.makedirs(self.directory, exist_ok=True)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=config.ARCHIVE_QUEUE_SIZE)
+        self.written = 0
+        self._fp = None
+        self._path: Optional[str] = None
+        self._size = 0
+        self._thread = threading.Thread(target=self._run, name='page-archive', daemon=True)
+        self._thread.start()
+
+    def put(self, url: str, keyword: str, status: int, reason: str, headers: List[Tuple[str, str]], body: bytes,
+            truncated: bool = False):
+        try:
+            self.queue.put_nowait((url, keyword, status, reason, headers, body, truncated))
+        except queue.Full:
+            _DROPPED.inc()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def _rotate(self):
+        if self._fp is not None:
+            self._fp.close()
+        # 同一毫秒内滚动多次时序号保证文件名不重复
+        stamp = int(time.time() * 1000)
+        while True:
+            path = os.path.join(self.directory, f"pages-{stamp:013d}-{os.getpid()}.warc.gz")
+            if not os.path.exists(path):
+                break
+            stamp += 1
+        self._fp = open(path, 'ab')
+        self._path = path
+        self._size = 0
+        self._evict()
+
+    def _evictable(self, path: str) -> bool:
+        # 只删已封段：本进程滚动过的旧段，或写入进程已退出的段；其他抓取进程正在写的段不动
+        if path == self._path:
+            return False
+        pid = _segment_pid(path)
+        return pid is None or pid == os.getpid() or not pid_alive(pid)
+
+    def _evict(self):
+        # 总大小超限时从最旧的可删段开始删
+        sizes = []
+        for path in segments(self.directory):
+            try:
+                sizes.append((path, os.path.getsize(path)))
+            except OSError:
+                pass
+        total = sum(size for _, size in sizes)
+        for path, size in sizes:
+            if total <= self.max_bytes:
+                break
+            if not self._evictable(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _write(self, item):
+        data = gzip.compress(build_record(*item), compresslevel=config.ARCHIVE_COMPRESS_LEVEL)
+        if self._fp is None or self._size >= self.segment_bytes:
+            self._rotate()
+        self._fp.write(data)
+        self._size += len(data)
+        self.written += 1
+        _WRITTEN.inc()
+        metrics.ARCHIVE_BYTES.inc(len(data))
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=1.0)
+                except queue.Empty:
+                    # 空闲时落盘，便于 reextract 读到最新内容
+                    if self._fp is not None:
+                        self._fp.flush()
+                    continue
+                if item is _STOP:
+                    return
+                try:
+                    self._write(item)
+                except Exception:
+                    logging.exception("archive write failed")
+                    _FAILED.inc()
+        finally:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+
+def reextract_segment(path: str, keyword: Optional[str] = None) -> Tuple[int, List[Dict]]:
+    # 进程池任务：对一个段内的页面重跑解析与抽取，返回 (页数, 记录)；keyword 非空时覆盖归档里的关键词
+    from .crawler import decode_html, page_records
+    from .domains import registered_domain
+    from .lang import DomainLang
+    from .parser import analyze_page
+
+    pages = 0
+    records: List[Dict] = []
+    lang_memo = DomainLang()
+    for page in read_segment(path):
+        if page.status != 200:
+            continue
+        pages += 1
+        ctype = page.headers.get('content-type', '').lower()
+        charset = ctype.split('charset=', 1)[1].split(';')[0].strip() if 'charset=' in ctype else None
+        try:
+            html = decode_html(page.body, charset, page.truncated)
+            parsed = analyze_page(html, page.url)
+        except Exception:
+            logging.debug("reextract failed: %s", page.url, exc_info=True)
+            continue
+        domain = registered_domain(page.url)
+        lang = lang_memo.resolve(domain, parsed.lang, parsed.lang_confidence)
+        records.extend(page_records(keyword or page.keyword, page.url, parsed.title, parsed.pairs, lang, domain))
+    return pages, records
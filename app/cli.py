@@ -1,39 +1,207 @@
 import argparse
 import asyncio
+import multiprocessing
 import os
 
 from . import config
-from .searchers import gather_seeds
+from .searchers import RedirectResolver, SerpCache, gather_seeds
 from .crawler import Crawler
-from .storage import get_conn, save_contact, ResultWriter, export_snapshot
+from .dedup import DedupIndex
+from .storage import get_conn, StorageWriter, export_contacts
+from .utils import create_session
 
 
 def run_start(keyword: str, demo: bool = False):
     async def main():
-        seeds = await gather_seeds(keyword)
-        if demo:
-            seeds = seeds[: min(len(seeds), 10)]
-        crawler = Crawler()
-        conn = get_conn()
-        writer = ResultWriter()
+        async with create_session() as session:
+            conn = get_conn()
+            seeds = await gather_seeds(keyword, session=session, cache=SerpCache(conn), resolver=RedirectResolver(conn))
+            if demo:
+                seeds = seeds[: min(len(seeds), 10)]
+            crawler = Crawler(conn=conn)
+            dedup = DedupIndex()
+            store = StorageWriter(on_failed=dedup.forget)
+            asyncio.get_running_loop().run_in_executor(None, dedup.warm)
+
+            async def on_record(rec: dict):
+                if not dedup.seen(rec):
+                    await store.submit(rec)
+
+            try:
+                await crawler.crawl_urls(keyword, seeds, on_record, session=session)
+            finally:
+                crawler.close()
+                store.close()
+                conn.close()
+
+    asyncio.run(main())
+
+
+def run_profile(args):
+    import cProfile
+    import json
+    import pstats
+    import sqlite3
+    import time
+
+    from . import tracing
+    from .parser import ParsePool
+    from .storage import SCHEMA, save_contacts
+    try:
+        from bench.fixture import FixtureWeb, ReplayWeb
+    except ImportError:
+        print("profile 需要在源码目录运行（依赖 bench 夹具）")
+        return
+
+    out_dir = args.out or os.path.join(config.DATA_DIR, time.strftime('profile_%Y%m%d_%H%M%S'))
+    os.makedirs(out_dir, exist_ok=True)
+    trace_name = 'trace.json' if args.trace_format == 'chrome' else 'trace.jsonl'
+    tracing.TRACER.configure(rate=args.trace_sample, fmt=args.trace_format, path=os.path.join(out_dir, trace_name))
+
+    async def main():
+        if args.corpus:
+            web = ReplayWeb.from_jsonl(args.corpus, latency=args.latency)
+        else:
+            web = FixtureWeb(sites=args.sites, pages=args.pages, page_kb=args.page_kb, latency=args.latency)
+        await web.start()
+        # 独立的状态库，不污染 data/state.sqlite；入库同步执行，便于在剖析结果中看到 storage 开销
+        conn = sqlite3.connect(os.path.join(out_dir, 'state.sqlite'))
+        conn.executescript(SCHEMA)
+        crawler = Crawler(conn=conn)
+        crawler.parser = ParsePool(workers=-1)
+        dedup = DedupIndex()
+        batch = []
+        stats = {'pages': 0, 'records': 0}
 
         async def on_record(rec: dict):
-            inserted = save_contact(conn, rec)
-            if inserted:
-                writer.write_record(rec)
+            stats['records'] += 1
+            if not dedup.seen(rec):
+                batch.append(rec)
+                if len(batch) >= config.STORAGE_BATCH_SIZE:
+                    save_contacts(conn, batch)
+                    batch.clear()
 
         try:
-            await crawler.crawl_urls(keyword, seeds, on_record)
+            async with web.session() as session:
+                await crawler.crawl_urls('profile', web.seeds(), on_record, session=session, progress=stats)
+            if batch:
+                save_contacts(conn, batch)
         finally:
-            writer.close()
+            crawler.close()
             conn.close()
+            await web.stop()
+        return stats
 
-    asyncio.run(main())
+    sampler = tracing.StackSampler(interval=args.sample_interval)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        stats = asyncio.run(main())
+    finally:
+        profiler.disable()
+        sampler.stop()
+        tracing.TRACER.close()
+    elapsed = time.perf_counter() - started
+
+    pstats_path = os.path.join(out_dir, 'profile.pstats')
+    folded_path = os.path.join(out_dir, 'profile.folded')
+    profiler.dump_stats(pstats_path)
+    sampler.write_folded(folded_path)
+    top = tracing.top_functions(pstats.Stats(profiler), limit=args.top)
+    summary = {'seconds': round(elapsed, 3), 'pages': stats['pages'], 'records': stats['records'],
+               'stack_samples': sampler.samples, 'top': top}
+    with open(os.path.join(out_dir, 'top.json'), 'w', encoding='utf-8') as fp:
+        json.dump(summary, fp, ensure_ascii=False, indent=2)
+
+    print(f"pages={stats['pages']} records={stats['records']} seconds={elapsed:.2f}")
+    for module, rows in top.items():
+        print(f"\n== {module} (按自身耗时) ==")
+        print(f"{'tottime':>9} {'cumtime':>9} {'calls':>8}  function")
+        for r in rows:
+            print(f"{r['tottime']:>9.4f} {r['cumtime']:>9.4f} {r['calls']:>8}  {r['function']}")
+    print(f"\npstats:  {pstats_path}\nfolded:  {folded_path}（flamegraph.pl / speedscope）")
+    if tracing.TRACER.written:
+        print(f"trace:   {tracing.TRACER.path}（{tracing.TRACER.written} 页）")
+
+
+def run_reextract(args):
+    import concurrent.futures
+    import time
+
+    from .archive import reextract_segment, segments
 
+    paths = segments(args.dir)
+    if not paths:
+        print(f"no archive segments in {args.dir or config.ARCHIVE_DIR}")
+        return
+    workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+    # 新抽到的记录走与在线抓取相同的路径：内存去重 -> 写后批量入库 -> 中/英文 JSONL
+    get_conn().close()  # 确保状态库与表已存在，去重索引才能从中预热
+    dedup = DedupIndex()
+    store = StorageWriter(on_failed=dedup.forget)
+    dedup.warm()
+    stats = {'segments': 0, 'pages': 0, 'records': 0}
+    started = time.perf_counter()
 
-def run_export_now():
-    path = export_snapshot()
-    print(f"snapshot exported: {path}")
+    def _consume(pages, records):
+        stats['segments'] += 1
+        stats['pages'] += pages
+        stats['records'] += len(records)
+        for rec in records:
+            if not dedup.seen(rec):
+                store.put(rec)
+        print(f"\r{stats['segments']}/{len(paths)} segments, {stats['pages']} pages", end='', flush=True)
+
+    try:
+        if workers <= 0:
+            for path in paths:
+                _consume(*reextract_segment(path, args.keyword))
+        else:
+            # 以段为单位分发给进程池，主进程只负责去重与入库
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(reextract_segment, path, args.keyword) for path in paths]
+                for fut in concurrent.futures.as_completed(futures):
+                    _consume(*fut.result())
+    finally:
+        store.close()
+    elapsed = time.perf_counter() - started
+    print(f"\npages={stats['pages']} records={stats['records']} new={store.inserted_total} "
+          f"seconds={elapsed:.1f} pages/s={stats['pages'] / max(elapsed, 1e-9):.0f}")
+
+
+def run_results(args):
+    import json
+    import time
+
+    from .results import ResultReader
+
+    def _ts(value):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            fmt = '%Y-%m-%d %H:%M:%S' if ' ' in value or 'T' in value else '%Y-%m-%d'
+            return time.mktime(time.strptime(value.replace('T', ' '), fmt))
+
+    reader = ResultReader()
+    for rec in reader.query(keyword=args.keyword, site_domain=args.domain, lang=args.lang, since=_ts(args.since),
+                            until=_ts(args.until), limit=args.limit):
+        print(json.dumps(rec, ensure_ascii=False))
+
+
+def run_export_now(args):
+    filters = {k: getattr(args, k) for k in ('keyword', 'lang', 'contact_type', 'since', 'until')}
+    result = export_contacts(incremental=args.incremental, filters=filters, compress=args.gzip)
+    print(f"snapshot exported: {result['path']} ({result['records']} records, id {result['from_id']}-{result['to_id']})")
+
+
+def _require_coord_token(parser, what: str):
+    # 协调接口会把远程回报的记录直接入库，不允许无口令开放
+    if not config.COORD_TOKEN:
+        parser.error(f"{what} 需要设置环境变量 CRAWLER_COORD_TOKEN（协调者与各 node 使用同一口令）")
 
 
 def main():
@@ -44,8 +212,22 @@ def main():
     p_start.add_argument('--keyword', required=True)
     p_start.add_argument('--demo', action='store_true')
 
-    sub.add_parser('export-now')
-    sub.add_parser('serve')
+    p_export = sub.add_parser('export-now', help='导出全部记录（--incremental 只导出上次导出之后的新记录）')
+    p_export.add_argument('--incremental', action='store_true')
+    p_export.add_argument('--gzip', action='store_true')
+    p_export.add_argument('--keyword')
+    p_export.add_argument('--lang', choices=['zh', 'en'])
+    p_export.add_argument('--contact-type')
+    p_export.add_argument('--since', help="起始时间（UTC，'YYYY-MM-DD[ HH:MM:SS]' 或 unix 时间戳）")
+    p_export.add_argument('--until', help='截止时间（不含）')
+    p_serve = sub.add_parser('serve')
+    p_serve.add_argument('--workers', type=int, default=None, help='抓取子进程数，按注册域名分片（0 为单进程）')
+    p_serve.add_argument('--coordinator', action='store_true', help='协调者模式：抓取由远程 node 领取租约完成')
+
+    p_node = sub.add_parser('node')
+    p_node.add_argument('--coordinator', required=True, help='协调者地址，如 http://10.0.0.2:8848')
+    p_node.add_argument('--concurrency', type=int, default=None)
+    p_node.add_argument('--leases', type=int, default=None)
 
     p_add = sub.add_parser('add-keyword')
     p_add.add_argument('--keyword', required=True)
@@ -53,17 +235,54 @@ def main():
     p_switch = sub.add_parser('switch-keyword')
     p_switch.add_argument('--keyword', required=True)
 
+    p_profile = sub.add_parser('profile')
+    p_profile.add_argument('--corpus', help='录制语料（JSON 行：{"url", "html"}）；不传则使用合成夹具站点')
+    p_profile.add_argument('--sites', type=int, default=30)
+    p_profile.add_argument('--pages', type=int, default=20)
+    p_profile.add_argument('--page-kb', type=int, default=8)
+    p_profile.add_argument('--latency', type=float, default=0.0)
+    p_profile.add_argument('--top', type=int, default=15)
+    p_profile.add_argument('--sample-interval', type=float, default=0.001, help='调用栈采样间隔（秒）')
+    p_profile.add_argument('--trace-sample', type=float, default=1.0, help='逐页追踪采样率')
+    p_profile.add_argument('--trace-format', choices=['jsonl', 'chrome'], default='chrome')
+    p_profile.add_argument('--out', help='输出目录（默认 data/profile_时间戳）')
+
+    p_reextract = sub.add_parser('reextract', help='对归档的原始页面重跑解析与抽取，新记录去重后入库')
+    p_reextract.add_argument('--dir', help='归档目录（默认 data/archive）')
+    p_reextract.add_argument('--keyword', help='覆盖归档中记录的关键词')
+    p_reextract.add_argument('--workers', type=int, default=None, help='解析进程数（默认 CPU 数，0 为单进程）')
+
+    p_results = sub.add_parser('results', help='按关键词/域名/时间从分段结果日志中查询记录（JSON 行输出）')
+    p_results.add_argument('--keyword')
+    p_results.add_argument('--domain')
+    p_results.add_argument('--lang', choices=['zh', 'en'])
+    p_results.add_argument('--since', help="本地时间 'YYYY-MM-DD[ HH:MM:SS]' 或 unix 时间戳")
+    p_results.add_argument('--until')
+    p_results.add_argument('--limit', type=int)
+
     sub.add_parser('pause')
     sub.add_parser('resume')
 
     args = parser.parse_args()
     if args.cmd == 'start':
         run_start(args.keyword, demo=args.demo)
+    elif args.cmd == 'profile':
+        run_profile(args)
+    elif args.cmd == 'reextract':
+        run_reextract(args)
+    elif args.cmd == 'results':
+        run_results(args)
     elif args.cmd == 'export-now':
-        run_export_now()
+        run_export_now(args)
     elif args.cmd == 'serve':
+        if args.coordinator:
+            _require_coord_token(parser, 'serve --coordinator')
         from .server import run_server
-        run_server()
+        run_server(workers=args.workers, coordinator=args.coordinator)
+    elif args.cmd == 'node':
+        _require_coord_token(parser, 'node')
+        from .coordinator import run_node
+        run_node(args.coordinator, concurrency=args.concurrency, max_leases=args.leases)
     elif args.cmd == 'add-keyword':
         import requests
         from . import config
@@ -89,4 +308,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
@@ -12,11 +12,80 @@ DEFAULT_USER_AGENTS = [
 
 REQUEST_TIMEOUT = 15
 CONNECT_TIMEOUT = 10
-PER_HOST_RATE_LIMIT = 1.0  # 每域每秒最多请求数
-GLOBAL_CONCURRENCY = 10     # 默认高强度
+PER_HOST_RATE_LIMIT = 1.0  # 每域每秒最多请求数（初始速率）
+# 自适应限速：快主机逐步提速至上限，429/503 或慢响应时退避
+RATE_LIMIT_MAX_PER_HOST = 4.0
+RATE_LIMIT_MIN_PER_HOST = 0.05
+RATE_SPEEDUP_STEP = 0.1       # 快速响应后每次提高的速率（加性）
+RATE_BACKOFF_FACTOR = 0.5     # 429/503 后速率乘数
+RATE_SLOW_FACTOR = 0.8        # 慢响应/失败后速率乘数
+RATE_FAST_LATENCY = 0.5       # 秒，低于该响应时间视为“快”
+RATE_SLOW_LATENCY = 3.0       # 秒，高于该响应时间视为“慢”
+RATE_MAX_RETRY_AFTER = 600    # Retry-After 最长遵守秒数
+DISPATCH_POLL_SEC = 1.0       # 调度器等待主机限速时，至少每隔这么久检查一次暂停状态
+RATE_LIMITER_MAX_HOSTS = 20000
+RATE_IDLE_EVICT_SEC = 600     # 主机空闲超过该秒数后回收其限速器
+GLOBAL_CONCURRENCY = 10     # 默认高强度（所有关键词共享的全局并发预算）
+KEYWORD_CONCURRENCY = 3     # 同时运行的关键词流水线数
+SEED_PREFETCH = 2           # 提前为排队中的关键词拉取种子的数量
 MAX_SEED_RESULTS_PER_ENGINE = 30  # 每个搜索源抓取前N条链接
+
+# 搜索结果页缓存：命中时不再重复抓取；前几页齐全后每轮往更深处翻
+SERP_CACHE_TTL = 24 * 60 * 60
+SERP_EMPTY_TTL = 10 * 60      # 空结果页（到底标记）只缓存这么久：可能只是临时拦截
+SERP_BLOCK_MIN_BYTES = 2048   # 无结果且短于此长度的页面视为拦截页，不缓存
+SERP_CACHE_MAX_ROWS = 50000
+SERP_BASE_PAGES = 3           # 首轮抓取的页数
+SERP_NEW_PAGES_PER_ROUND = 1  # 缓存命中后每轮新翻的页数
+SERP_MAX_PAGE = 10            # 最深翻到第几页
+
+# 百度/搜狗跳转链接解析
+REDIRECT_CONCURRENCY_PER_ENGINE = 4
+REDIRECT_CACHE_MAX = 20000    # 内存 LRU 条数（持久化在 state.sqlite，受下面两项约束）
+REDIRECT_TTL = 7 * 24 * 60 * 60  # 持久化的跳转映射有效期
+REDIRECT_MAX_ROWS = 200000    # redirects 表行数上限，随 SERP 缓存一起定期清理
+REDIRECT_SNIFF_BYTES = 8192   # 200 跳转页最多读取的字节数（查找 meta refresh）
 MAX_PAGES_PER_DOMAIN = 50
 MAX_CRAWL_DEPTH = 2
+FETCH_MAX_BYTES = 2 * 1024 * 1024  # 单页最多读取字节数，超出部分截断
+FETCH_CHUNK_SIZE = 64 * 1024       # 流式读取块大小
+
+# 共享连接池（跨种子搜索、抓取与多轮调度复用 TCP/TLS 连接）
+HTTP_POOL_LIMIT = 100           # 连接池总连接数上限
+HTTP_POOL_LIMIT_PER_HOST = 8    # 单主机连接数上限
+DNS_CACHE_TTL = 600             # DNS 缓存秒数
+KEEPALIVE_TIMEOUT = 30          # 空闲连接保活秒数
+
+# 解析进程池：0 表示在线程池内解析（不启用多进程）
+try:
+    PARSE_WORKERS = int(os.environ.get("CRAWLER_PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+except Exception:
+    PARSE_WORKERS = 1
+PARSE_BATCH_SIZE = 8        # 每次提交给进程池的页面数
+PARSE_BATCH_DELAY = 0.005   # 批次未满时最多等待秒数
+
+# 多进程抓取：serve --workers N 时按注册域名把种子分片到 N 个子进程；0 表示单进程
+try:
+    CRAWL_WORKERS = int(os.environ.get("CRAWLER_WORKERS", "0"))
+except Exception:
+    CRAWL_WORKERS = 0
+WORKER_RECORD_BATCH = 100   # 子进程回传记录的批大小
+WORKER_FLUSH_SEC = 0.2      # 批次未满时最多攒多久再回传
+WORKER_CHECK_SEC = 1.0      # 协调者检查子进程存活的间隔（与结果队列是否繁忙无关）
+WORKER_JOB_RETRIES = 1      # 子进程崩溃时，分给它的任务重新下发的次数；用完即按结束处理
+
+# 多机分布式：serve --coordinator 时控制服务按租约把种子分片发给远程 node，记录回传后集中去重
+COORD_LEASE_TTL = 60            # 租约秒数，node 每次回报都会续期；超时未回报则重新发放
+COORD_LEASE_DOMAINS = 8         # 每个租约包含的注册域名数
+COORD_MAX_ATTEMPTS = 3          # 同一租约最多发放次数，超过视为无法完成
+COORD_REPORT_SEC = 2.0          # node 回报（心跳 + 记录批次）间隔
+NODE_MAX_LEASES = 2             # 每个 node 同时持有的租约数
+COORD_TOKEN = os.environ.get("CRAWLER_COORD_TOKEN", "")  # node 须携带 X-Crawler-Token；serve --coordinator/node 未设置时拒绝启动
+
+PHONE_CACHE_SIZE = 65536    # 电话号码校验结果 LRU 容量（跨页面复用）
+DOMAIN_CACHE_SIZE = 65536   # netloc -> 注册域名 LRU 容量
+# 公共后缀表：默认用 tldextract 包内快照、不联网；可指向本地更新的 public_suffix_list.dat
+PSL_FILE = os.environ.get("CRAWLER_PSL_FILE", "")
 
 # 基准目录：普通模式使用项目根目录；打包后使用可执行文件所在目录
 if getattr(sys, 'frozen', False):
@@ -33,20 +102,73 @@ else:
 DATA_DIR = str(Path(os.environ.get('CRAWLER_DATA_DIR', str(BASE_DIR / 'data'))))
 EXPORT_DIR = str(Path(os.environ.get('CRAWLER_EXPORT_DIR', str(BASE_DIR / 'export'))))
 
+# 分段结果日志（data/results/zh|en/NNNNNNNN-<pid>.jsonl + 索引旁路文件）；旧版单文件首次启动时复制为首段
+RESULTS_DIR = str(Path(DATA_DIR) / "results")
+RESULTS_SEGMENT_BYTES = 64 * 1024 * 1024
+RESULTS_SEGMENT_SEC = 24 * 60 * 60
 RESULTS_ZH = str(Path(DATA_DIR) / "results_zh.txt")
 RESULTS_EN = str(Path(DATA_DIR) / "results_en.txt")
+# 兼容旧路径（默认开启）：每条结果同时追加到 results_zh.txt / results_en.txt，供读取旧路径的下游工具使用；
+# 设 CRAWLER_RESULTS_LEGACY=0 关闭（旧文件保留，不再更新）
+RESULTS_LEGACY_MIRROR = os.environ.get("CRAWLER_RESULTS_LEGACY", "1") not in ("0", "false", "False")
 ERROR_LOG = str(Path(DATA_DIR) / "crawler_errors.txt")
 STATE_DB = str(Path(DATA_DIR) / "state.sqlite")
 
+# 逐页阶段追踪：按比例采样，输出紧凑 JSON 行（jsonl）或 Chrome trace（chrome，可在 chrome://tracing / Perfetto 打开）
+try:
+    TRACE_SAMPLE_RATE = float(os.environ.get("CRAWLER_TRACE_SAMPLE", "0"))
+except Exception:
+    TRACE_SAMPLE_RATE = 0.0
+TRACE_FORMAT = os.environ.get("CRAWLER_TRACE_FORMAT", "jsonl")
+TRACE_PATH = os.environ.get("CRAWLER_TRACE_PATH", "")  # 为空时写到 DATA_DIR/trace.jsonl 或 trace.json
+
+# 原始页面归档（WARC 风格 .warc.gz 分段），供 reextract 离线重跑抽取；默认关闭
+ARCHIVE_ENABLED = os.environ.get("CRAWLER_ARCHIVE", "0") not in ("0", "false", "False", "")
+ARCHIVE_DIR = os.environ.get("CRAWLER_ARCHIVE_DIR", str(Path(DATA_DIR) / "archive"))
+try:
+    ARCHIVE_MAX_BYTES = int(os.environ.get("CRAWLER_ARCHIVE_MAX_MB", "4096")) * 1024 * 1024
+except Exception:
+    ARCHIVE_MAX_BYTES = 4096 * 1024 * 1024
+ARCHIVE_SEGMENT_BYTES = 32 * 1024 * 1024  # 单段压缩后大小上限；reextract 以段为单位并行
+ARCHIVE_COMPRESS_LEVEL = 6
+ARCHIVE_QUEUE_SIZE = 256                 # 待压缩页面队列上限，满时丢弃（不拖慢抓取）
+
+# 查询接口（/contacts、/domains）：只读连接池大小与分页条数
+READ_POOL_SIZE = 4
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# 写后批量落盘：每 N 条或每 M 毫秒提交一次
+STORAGE_BATCH_SIZE = 200
+STORAGE_FLUSH_MS = 500
+STORAGE_QUEUE_SIZE = 10000  # 待写队列上限，满时生产方等待（背压）
+
+# 内存去重索引（64 位哈希，每条约 8 字节）；超过上限后未命中的记录回落到 SQLite 判重
+try:
+    DEDUP_MAX_ENTRIES = int(os.environ.get("CRAWLER_DEDUP_MAX_ENTRIES", "20000000"))
+except Exception:
+    DEDUP_MAX_ENTRIES = 20000000
+DEDUP_DELTA_SIZE = 65536
+
+FETCH_STATE_MAX_LINKS = 200  # 每个 URL 记录的同站外链上限（未变化页面据此继续扩展）
+
 ROBOTS_CACHE_TTL = 60 * 60  # 1小时
+ROBOTS_NEGATIVE_TTL = 10 * 60  # robots 拉取失败（超时/5xx）时的负缓存时长
+ROBOTS_CACHE_MAX_HOSTS = 5000  # 内存中最多缓存的站点数（LRU 淘汰）
+ROBOTS_MAX_BYTES = 512 * 1024  # robots.txt 读取上限
 
 # 停止关键词扩展的正则提示词
 CONTACT_HINT_KEYWORDS = [
     "contact", "联系", "关于", "邮箱", "合作", "商务", "contact-us", "about", "email"
 ]
 
-# 语言阈值（简单策略）
-LANG_ZH_HINTS = ["微信", "联系", "合作", "邮箱", "qq", "企业", "公众号", "知乎", "微博"]
+# 页面语言判定（可见文本中 汉字数 /（汉字数 + 拉丁单词数））
+LANG_ZH_RATIO = 0.3           # 占比达到该值判为中文
+LANG_SAMPLE_UNITS = 60        # 统计到这么多字/词后，结论明确即提前结束；不足时置信度按比例打折
+LANG_EARLY_ZH = 0.6           # 提前结束：占比不低于该值直接判中文
+LANG_EARLY_EN = 0.05          # 提前结束：占比不高于该值直接判英文
+LANG_CONFIDENT = 0.5          # 置信度达到该值的页面计入站点记忆；低于的页面优先沿用站点结论
+LANG_MEMO_MAX_DOMAINS = 50000
 
 # 控制服务（可由环境变量覆盖）
 CONTROL_HOST = os.environ.get("CRAWLER_HOST", "127.0.0.1")
@@ -61,3 +183,6 @@ try:
     AUTO_LOOP_INTERVAL_SEC = int(os.environ.get("CRAWLER_LOOP_INTERVAL", "60"))
 except Exception:
     AUTO_LOOP_INTERVAL_SEC = 60
+# 失败或没有种子的轮次按连续失败次数指数退避（从 max(间隔, 下限) 起翻倍，封顶）
+AUTO_LOOP_RETRY_MIN_SEC = 5
+AUTO_LOOP_RETRY_MAX_SEC = 3600
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import aiohttp
+
+from . import config
+from .crawler import Crawler
+from .storage import get_conn
+from .utils import create_session
+
+# 多机分布式抓取：控制服务充当协调者，把每个关键词的种子按注册域名切成租约，
+# 远程 node 通过 HTTP 领取租约、抓取并分批回报记录；记录在协调者处按
+# (contact_type, contact_value, site_domain) 统一去重入库。
+# 租约靠回报续期，node 宕机后租约过期、重新发放；重复抓到的记录由中心去重吸收。
+
+
+class Lease:
+    __slots__ = ('lease_id', 'job_id', 'keyword', 'urls', 'node', 'expires_at', 'attempts', 'done')
+
+    def __init__(self, job_id: int, keyword: str, urls: List[str]):
+        self.lease_id = secrets.token_hex(8)
+        self.job_id = job_id
+        self.keyword = keyword
+        self.urls = urls
+        self.node: Optional[str] = None
+        self.expires_at = 0.0
+        self.attempts = 0
+        self.done = False
+
+
+class LeaseBoard:
+    def __init__(self, domain_of: Callable[[str], str], ttl: Optional[float] = None,
+                 domains_per_lease: Optional[int] = None):
+        self.domain_of = domain_of
+        self.ttl = config.COORD_LEASE_TTL if ttl is None else ttl
+        self.domains_per_lease = max(1, config.COORD_LEASE_DOMAINS if domains_per_lease is None else domains_per_lease)
+        self._queue: Deque[Lease] = deque()
+        self._leases: Dict[str, Lease] = {}
+        self._jobs: Dict[int, Dict] = {}
+        self._job_ids = 0
+        self.nodes: Dict[str, float] = {}
+        self.paused = False
+        self.reissued = 0
+
+    def set_paused(self, paused: bool):
+        self.paused = paused
+
+    def _finish(self, lease: Lease):
+        lease.done = True
+        self._leases.pop(lease.lease_id, None)
+        job = self._jobs.get(lease.job_id)
+        if job is None:
+            return
+        job['remaining'].discard(lease.lease_id)
+        if not job['remaining'] and not job['done'].done():
+            job['done'].set_result(None)
+
+    def expire(self):
+        # 由 lease() 与协调者调度循环（约每秒）调用：没有 node 来领租约时过期租约也会回到队列
+        now = time.time()
+        for lease in list(self._leases.values()):
+            if lease.done or lease.node is None or lease.expires_at > now:
+                continue
+            logging.warning("lease %s on node %s expired", lease.lease_id, lease.node)
+            lease.node = None
+            if lease.attempts >= config.COORD_MAX_ATTEMPTS:
+                self._finish(lease)
+                continue
+            # 过期租约插到队首，优先重新发放
+            self.reissued += 1
+            self._queue.appendleft(lease)
+
+    def lease(self, node: str, count: int = 1) -> List[Dict]:
+        self.nodes[node] = time.time()
+        self.expire()
+        out = []
+        while self._queue and len(out) < count and not self.paused:
+            lease = self._queue.popleft()
+            if lease.done or lease.lease_id not in self._leases:
+                continue
+            lease.node = node
+            lease.attempts += 1
+            lease.expires_at = time.time() + self.ttl
+            out.append({'lease_id': lease.lease_id, 'keyword': lease.keyword, 'urls': lease.urls, 'ttl': self.ttl})
+        return out
+
+    async def report(self, node: str, lease_id: str, records: List[Dict], pages: int = 0, done: bool = False) -> Dict:
+        # 返回 cancel=True 表示该租约已被回收（过期重发/关键词被切换），node 应停止抓取
+        self.nodes[node] = time.time()
+        lease = self._leases.get(lease_id)
+        job = self._jobs.get(lease.job_id) if lease is not None else None
+        if job is None:
+            return {'ok': True, 'cancel': True, 'paused': self.paused}
+        owner = lease.node == node
+        job['pages'][lease_id] = max(job['pages'].get(lease_id, 0), pages)
+        if job['progress'] is not None:
+            job['progress']['pages'] = sum(job['pages'].values())
+        for rec in records:
+            try:
+                await job['on_record'](rec)
+            except Exception:
+                logging.exception("coordinator record handling failed")
+        if owner:
+            lease.expires_at = time.time() + self.ttl
+            if done:
+                self._finish(lease)
+        return {'ok': True, 'cancel': not owner, 'paused': self.paused}
+
+    async def crawl_urls(self, keyword: str, urls: List[str], on_record, paused_event: Optional[asyncio.Event] = None,
+                         session=None, slots: Optional[asyncio.Semaphore] = None,
+                         share: Optional[Callable[[], int]] = None, progress: Optional[Dict] = None):
+        # 与 Crawler.crawl_urls 同签名：切分租约后等待所有租约完成
+        by_domain: Dict[str, List[str]] = {}
+        for u in urls:
+            by_domain.setdefault(self.domain_of(u), []).append(u)
+        groups = list(by_domain.values())
+        if not groups:
+            return
+        self._job_ids += 1
+        job_id = self._job_ids
+        leases = []
+        for i in range(0, len(groups), self.domains_per_lease):
+            part = [u for g in groups[i:i + self.domains_per_lease] for u in g]
+            leases.append(Lease(job_id, keyword, part))
+        job = {
+            'on_record': on_record,
+            'remaining': {lease.lease_id for lease in leases},
+            'pages': {},
+            'progress': progress,
+            'done': asyncio.get_running_loop().create_future(),
+        }
+        self._jobs[job_id] = job
+        for lease in leases:
+            self._leases[lease.lease_id] = lease
+            self._queue.append(lease)
+        try:
+            await job['done']
+        finally:
+            # 正常结束或被切换取消：回收该关键词剩余租约，node 下次回报会收到 cancel
+            self._jobs.pop(job_id, None)
+            for lease in leases:
+                lease.done = True
+                self._leases.pop(lease.lease_id, None)
+
+    def stats(self) -> Dict:
+        now = time.time()
+        return {
+            'queued': sum(1 for lease in self._queue if not lease.done),
+            'leased': sum(1 for lease in self._leases.values() if lease.node is not None),
+            'jobs': len(self._jobs),
+            'reissued': self.reissued,
+            'nodes': {n: round(now - ts, 1) for n, ts in self.nodes.items()},
+        }
+
+
+# ---- 远程 node ----
+
+class NodeClient:
+    def __init__(self, coordinator: str, node_id: Optional[str] = None, token: Optional[str] = None):
+        self.base = coordinator.rstrip('/')
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        token = config.COORD_TOKEN if token is None else token
+        self.headers = {'X-Crawler-Token': token} if token else {}
+        self.http: Optional[aiohttp.ClientSession] = None
+
+    async def _post(self, path: str, payload: Dict) -> Dict:
+        async with self.http.post(self.base + path, json=payload, headers=self.headers,
+                                  timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def lease(self, count: int) -> List[Dict]:
+        data = await self._post('/coord/lease', {'node': self.node_id, 'count': count})
+        return data.get('leases') or []
+
+    async def report(self, lease_id: str, records: List[Dict], pages: int, done: bool) -> Dict:
+        return await self._post('/coord/report', {'node': self.node_id, 'lease_id': lease_id,
+                                                  'records': records, 'pages': pages, 'done': done})
+
+
+async def _run_lease(client: NodeClient, crawler: Crawler, session: aiohttp.ClientSession,
+                     slots: asyncio.Semaphore, lease: Dict):
+    lease_id = lease['lease_id']
+    buf: List[Dict] = []
+    prog = {'pages': 0}
+    paused = asyncio.Event()
+    crawl = asyncio.ensure_future(crawler.crawl_urls(lease['keyword'], lease['urls'], _appender(buf),
+                                                     paused_event=paused, session=session, slots=slots,
+                                                     progress=prog))
+    try:
+        # 定期回报：既是心跳（续租），也把攒下的记录交给协调者
+        while not crawl.done():
+            await asyncio.wait({crawl}, timeout=config.COORD_REPORT_SEC)
+            if crawl.done():
+                break
+            batch, buf[:] = list(buf), []
+            try:
+                reply = await client.report(lease_id, batch, prog['pages'], False)
+            except Exception:
+                logging.warning("node: report for lease %s failed", lease_id)
+                buf[:0] = batch
+                continue
+            if reply.get('cancel'):
+                crawl.cancel()
+            elif reply.get('paused'):
+                paused.set()
+        try:
+            await crawl
+        except asyncio.CancelledError:
+            return
+        except Exception:
+            logging.exception("node: lease %s crawl failed", lease_id)
+        for attempt in range(3):
+            try:
+                await client.report(lease_id, list(buf), prog['pages'], True)
+                return
+            except Exception:
+                await asyncio.sleep(1 + attempt)
+        logging.warning("node: final report for lease %s lost, coordinator will re-issue", lease_id)
+    finally:
+        crawl.cancel()
+
+
+def _appender(buf: List[Dict]):
+    async def on_record(rec: Dict):
+        buf.append(rec)
+    return on_record
+
+
+async def run_node_async(coordinator: str, concurrency: Optional[int] = None, max_leases: Optional[int] = None,
+                         node_id: Optional[str] = None):
+    client = NodeClient(coordinator, node_id=node_id)
+    max_leases = max(1, config.NODE_MAX_LEASES if max_leases is None else max_leases)
+    conn = get_conn()
+    crawler = Crawler(conn=conn)
+    slots = asyncio.Semaphore(concurrency or config.GLOBAL_CONCURRENCY)
+    running: Dict[str, asyncio.Task] = {}
+    async with create_session() as session, aiohttp.ClientSession() as http:
+        client.http = http
+        try:
+            while True:
+                want = max_leases - len(running)
+                leases = []
+                if want > 0:
+                    try:
+                        leases = await client.lease(want)
+                    except Exception as e:
+                        logging.warning("node: lease request failed: %s", e)
+                for lease in leases:
+                    task = asyncio.ensure_future(_run_lease(client, crawler, session, slots, lease))
+                    running[lease['lease_id']] = task
+                    task.add_done_callback(lambda _t, k=lease['lease_id']: running.pop(k, None))
+                if not leases:
+                    await asyncio.sleep(1.0)
+                elif len(running) >= max_leases:
+                    await asyncio.wait(set(running.values()), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in list(running.values()):
+                task.cancel()
+            crawler.close()
+            conn.close()
+
+
+def run_node(coordinator: str, concurrency: Optional[int] = None, max_leases: Optional[int] = None):
+    try:
+        asyncio.run(run_node_async(coordinator, concurrency=concurrency, max_leases=max_leases))
+    except KeyboardInterrupt:
+        pass
@@ -1,129 +1,557 @@
 import asyncio
+import codecs
+import hashlib
 import json
+import logging
 import re
+import sqlite3
+import time
 import urllib.parse
-from typing import Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import aiohttp
-from bs4 import BeautifulSoup
-import tldextract
 import urllib.robotparser as robotparser
 
-from . import config
-from .utils import RateLimiter, pick_user_agent, clean_text
+from . import config, domains, metrics, tracing
+from .archive import PageArchive
+from .domains import registered_domain
+from .ratelimit import DomainLimiter
+from .utils import pick_user_agent, create_session
 from .extractors import extract_all
+from .frontier import Frontier, FrontierItem
+from .lang import DomainLang
+from .parser import ParsePool, parse_html
+from .storage import load_fetch_state, load_robots, save_fetch_states, save_robots
 
 HEADERS_BASE = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
     "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
 }
 
+# 热路径上的指标子项预先取出，避免每次按标签查找
+_FETCH_OK = metrics.FETCH_TOTAL.labels('ok')
+_FETCH_304 = metrics.FETCH_TOTAL.labels('not_modified')
+_FETCH_UNCHANGED = metrics.FETCH_TOTAL.labels('unchanged')
+_FETCH_HTTP_ERROR = metrics.FETCH_TOTAL.labels('http_error')
+_FETCH_NOT_HTML = metrics.FETCH_TOTAL.labels('not_html')
+_FETCH_TIMEOUT = metrics.FETCH_TOTAL.labels('timeout')
+_FETCH_CONN_ERROR = metrics.FETCH_TOTAL.labels('conn_error')
+_FETCH_ROBOTS = metrics.FETCH_TOTAL.labels('robots_denied')
+_WAIT_FETCH = metrics.RATELIMIT_WAIT.labels('fetch')
+_WAIT_DISPATCH = metrics.RATELIMIT_WAIT.labels('dispatch')
+
+
 class RobotsCache:
-    def __init__(self):
-        self.cache: Dict[str, Tuple[float, robotparser.RobotFileParser]] = {}
-        self.lock = asyncio.Lock()
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        # base -> (过期时间戳, 解析结果)；OrderedDict 充当 LRU
+        self.cache: "OrderedDict[str, Tuple[float, robotparser.RobotFileParser]]" = OrderedDict()
+        # 每站点单飞：同一站点并发请求共享一次下载，不同站点互不阻塞
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.conn = conn
+        self._pending: List[Tuple[str, int, str, float, float]] = []
+
+    def _remember(self, base: str, expires_at: float, rp: robotparser.RobotFileParser):
+        self.cache[base] = (expires_at, rp)
+        self.cache.move_to_end(base)
+        while len(self.cache) > config.ROBOTS_CACHE_MAX_HOSTS:
+            self.cache.popitem(last=False)
+
+    def _load_persisted(self, base: str) -> Optional[robotparser.RobotFileParser]:
+        if self.conn is None:
+            return None
+        try:
+            row = load_robots(self.conn, base)
+        except Exception:
+            return None
+        if not row or row[2] <= time.time():
+            return None
+        rp = robotparser.RobotFileParser()
+        rp.parse((row[1] or "").splitlines())
+        self._remember(base, row[2], rp)
+        return rp
+
+    async def _download(self, session: aiohttp.ClientSession, base: str, ua: str) -> robotparser.RobotFileParser:
+        robots_url = urllib.parse.urljoin(base, "/robots.txt")
+        rp = robotparser.RobotFileParser()
+        body = ""
+        ttl = config.ROBOTS_CACHE_TTL
+        try:
+            async with session.get(robots_url, headers={"User-Agent": ua, **HEADERS_BASE}, timeout=config.CONNECT_TIMEOUT) as resp:
+                status = resp.status
+                if status == 200:
+                    raw = bytearray()
+                    async for chunk in resp.content.iter_chunked(16384):
+                        raw.extend(chunk)
+                        if len(raw) >= config.ROBOTS_MAX_BYTES:
+                            break
+                    body = bytes(raw[: config.ROBOTS_MAX_BYTES]).decode(resp.charset or "utf-8", errors="ignore")
+                elif status >= 500:
+                    # 服务端错误按失败处理，短期负缓存后重试
+                    ttl = config.ROBOTS_NEGATIVE_TTL
+        except Exception:
+            status = 0
+            ttl = config.ROBOTS_NEGATIVE_TTL
+            metrics.ERRORS.labels('robots').inc()
+        rp.parse(body.splitlines())
+        now = time.time()
+        self._remember(base, now + ttl, rp)
+        self._pending.append((base, status, body, now, now + ttl))
+        if len(self._pending) >= 32:
+            self.flush()
+        return rp
+
+    def flush(self):
+        # 批量持久化到 state.sqlite，重启后无需重新下载
+        if not self._pending or self.conn is None:
+            self._pending.clear()
+            return
+        rows, self._pending = self._pending, []
+        try:
+            save_robots(self.conn, rows)
+        except Exception:
+            pass
+
+    async def get(self, session: aiohttp.ClientSession, base: str, ua: str) -> robotparser.RobotFileParser:
+        entry = self.cache.get(base)
+        if entry and entry[0] > time.time():
+            self.cache.move_to_end(base)
+            return entry[1]
+        rp = self._load_persisted(base)
+        if rp is not None:
+            return rp
+        task = self.inflight.get(base)
+        if task is None:
+            task = asyncio.ensure_future(self._download(session, base, ua))
+            self.inflight[base] = task
+            task.add_done_callback(lambda _t, b=base: self.inflight.pop(b, None))
+        # shield：单个等待方被取消不影响其他共享此次下载的请求
+        return await asyncio.shield(task)
+
+    def crawl_delay(self, url: str, ua: str) -> Optional[float]:
+        # 读取已缓存规则中的 Crawl-delay（不触发下载）
+        parsed = urllib.parse.urlparse(url)
+        entry = self.cache.get(f"{parsed.scheme}://{parsed.netloc}")
+        if not entry:
+            return None
+        try:
+            delay = entry[1].crawl_delay(ua)
+        except Exception:
+            return None
+        return float(delay) if delay is not None else None
 
     async def can_fetch(self, session: aiohttp.ClientSession, url: str, ua: str) -> bool:
         parsed = urllib.parse.urlparse(url)
         base = f"{parsed.scheme}://{parsed.netloc}"
-        async with self.lock:
-            rp_tuple = self.cache.get(base)
-            now = asyncio.get_event_loop().time()
-            if not rp_tuple or now - rp_tuple[0] > config.ROBOTS_CACHE_TTL:
-                robots_url = urllib.parse.urljoin(base, "/robots.txt")
-                rp = robotparser.RobotFileParser()
-                try:
-                    async with session.get(robots_url, headers={"User-Agent": ua, **HEADERS_BASE}, timeout=config.CONNECT_TIMEOUT) as resp:
-                        if resp.status == 200:
-                            txt = await resp.text(errors="ignore")
-                            rp.parse(txt.splitlines())
-                        else:
-                            rp.parse("")
-                except Exception:
-                    rp.parse("")
-                self.cache[base] = (now, rp)
-                rp_tuple = self.cache[base]
-        rp = rp_tuple[1]
+        try:
+            rp = await self.get(session, base, ua)
+        except Exception:
+            return True
         try:
             return rp.can_fetch(ua, url)
         except Exception:
             return True
 
 
-class DomainLimiter:
-    def __init__(self):
-        self.limiters: Dict[str, RateLimiter] = {}
+class FetchResult(NamedTuple):
+    html: Optional[str]
+    status: int
+    unchanged: bool
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    links: List[Tuple[str, str]]  # 未变化时为上次记录的同站链接
+    nbytes: int = 0               # 本次实际读取的正文字节数
+
+
+def page_records(keyword: str, url: str, title: str, pairs: List[Tuple[str, str]], lang: str, domain: str) -> List[Dict]:
+    # 抓取与离线重抽（reextract）共用的记录组装
+    return [{
+        'keyword': keyword,
+        'lang': lang,
+        'contact_type': ctype,
+        'contact_value': cval,
+        'source_url': url,
+        'page_title': title,
+        'site_domain': domain,
+    } for ctype, cval in pairs]
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+HTML_CTYPES = ("text/html", "application/xhtml+xml")
+# 响应头缺失或过于笼统时才靠嗅探判断是否为 HTML
+GENERIC_CTYPES = ("", "application/octet-stream", "text/plain", "binary/octet-stream")
+BINARY_MAGIC = (
+    b"%PDF", b"PK\x03\x04", b"\x89PNG", b"GIF8", b"\xff\xd8\xff", b"\x1f\x8b", b"Rar!",
+    b"7z\xbc\xaf", b"MZ", b"RIFF", b"ID3", b"OggS", b"fLaC", b"\x00\x00\x01\x00", b"wOFF", b"wOF2",
+)
+HTML_MARKERS = (b"<!doctype html", b"<html", b"<head", b"<body", b"<title", b"<meta", b"<div", b"<a ")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.I)
+# gb2312/gbk 统一按超集 gb18030 解码，避免个别字符乱码
+CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030", "iso-8859-1": "cp1252", "latin-1": "cp1252"}
+
 
-    def get(self, host: str) -> RateLimiter:
-        if host not in self.limiters:
-            self.limiters[host] = RateLimiter(config.PER_HOST_RATE_LIMIT)
-        return self.limiters[host]
+def sniff_is_html(head: bytes, declared_ctype: str) -> bool:
+    # 头部字节是二进制魔数（或含 NUL）时即使声明为 HTML 也放弃；笼统类型需看到 HTML 标记才接受
+    stripped = head.lstrip()
+    if stripped.startswith(BINARY_MAGIC) or b"\x00" in head[:1024]:
+        return False
+    if declared_ctype in GENERIC_CTYPES:
+        lowered = stripped[:1024].lower()
+        return any(m in lowered for m in HTML_MARKERS)
+    return True
+
+
+def _normalize_charset(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    name = name.strip().strip("\"'").lower()
+    name = CHARSET_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decode_html(body: bytes, header_charset: Optional[str], truncated: bool = False) -> str:
+    # 依次使用：BOM、响应头 charset、页面头部 meta charset；都没有时先试 UTF-8，失败再按 GB18030
+    for bom, enc in ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if body.startswith(bom):
+            return body.decode(enc, errors="ignore")
+    enc = _normalize_charset(header_charset)
+    if not enc:
+        m = META_CHARSET_RE.search(body[:4096])
+        enc = _normalize_charset(m.group(1).decode("ascii", "ignore")) if m else None
+    if enc:
+        return body.decode(enc, errors="ignore")
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 截断导致末尾半个字符不算错误；UTF-8 严格解码在首个非法字节处即失败，代价很小
+        if truncated and e.start >= len(body) - 3:
+            return body.decode("utf-8", errors="ignore")
+        return body.decode("gb18030", errors="ignore")
+
+
+async def read_html_body(resp: aiohttp.ClientResponse, max_bytes: int) -> Optional[Tuple[bytes, bool]]:
+    # 分块读取，最多 max_bytes；首块嗅探不是 HTML 时立即放弃。返回 (正文, 是否被截断)
+    ctype = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if ctype not in HTML_CTYPES and ctype not in GENERIC_CTYPES:
+        return None
+    buf = bytearray()
+    sniffed = False
+    truncated = False
+    async for chunk in resp.content.iter_chunked(config.FETCH_CHUNK_SIZE):
+        buf.extend(chunk)
+        if not sniffed and (len(buf) >= 1024 or len(buf) >= max_bytes):
+            if not sniff_is_html(bytes(buf[:1024]), ctype):
+                return None
+            sniffed = True
+        if len(buf) >= max_bytes:
+            truncated = True
+            del buf[max_bytes:]
+            break
+    if not sniffed and not sniff_is_html(bytes(buf[:1024]), ctype):
+        return None
+    return bytes(buf), truncated
+
+
+# 每个 URL 的条件请求状态（ETag/Last-Modified/内容哈希/同站链接），批量写回 state.sqlite
+class FetchStateStore:
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        self.conn = conn
+        self._pending: Dict[str, Tuple[str, str, str, int, str, str, float]] = {}
+
+    def get(self, url: str) -> Optional[Tuple[str, str, int, str, List[Tuple[str, str]]]]:
+        row = self._pending.get(url)
+        if row is not None:
+            row = row[1:]
+        elif self.conn is not None:
+            try:
+                row = load_fetch_state(self.conn, url)
+            except Exception:
+                row = None
+        if not row:
+            return None
+        etag, last_modified, status, chash, links_json = row[:5]
+        try:
+            links = [tuple(x) for x in json.loads(links_json or "[]")]
+        except Exception:
+            links = []
+        return etag, last_modified, status, chash, links
+
+    def record(self, url: str, etag: Optional[str], last_modified: Optional[str], status: int,
+               chash: Optional[str], links: List[Tuple[str, str]]):
+        links_json = json.dumps(links[: config.FETCH_STATE_MAX_LINKS], ensure_ascii=False)
+        self._pending[url] = (url, etag, last_modified, status, chash, links_json, time.time())
+        if len(self._pending) >= 64:
+            self.flush()
+
+    def flush(self):
+        if not self._pending or self.conn is None:
+            self._pending.clear()
+            return
+        rows = list(self._pending.values())
+        self._pending.clear()
+        try:
+            save_fetch_states(self.conn, rows)
+        except Exception:
+            pass
 
 
 class Crawler:
-    def __init__(self):
-        self.robots = RobotsCache()
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        self.robots = RobotsCache(conn)
+        self.fetch_state = FetchStateStore(conn)
         self.domain_limiter = DomainLimiter()
+        self.parser = ParsePool()
+        self.lang_memo = DomainLang()
+        domains.warm()
+        # 开启归档时保留抓到的原始页面，之后可用 reextract 离线重跑抽取
+        self.archive: Optional[PageArchive] = PageArchive() if config.ARCHIVE_ENABLED else None
+        self.bytes_read = 0
 
-    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[str]:
+    def close(self):
+        self.parser.close()
+        if self.archive is not None:
+            self.archive.close()
+        tracing.TRACER.flush()
+
+    async def fetch_page(self, session: aiohttp.ClientSession, url: str, reserved: bool = False,
+                         keyword: str = '') -> Optional[FetchResult]:
+        # reserved=True 表示调度器已为该主机预约过时间片，此处不再等待限速；keyword 仅写入归档
         ua = pick_user_agent()
-        if not await self.robots.can_fetch(session, url, ua):
+        started = time.perf_counter()
+        allowed = await self.robots.can_fetch(session, url, ua)
+        elapsed = time.perf_counter() - started
+        metrics.ROBOTS_WAIT.observe(elapsed)
+        tracing.add('robots', started, elapsed)
+        if not allowed:
+            _FETCH_ROBOTS.inc()
             return None
-        parsed = urllib.parse.urlparse(url)
-        await self.domain_limiter.get(parsed.netloc).acquire()
+        limiter = self.domain_limiter.get(domains.host_of(url))
+        limiter.set_crawl_delay(self.robots.crawl_delay(url, ua))
+        if not reserved:
+            started = time.perf_counter()
+            await limiter.acquire()
+            elapsed = time.perf_counter() - started
+            _WAIT_FETCH.observe(elapsed)
+            tracing.add('ratelimit', started, elapsed)
+        headers = {"User-Agent": ua, **HEADERS_BASE}
+        prev = self.fetch_state.get(url)
+        if prev:
+            # 条件请求：服务器可直接回 304，省掉下载与解析
+            if prev[0]:
+                headers["If-None-Match"] = prev[0]
+            if prev[1]:
+                headers["If-Modified-Since"] = prev[1]
+        started = time.monotonic()
         try:
-            async with session.get(url, headers={"User-Agent": ua, **HEADERS_BASE}, timeout=config.REQUEST_TIMEOUT) as resp:
+            async with session.get(url, headers=headers, timeout=config.REQUEST_TIMEOUT) as resp:
+                # 按首包延迟与状态码调整该主机速率
+                latency = time.monotonic() - started
+                metrics.FETCH_LATENCY.observe(latency)
+                limiter.on_response(resp.status, latency, resp.headers.get('Retry-After'))
+                if resp.status == 304 and prev:
+                    _FETCH_304.inc()
+                    return FetchResult(None, 304, True, prev[0], prev[1], prev[3], prev[4])
                 if resp.status != 200:
+                    _FETCH_HTTP_ERROR.inc()
                     return None
-                ctype = resp.headers.get('Content-Type', '')
-                if 'text/html' not in ctype and 'application/xhtml+xml' not in ctype:
+                # 流式读取：字节上限 + 首块嗅探，避免大文件/错标类型占满内存
+                with tracing.span('download'):
+                    read = await read_html_body(resp, config.FETCH_MAX_BYTES)
+                if read is None:
+                    _FETCH_NOT_HTML.inc()
                     return None
-                return await resp.text(errors="ignore")
+                body, truncated = read
+                header_charset = resp.charset
+                etag = resp.headers.get('ETag')
+                last_modified = resp.headers.get('Last-Modified')
+                if self.archive is not None:
+                    resp_headers = list(resp.headers.items())
+                    reason = resp.reason or ''
+        except asyncio.TimeoutError:
+            limiter.on_response(0, time.monotonic() - started)
+            _FETCH_TIMEOUT.inc()
+            return None
+        except aiohttp.ClientConnectionError:
+            limiter.on_response(0, time.monotonic() - started)
+            _FETCH_CONN_ERROR.inc()
+            return None
         except Exception:
+            metrics.ERRORS.labels('fetch').inc()
+            logging.debug("fetch failed: %s", url, exc_info=True)
             return None
+        self.bytes_read += len(body)
+        metrics.FETCH_BYTES.inc(len(body))
+        chash = content_hash(body)
+        if prev and prev[3] == chash:
+            # 内容未变：只刷新校验头，沿用上次的链接
+            self.fetch_state.record(url, etag, last_modified, 200, chash, prev[4])
+            _FETCH_UNCHANGED.inc()
+            return FetchResult(None, 200, True, etag, last_modified, chash, prev[4], len(body))
+        _FETCH_OK.inc()
+        if self.archive is not None:
+            self.archive.put(url, keyword, 200, reason, resp_headers, body, truncated)
+        with tracing.span('decode'):
+            html = decode_html(body, header_charset, truncated)
+        return FetchResult(html, 200, False, etag, last_modified, chash, [], len(body))
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[str]:
+        result = await self.fetch_page(session, url)
+        return result.html if result else None
 
     def extract_domain(self, url: str) -> str:
-        t = tldextract.extract(url)
-        return ".".join([p for p in [t.domain, t.suffix] if p])
+        return registered_domain(url)
+
+    def parse_page(self, html: str, base_url: str = "") -> Tuple[str, str, List[Tuple[str, str]]]:
+        # 一次解析同时得到标题、可见文本与 (链接, 锚文本)
+        return parse_html(html, base_url)
 
     def parse_contacts(self, html: str) -> Tuple[str, List[Tuple[str, str]]]:
-        soup = BeautifulSoup(html, "html.parser")
-        title = clean_text(soup.title.text if soup.title else "")
-        texts = [title]
-        for tag in soup.find_all(text=True):
-            text = str(tag)
-            if text and not re.match(r"^\s+$", text):
-                texts.append(text)
-        content = "\n".join(texts)
+        title, content, _ = self.parse_page(html)
         pairs = extract_all(content)
         return title, pairs
 
-    async def crawl_urls(self, keyword: str, urls: List[str], on_record, paused_event: Optional[asyncio.Event] = None):
-        sem = asyncio.Semaphore(config.GLOBAL_CONCURRENCY)
-        async with aiohttp.ClientSession() as session:
-            async def worker(url: str):
-                async with sem:
-                    if paused_event and paused_event.is_set():
-                        return
-                    html = await self.fetch(session, url)
-                    if not html:
-                        return
-                    title, pairs = self.parse_contacts(html)
-                    if not pairs:
-                        return
-                    domain = self.extract_domain(url)
-                    lang = 'zh' if re.search(r"[\u4e00-\u9fff]", html) else 'en'
-                    for ctype, cval in pairs:
-                        if paused_event and paused_event.is_set():
-                            return
-                        rec = {
-                            'keyword': keyword,
-                            'lang': lang,
-                            'contact_type': ctype,
-                            'contact_value': cval,
-                            'source_url': url,
-                            'page_title': title,
-                            'site_domain': domain,
-                        }
-                        await on_record(rec)
-            await asyncio.gather(*[worker(u) for u in urls])
+    async def _crawl_one(self, session: aiohttp.ClientSession, keyword: str, item: FrontierItem,
+                         frontier: Frontier, on_record, paused_event: Optional[asyncio.Event], reserved: bool = False,
+                         progress: Optional[Dict] = None, held: float = 0.0):
+        # 按采样率为本页开启阶段追踪（contextvar 只在本任务内可见）；
+        # held 为调度器里等主机限速的秒数，追踪从等待开始计，并记为 ratelimit 阶段
+        held_start = time.perf_counter() - held
+        token = tracing.TRACER.start_page(item.url, held_start if held > 0 else None)
+        if held > 0:
+            tracing.add('ratelimit', held_start, held)
+        try:
+            await self._process_page(session, keyword, item, frontier, on_record, paused_event, reserved, progress)
+        finally:
+            tracing.TRACER.finish_page(token, depth=item.depth)
+
+    async def _process_page(self, session: aiohttp.ClientSession, keyword: str, item: FrontierItem,
+                            frontier: Frontier, on_record, paused_event: Optional[asyncio.Event], reserved: bool,
+                            progress: Optional[Dict]):
+        url = item.url
+        started = time.perf_counter()
+        result = await self.fetch_page(session, url, reserved=reserved, keyword=keyword)
+        if not result:
+            return
+        if progress is not None:
+            progress['pages'] = progress.get('pages', 0) + 1
+        domain = self.extract_domain(url)
+        if result.unchanged:
+            # 页面未变化：跳过解析/抽取/入库，仅用记录的链接继续扩展
+            if item.depth < frontier.max_depth:
+                for link, anchor in result.links:
+                    frontier.push(link, item.depth + 1, anchor)
+            return
+        html = result.html
+        # 解析与抽取在进程池中完成，不阻塞事件循环
+        analyze_start = time.perf_counter()
+        page = await self.parser.analyze(html, url)
+        analyze_end = time.perf_counter()
+        metrics.PARSE_TIME.observe(page.parse_time)
+        metrics.EXTRACT_TIME.observe(page.extract_time)
+        trace = tracing.current()
+        if trace is not None:
+            # analyze 含进程池排队；parse/extract 为工作进程内实测，排在 analyze 末尾
+            trace.add('analyze', analyze_start, analyze_end - analyze_start)
+            parse_start = analyze_end - page.parse_time - page.extract_time
+            trace.add('parse', parse_start, page.parse_time)
+            trace.add('extract', parse_start + page.parse_time, page.extract_time)
+        title, pairs = page.title, page.pairs
+        # 只跟进同站链接，深度与每域预算由 frontier 负责
+        same_site = [(link, anchor) for link, anchor in page.links if self.extract_domain(link) == domain]
+        if item.depth < frontier.max_depth:
+            for link, anchor in same_site:
+                frontier.push(link, item.depth + 1, anchor)
+        if pairs:
+            store_start = time.perf_counter()
+            lang = self.lang_memo.resolve(domain, page.lang, page.lang_confidence)
+            for rec in page_records(keyword, url, title, pairs, lang, domain):
+                if paused_event and paused_event.is_set():
+                    # 记录没交付完：不记抓取状态，下一轮按新页面重新抽取
+                    return
+                metrics.RECORDS.inc()
+                await on_record(rec)
+            tracing.add('store', store_start, time.perf_counter() - store_start)
+        # 全部记录交付后才记 etag / 内容哈希；on_record 抛异常时同样不记，避免之后被当作未变化跳过
+        self.fetch_state.record(url, result.etag, result.last_modified, result.status, result.content_hash, same_site)
+        metrics.PAGE_TIME.observe(time.perf_counter() - started)
+
+    def _host_delay(self, host: str) -> float:
+        return self.domain_limiter.get(host).delay()
+
+    async def crawl_urls(self, keyword: str, urls: List[str], on_record, paused_event: Optional[asyncio.Event] = None,
+                         session: Optional[aiohttp.ClientSession] = None, slots: Optional[asyncio.Semaphore] = None,
+                         share: Optional[Callable[[], int]] = None, progress: Optional[Dict] = None):
+        # slots：多个关键词共享的全局并发预算；share：本关键词当前可占用的名额上限；progress：进度计数
+        frontier = Frontier(self.extract_domain)
+        for u in urls:
+            frontier.push(u, 0)
+        # 主机感知调度：只把并发名额交给此刻允许抓取的主机，避免单一主机的限速占住全部名额
+        slots = slots or asyncio.Semaphore(config.GLOBAL_CONCURRENCY)
+        inflight: Set[asyncio.Task] = set()
+        wake = asyncio.Event()
+        # 未传入共享会话时自建并在结束时关闭
+        own_session = session is None
+        if own_session:
+            session = create_session()
+
+        def _done(task: asyncio.Task):
+            inflight.discard(task)
+            metrics.INFLIGHT.dec()
+            slots.release()
+            wake.set()
+            if not task.cancelled() and task.exception() is not None:
+                # 单页异常不影响其他页面，只计数并留日志
+                metrics.ERRORS.labels('page').inc()
+                logging.debug("page task failed", exc_info=task.exception())
+
+        try:
+            while not (paused_event and paused_event.is_set()):
+                if share is not None and len(inflight) >= max(1, share()):
+                    wake.clear()
+                    try:
+                        await asyncio.wait_for(wake.wait(), config.DISPATCH_POLL_SEC)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await slots.acquire()
+                item, wait = frontier.pop_ready(self._host_delay)
+                if item is None:
+                    slots.release()
+                    if wait is None and not inflight:
+                        break
+                    # 等到最早的主机就绪，或有在途页面完成（可能带来新链接）；
+                    # 限速可长达 RATE_MAX_RETRY_AFTER，分段等待以便及时发现暂停（暂停标志可能是跨进程 Event，无法直接 await）
+                    wake.clear()
+                    started = time.perf_counter()
+                    try:
+                        await asyncio.wait_for(wake.wait(), min(wait, config.DISPATCH_POLL_SEC)
+                                               if wait is not None else config.DISPATCH_POLL_SEC)
+                    except asyncio.TimeoutError:
+                        pass
+                    if wait is not None and not inflight:
+                        # 没有在途页面、只在等主机限速：这段空转记为限速等待
+                        _WAIT_DISPATCH.observe(time.perf_counter() - started)
+                    continue
+                self.domain_limiter.get(domains.host_of(item.url)).reserve()
+                task = asyncio.ensure_future(
+                    self._crawl_one(session, keyword, item, frontier, on_record, paused_event, reserved=True,
+                                    progress=progress, held=frontier.last_held))
+                inflight.add(task)
+                metrics.INFLIGHT.inc()
+                task.add_done_callback(_done)
+            if inflight:
+                await asyncio.gather(*inflight, return_exceptions=True)
+        finally:
+            for task in inflight:
+                task.cancel()
+            self.robots.flush()
+            self.fetch_state.flush()
+            if own_session:
+                await session.close()
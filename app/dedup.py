@@ -0,0 +1,180 @@
+import array
+import bisect
+import hashlib
+import heapq
+import logging
+import sqlite3
+import sys
+import threading
+from typing import Dict, List, Optional, Set
+
+from . import config, metrics
+
+# 内存去重索引：对 (contact_type, contact_value, site_domain) 取 64 位哈希，
+# 存在有序 array('Q') 组成的分层段里（类似 LSM），新键先进小集合，攒够后排序成段，由后台线程逐级合并。
+# 命中即视为重复直接丢弃；未命中才交给 SQLite（INSERT OR IGNORE 仍是最终裁决）。
+# 64 位哈希在千万级规模下的碰撞概率约 1e-6，可接受。
+
+
+def contact_key(contact_type: Optional[str], contact_value: Optional[str], site_domain: Optional[str]) -> int:
+    raw = f"{contact_type or ''}\x1f{contact_value or ''}\x1f{site_domain or ''}".encode('utf-8', 'surrogatepass')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little')
+
+
+def record_key(rec: Dict) -> int:
+    return contact_key(rec.get('contact_type'), rec.get('contact_value'), rec.get('site_domain'))
+
+
+def _merge_runs(a: array.array, b: array.array) -> array.array:
+    out = array.array('Q')
+    last = None
+    for h in heapq.merge(a, b):
+        if h != last:
+            out.append(h)
+            last = h
+    return out
+
+
+class DedupIndex:
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = config.DEDUP_MAX_ENTRIES if max_entries is None else max_entries
+        self.delta_limit = max(1024, config.DEDUP_DELTA_SIZE)
+        # 段列表整体替换而非原地修改，查询方无需加锁
+        self._runs: List[array.array] = []
+        self._delta: Set[int] = set()
+        # 写入失败被撤销登记的键：段内数据不可原地删除，查询时先排除，重新登记时移出
+        self._forgotten: Set[int] = set()
+        self._lock = threading.Lock()
+        self._compacting = False
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.full = False
+        self.warmed = False
+        self._hit = metrics.DEDUP_LOOKUPS.labels('hit')
+        self._miss = metrics.DEDUP_LOOKUPS.labels('miss')
+        metrics.DEDUP_ENTRIES.set_function(lambda: self.entries)
+
+    def __contains__(self, h: int) -> bool:
+        if self._forgotten and h in self._forgotten:
+            return False
+        if h in self._delta:
+            return True
+        for run in self._runs:
+            i = bisect.bisect_left(run, h)
+            if i < len(run) and run[i] == h:
+                return True
+        return False
+
+    def seen(self, rec: Dict) -> bool:
+        # 返回 True 表示确定重复；否则登记该键并返回 False
+        h = record_key(rec)
+        if h in self:
+            self.hits += 1
+            self._hit.inc()
+            return True
+        self.misses += 1
+        self._miss.inc()
+        self.add(h)
+        return False
+
+    def forget(self, recs: List[Dict]):
+        # 写后入库失败的批次：撤销这些键的登记，之后再抽到时重新交给存储（可在写入线程调用）
+        for rec in recs:
+            h = record_key(rec)
+            self._delta.discard(h)
+            self._forgotten.add(h)
+
+    def add(self, h: int):
+        self._forgotten.discard(h)
+        if self.entries >= self.max_entries:
+            # 超出上限后不再登记，未命中的记录交由 SQLite 唯一约束判断
+            self.full = True
+            return
+        self._delta.add(h)
+        self.entries += 1
+        if len(self._delta) >= self.delta_limit:
+            with self._lock:
+                delta, self._delta = self._delta, set()
+                self._runs = self._runs + [array.array('Q', sorted(delta))]
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        # 段合并可能涉及千万级元素，放到后台线程，不占用事件循环
+        with self._lock:
+            if self._compacting or len(self._runs) < 2:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, name='dedup-compact', daemon=True).start()
+
+    def _pick_merge(self):
+        # 最小两段大小相近（或段数过多）时合并，保证段数为 O(log n)
+        if len(self._runs) < 2:
+            return None
+        a, b = sorted(self._runs, key=len)[:2]
+        if len(a) * 2 >= len(b) or len(self._runs) > 8:
+            return a, b
+        return None
+
+    def _compact(self):
+        try:
+            while True:
+                with self._lock:
+                    pair = self._pick_merge()
+                if pair is None:
+                    return
+                a, b = pair
+                merged = _merge_runs(a, b)
+                with self._lock:
+                    self._runs = [r for r in self._runs if r is not a and r is not b] + [merged]
+                    self.entries = sum(len(r) for r in self._runs) + len(self._delta)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def warm(self, db_path: Optional[str] = None, chunk: int = 1_000_000):
+        # 启动时从 state.sqlite 预热（在线程中执行），分块排序后入段，避免一次性大列表
+        try:
+            conn = sqlite3.connect(f"file:{db_path or config.STATE_DB}?mode=ro", uri=True)
+        except Exception:
+            logging.exception("dedup warm: cannot open state db")
+            return
+        try:
+            cur = conn.execute("SELECT contact_type, contact_value, site_domain FROM contacts")
+            while not self.full:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                room = self.max_entries - self.entries
+                if room <= 0:
+                    self.full = True
+                    break
+                hashes = sorted(contact_key(t, v, d) for t, v, d in rows[:room])
+                with self._lock:
+                    self._runs = self._runs + [array.array('Q', hashes)]
+                    self.entries = sum(len(r) for r in self._runs) + len(self._delta)
+                self._maybe_compact()
+                if len(rows) > room:
+                    self.full = True
+            self.warmed = True
+        except Exception:
+            logging.exception("dedup warm failed")
+        finally:
+            conn.close()
+
+    def memory_bytes(self) -> int:
+        runs = sum(r.itemsize * len(r) for r in self._runs)
+        return runs + sys.getsizeof(self._delta) + 32 * len(self._delta)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': self.entries,
+            'memory_bytes': self.memory_bytes(),
+            'max_entries': self.max_entries,
+            'full': self.full,
+            'warmed': self.warmed,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
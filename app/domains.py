@@ -0,0 +1,63 @@
+import functools
+import os
+import re
+import threading
+import urllib.parse
+import urllib.request
+from typing import Optional
+
+import tldextract
+
+from . import config
+
+# 注册域名解析：tldextract 默认首次使用时联网下载公共后缀表并写本机缓存目录，
+# 离线或防火墙后的节点会卡在启动阶段。这里只用包内自带的后缀快照（CRAWLER_PSL_FILE 可指向本地更新的表），
+# 不联网、不写缓存；结果按 netloc 做有界 LRU 记忆，同一主机每轮出现成千上万次只解析一次。
+# 同站判断、frontier、分片（workers / coordinator）与主机限速都经由这里取域名/主机。
+
+# scheme://netloc 前缀；比 urlsplit 快一个数量级（urlsplit 自带的缓存只有 128 项，对海量不同 URL 不起作用）
+_NETLOC_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://([^/?#]*)")
+
+_extractor: Optional[tldextract.TLDExtract] = None
+_lock = threading.Lock()
+
+
+def _get_extractor() -> tldextract.TLDExtract:
+    global _extractor
+    if _extractor is None:
+        with _lock:
+            if _extractor is None:
+                urls = ()
+                if config.PSL_FILE:
+                    urls = ('file://' + urllib.request.pathname2url(os.path.abspath(config.PSL_FILE)),)
+                extractor = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=urls, fallback_to_snapshot=True)
+                extractor('example.com')  # 后缀表在首次调用时才加载
+                _extractor = extractor
+    return _extractor
+
+
+def warm():
+    # 启动时预先加载后缀表（几十毫秒），不让它落在第一个页面上
+    _get_extractor()
+
+
+def host_of(url: str) -> str:
+    m = _NETLOC_RE.match(url)
+    if m is not None:
+        return m.group(1).lower()
+    return urllib.parse.urlsplit(url).netloc.lower()
+
+
+@functools.lru_cache(maxsize=config.DOMAIN_CACHE_SIZE)
+def _domain_of_netloc(netloc: str) -> str:
+    t = _get_extractor()(netloc)
+    return ".".join([p for p in [t.domain, t.suffix] if p])
+
+
+def registered_domain(url: str) -> str:
+    netloc = host_of(url)
+    if not netloc:
+        # 没有 scheme 的裸地址（如 "example.com/path"）不走缓存
+        t = _get_extractor()(url)
+        return ".".join([p for p in [t.domain, t.suffix] if p])
+    return _domain_of_netloc(netloc)
@@ -1,8 +1,11 @@
+import functools
 import re
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import phonenumbers
 
+from . import config
+
 EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-]+)\s*(?:\[?at\]?|\(at\)|@)\s*([A-Za-z0-9.-]+)\s*(?:\[?dot\]?|\(dot\)|\.|\s*\.\s*)([A-Za-z]{2,})", re.I)
 EMAIL_CLEAN_RE = re.compile(r"[\[\]\(\)\s]")
 
@@ -14,17 +17,50 @@ TELEGRAM_RE = re.compile(r"(?:t\.me/([A-Za-z0-9_]{3,}))|(?:telegram[^\w]?[:：\-
 WHATSAPP_RE = re.compile(r"(?:wa\.me/(\d{5,15}))|(?:WhatsApp[^\d]*([\+\d][\d\s\-]{6,}))", re.I)
 
 SOCIAL_RE = re.compile(r"https?://(?:www\.)?(?:twitter|x|linkedin|facebook|weibo|zhihu|bilibili|github)\.[^\s\"]+", re.I)
+EMAIL_PLAIN_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+# 邮箱正则从每个字母处起试并回溯，是最贵的一步。匹配只可能由 EMAIL_RUN_RE 的字符组成，
+# 且必含 EMAIL_HINT_RE（EMAIL_RE 去掉用户名部分）；只在含提示的字符段内运行两条邮箱正则，结果与全文扫描相同
+EMAIL_HINT_RE = re.compile(r"(?:\[?at\]?|\(at\)|@)\s*[A-Za-z0-9.-]+\s*(?:\[?dot\]?|\(dot\)|\.|\s*\.\s*)[A-Za-z]{2}", re.I)
+EMAIL_RUN_RE = re.compile(r"[A-Za-z0-9._%+@\[\]()\s-]+", re.I)
+
+# 其余抽取器的前置过滤（与对应正则同样 re.I）：一个都不含则该正则不可能命中，直接跳过
+WECHAT_HINT_RE = re.compile(r"微信|weixin|wechat|vx|v信", re.I)
+QQ_HINT_RE = re.compile(r"qq|扣扣", re.I)
+TELEGRAM_HINT_RE = re.compile(r"t\.me|telegram", re.I)
+WHATSAPP_HINT_RE = re.compile(r"wa\.me|whatsapp", re.I)
+SOCIAL_HINT_RE = re.compile(r"http", re.I)
+
+
+def _email_spans(text: str) -> List[Tuple[int, int]]:
+    hints = [m.start() for m in EMAIL_HINT_RE.finditer(text)]
+    if not hints:
+        return []
+    spans = []
+    i = 0
+    for m in EMAIL_RUN_RE.finditer(text):
+        while i < len(hints) and hints[i] < m.start():
+            i += 1
+        if i == len(hints):
+            break
+        if hints[i] < m.end():
+            spans.append(m.span())
+    return spans
 
 
 def extract_emails(text: str) -> List[str]:
     emails = []
-    for m in EMAIL_RE.finditer(text or ""):
-        local, dom, tld = m.groups()
-        email = f"{local}@{dom}.{tld}"
-        email = EMAIL_CLEAN_RE.sub("", email)
-        emails.append(email)
-    for m in re.finditer(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text or ""):
-        emails.append(m.group(0))
+    text = text or ""
+    spans = _email_spans(text)
+    for start, end in spans:
+        for m in EMAIL_RE.finditer(text, start, end):
+            local, dom, tld = m.groups()
+            email = f"{local}@{dom}.{tld}"
+            email = EMAIL_CLEAN_RE.sub("", email)
+            emails.append(email)
+    for start, end in spans:
+        for m in EMAIL_PLAIN_RE.finditer(text, start, end):
+            emails.append(m.group(0))
     seen = set()
     uniq = []
     for e in emails:
@@ -41,15 +77,24 @@ def extract_phones(text: str, default_region: str = "CN") -> List[str]:
         candidates.add(m.group(0))
     results = []
     for c in candidates:
-        try:
-            parsed = phonenumbers.parse(c, default_region)
-            if phonenumbers.is_valid_number(parsed):
-                results.append(phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164))
-        except Exception:
-            continue
+        e164 = _validate_phone(c, default_region)
+        if e164:
+            results.append(e164)
     return sorted(set(results))
 
 
+@functools.lru_cache(maxsize=config.PHONE_CACHE_SIZE)
+def _validate_phone(candidate: str, region: str) -> Optional[str]:
+    # 日期、价格等数字串跨页面大量重复，校验结果做有界 LRU 记忆
+    try:
+        parsed = phonenumbers.parse(candidate, region)
+        if phonenumbers.is_valid_number(parsed):
+            return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+    except Exception:
+        pass
+    return None
+
+
 def extract_wechat(text: str) -> List[str]:
     res = []
     for m in WECHAT_RE.finditer(text or ""):
@@ -90,19 +135,26 @@ def extract_social_links(text: str) -> List[str]:
 
 
 def extract_all(text: str) -> List[Tuple[str, str]]:
+    # 用编译好的前置过滤决定跑哪些正则；输出与逐个抽取完全一致
+    text = text or ""
     pairs: List[Tuple[str, str]] = []
     for e in extract_emails(text):
         pairs.append(("email", e))
     for p in extract_phones(text):
         pairs.append(("phone", p))
-    for w in extract_wechat(text):
-        pairs.append(("wechat", w))
-    for q in extract_qq(text):
-        pairs.append(("qq", q))
-    for t in extract_telegram(text):
-        pairs.append(("telegram", t))
-    for w in extract_whatsapp(text):
-        pairs.append(("whatsapp", w))
-    for s in extract_social_links(text):
-        pairs.append(("social", s))
+    if WECHAT_HINT_RE.search(text):
+        for w in extract_wechat(text):
+            pairs.append(("wechat", w))
+    if QQ_HINT_RE.search(text):
+        for q in extract_qq(text):
+            pairs.append(("qq", q))
+    if TELEGRAM_HINT_RE.search(text):
+        for t in extract_telegram(text):
+            pairs.append(("telegram", t))
+    if WHATSAPP_HINT_RE.search(text):
+        for w in extract_whatsapp(text):
+            pairs.append(("whatsapp", w))
+    if SOCIAL_HINT_RE.search(text):
+        for s in extract_social_links(text):
+            pairs.append(("social", s))
     return pairs
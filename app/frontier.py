@@ -0,0 +1,151 @@
+import heapq
+import itertools
+import time
+import urllib.parse
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from . import config
+
+# 明显不是网页的资源后缀，入队前直接丢弃，避免浪费抓取配额
+SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp",
+    ".css", ".js", ".json", ".xml", ".rss",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".zip", ".rar", ".7z", ".gz", ".tar", ".exe", ".apk", ".dmg",
+    ".mp3", ".mp4", ".avi", ".mov", ".flv", ".wav",
+)
+
+
+class FrontierItem(NamedTuple):
+    url: str
+    depth: int
+    score: int
+
+
+def normalize_url(url: str) -> Optional[str]:
+    # 去掉片段、统一协议与主机大小写；非 http(s) 链接返回 None
+    try:
+        parsed = urllib.parse.urlsplit(url.strip())
+    except Exception:
+        return None
+    scheme = parsed.scheme.lower()
+    if scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    path = parsed.path or "/"
+    if path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+    return urllib.parse.urlunsplit((scheme, parsed.netloc.lower(), path, parsed.query, ""))
+
+
+def score_link(url: str, anchor: str = "") -> int:
+    # 链接路径与锚文本命中联系方式提示词越多，优先级越高
+    try:
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url).path).lower()
+    except Exception:
+        path = url.lower()
+    anchor = (anchor or "").lower()
+    score = 0
+    for hint in config.CONTACT_HINT_KEYWORDS:
+        h = hint.lower()
+        if h in path:
+            score += 1
+        if anchor and h in anchor:
+            score += 1
+    return score
+
+
+# 按主机分队列的待抓取集合：每个主机内部按优先级出队，主机之间按“下次允许抓取时间”排成就绪堆，
+# 只有此刻可抓的主机才会被分配并发名额；同时执行深度与每域页数预算
+class Frontier:
+    def __init__(self, domain_of: Callable[[str], str],
+                 max_depth: Optional[int] = None,
+                 max_pages_per_domain: Optional[int] = None):
+        self.domain_of = domain_of
+        self.max_depth = config.MAX_CRAWL_DEPTH if max_depth is None else max_depth
+        self.max_pages_per_domain = config.MAX_PAGES_PER_DOMAIN if max_pages_per_domain is None else max_pages_per_domain
+        self._hosts: Dict[str, List[Tuple[int, int, int, FrontierItem, str]]] = {}
+        # (就绪时间, 序号, 主机)；惰性校正，出堆时再确认真实等待时间
+        self._ready: List[Tuple[float, int, str]] = []
+        self._scheduled: Set[str] = set()
+        self._seq = itertools.count()
+        self._size = 0
+        self.seen: Set[str] = set()
+        self.domain_pages: Dict[str, int] = {}
+        # 主机因限速被推迟的起始时刻；取出该主机条目时算出 last_held（本条目因限速等待的秒数），供逐页追踪
+        self._held: Dict[str, float] = {}
+        self.last_held = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def host_count(self) -> int:
+        return len(self._scheduled)
+
+    def push(self, url: str, depth: int, anchor: str = "") -> bool:
+        if depth > self.max_depth:
+            return False
+        norm = normalize_url(url)
+        if not norm or norm in self.seen:
+            return False
+        domain = self.domain_of(norm)
+        if self.domain_pages.get(domain, 0) >= self.max_pages_per_domain:
+            return False
+        self.seen.add(norm)
+        score = score_link(norm, anchor)
+        item = FrontierItem(norm, depth, score)
+        host = urllib.parse.urlsplit(norm).netloc
+        heapq.heappush(self._hosts.setdefault(host, []), (-score, depth, next(self._seq), item, domain))
+        self._size += 1
+        if host not in self._scheduled:
+            self._scheduled.add(host)
+            heapq.heappush(self._ready, (time.monotonic(), next(self._seq), host))
+        return True
+
+    def _pop_host(self, host: str) -> Optional[FrontierItem]:
+        # 预算在出队时扣减：先出队的总是高分链接，低分链接不会挤占配额
+        queue = self._hosts.get(host)
+        while queue:
+            _, _, _, item, domain = heapq.heappop(queue)
+            self._size -= 1
+            used = self.domain_pages.get(domain, 0)
+            if used >= self.max_pages_per_domain:
+                continue
+            self.domain_pages[domain] = used + 1
+            return item
+        return None
+
+    def pop_ready(self, delay_of: Callable[[str], float]) -> Tuple[Optional[FrontierItem], Optional[float]]:
+        # 返回 (可立即抓取的条目, None)；没有就绪主机时返回 (None, 最短等待秒数)；全部为空返回 (None, None)
+        while self._ready:
+            ready_at, _, host = self._ready[0]
+            now = time.monotonic()
+            if ready_at > now:
+                return None, ready_at - now
+            heapq.heappop(self._ready)
+            if not self._hosts.get(host):
+                self._hosts.pop(host, None)
+                self._held.pop(host, None)
+                self._scheduled.discard(host)
+                continue
+            wait = delay_of(host)
+            if wait > 0:
+                self._held.setdefault(host, now)
+                heapq.heappush(self._ready, (now + wait, next(self._seq), host))
+                continue
+            held = self._held.pop(host, None)
+            self.last_held = now - held if held is not None else 0.0
+            item = self._pop_host(host)
+            if self._hosts.get(host):
+                heapq.heappush(self._ready, (now, next(self._seq), host))
+            else:
+                self._hosts.pop(host, None)
+                self._scheduled.discard(host)
+            if item is not None:
+                return item, None
+        return None, None
+
+    def pop(self) -> Optional[FrontierItem]:
+        # 不考虑主机节奏，直接取下一个条目
+        item, _ = self.pop_ready(lambda _host: 0.0)
+        return item
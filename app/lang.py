@@ -0,0 +1,74 @@
+import re
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from . import config
+
+# 中/英判定：在解析阶段得到的可见文本上统计汉字数与拉丁单词数（一个汉字约相当于一个英文单词），
+# 汉字占比达到 LANG_ZH_RATIO 判为中文。按块扫描，样本足够且结论明确时提前结束，长页面不必扫完。
+# 脚本、样式不在可见文本里，页脚零星几个汉字也不会把英文页判成中文。
+
+# 一次扫描同时匹配汉字串与拉丁单词：汉字串落在分组里，拉丁单词分组为空
+_SCRIPT_RE = re.compile(r"([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+)|[A-Za-z\u00c0-\u024f]{2,}")
+# 小块扫描：英文页约两块（六十来个词）即可得出结论，单词匹配是主要开销
+_CHUNK = 256
+
+
+def classify_text(text: str) -> Tuple[str, float]:
+    # 返回 (语言, 置信度 0~1)；没有任何文字时置信度为 0
+    threshold = config.LANG_ZH_RATIO
+    sample = config.LANG_SAMPLE_UNITS
+    cjk = words = 0
+    for start in range(0, len(text), _CHUNK):
+        # 块边界可能切开一个单词/汉字串，对计数的影响可以忽略
+        for run in _SCRIPT_RE.findall(text, start, start + _CHUNK):
+            if run:
+                cjk += len(run)
+            else:
+                words += 1
+        units = cjk + words
+        if units >= sample:
+            ratio = cjk / units
+            if ratio >= config.LANG_EARLY_ZH or ratio <= config.LANG_EARLY_EN:
+                break
+    units = cjk + words
+    if not units:
+        return 'en', 0.0
+    ratio = cjk / units
+    if ratio >= threshold:
+        lang, margin = 'zh', (ratio - threshold) / (1.0 - threshold)
+    else:
+        lang, margin = 'en', (threshold - ratio) / threshold
+    return lang, round(min(1.0, units / sample) * margin, 3)
+
+
+class DomainLang:
+    # 按站点记忆语言：高置信度的页面为所属语言累积权重；文字太少、判不准的页面（联系页、图片页）沿用站点结论
+    def __init__(self, max_domains: Optional[int] = None):
+        self.max_domains = max_domains or config.LANG_MEMO_MAX_DOMAINS
+        self._memo: "OrderedDict[str, list]" = OrderedDict()
+
+    def get(self, domain: str) -> Optional[Tuple[str, float]]:
+        entry = self._memo.get(domain)
+        if entry is None:
+            return None
+        zh, en = entry
+        total = zh + en
+        lang = 'zh' if zh >= en else 'en'
+        return lang, round(abs(zh - en) / total * min(1.0, total / config.LANG_CONFIDENT), 3)
+
+    def resolve(self, domain: str, lang: str, confidence: float) -> str:
+        if confidence >= config.LANG_CONFIDENT:
+            entry = self._memo.get(domain)
+            if entry is None:
+                entry = self._memo[domain] = [0.0, 0.0]
+                while len(self._memo) > self.max_domains:
+                    self._memo.popitem(last=False)
+            else:
+                self._memo.move_to_end(domain)
+            entry[0 if lang == 'zh' else 1] += confidence
+            return lang
+        known = self.get(domain)
+        if known is not None and known[1] > confidence:
+            return known[0]
+        return lang
@@ -1,98 +1,278 @@
 import asyncio
+import time
+import zlib
 from collections import deque
-from typing import Deque, Optional
+from typing import Deque, Dict, Optional
 
+import aiohttp
 from aiohttp import web
 import logging
 import os
-from . import config
+from . import config, metrics
 
+from .coordinator import LeaseBoard
 from .crawler import Crawler
-from .searchers import gather_seeds
-from .storage import get_conn, save_contact, ResultWriter, export_snapshot
+from .dedup import DedupIndex
+from .searchers import RedirectResolver, SerpCache, gather_seeds
+from .storage import (EXPORT_FIELDS, EXPORT_FILTERS, ReadPool, StorageWriter, contact_batches, encode_records, export_contacts,
+                      export_key, get_conn, get_read_conn, load_export_watermark, max_contact_id, query_contacts,
+                      query_domains, save_export_watermark)
+from .utils import create_session
+from .workers import WorkerPool
 
 
 class CrawlManager:
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, coordinator: bool = False):
         self.keywords: Deque[str] = deque()
-        self.active_keyword: Optional[str] = None
+        self.weights: Dict[str, float] = {}
+        # 正在运行的关键词流水线、预取中的种子任务与各关键词进度
+        self.active: Dict[str, asyncio.Task] = {}
+        self.prefetch: Dict[str, asyncio.Task] = {}
+        self.progress: Dict[str, Dict] = {}
         self.paused: Optional[asyncio.Event] = None
         self.running_task: Optional[asyncio.Task] = None
         self.conn = get_conn()
-        self.writer = ResultWriter()
-        self.crawler = Crawler()
+        self.dedup = DedupIndex()
+        # 批次写入失败时撤销去重登记，这些联系方式下次抽到仍会入库
+        self.store = StorageWriter(on_failed=self.dedup.forget)
+        # 查询接口走只读连接池，不与写入线程争锁
+        self.reads = ReadPool()
+        self.crawler = Crawler(conn=self.conn)
+        self.serp_cache = SerpCache(self.conn)
+        self.resolver = RedirectResolver(self.conn)
+        # workers>0 时本进程只做协调：种子按注册域名分发给子进程抓取，记录回到这里统一去重入库
+        workers = config.CRAWL_WORKERS if workers is None else workers
+        self.pool: Optional[WorkerPool] = WorkerPool(workers, self.crawler.extract_domain) if workers > 0 and not coordinator else None
+        # 协调者模式：抓取交给远程 node，按租约分发
+        self.board: Optional[LeaseBoard] = LeaseBoard(self.crawler.extract_domain) if coordinator else None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.slots: Optional[asyncio.Semaphore] = None
         self._lock: Optional[asyncio.Lock] = None
+        self._changed: Optional[asyncio.Event] = None
         self._last_round_done_ts: float = 0.0
+        # 自动循环：关键词 -> 最早可再次启动的时间（事件循环时钟）与连续失败次数
+        self.not_before: Dict[str, float] = {}
+        self.failures: Dict[str, int] = {}
+        metrics.ACTIVE_KEYWORDS.set_function(lambda: len(self.active))
+        metrics.QUEUED_KEYWORDS.set_function(lambda: len(self.keywords))
+        metrics.PAUSED.set_function(lambda: 1 if self.paused and self.paused.is_set() else 0)
+
+    @property
+    def active_keyword(self) -> Optional[str]:
+        return next(iter(self.active), None)
 
     def init_async(self):
         # 在事件循环已建立后创建 asyncio 原语，避免跨循环错误
         self.paused = asyncio.Event()
         self.paused.clear()
         self._lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+        # 全局并发预算：所有关键词的抓取共享
+        self.slots = asyncio.Semaphore(config.GLOBAL_CONCURRENCY)
+        # 长生命周期连接池：种子搜索、抓取与各轮调度共用
+        self.session = create_session()
+        if self.pool is not None:
+            self.pool.start()
+        # 后台线程预热去重索引，预热期间未命中的记录照常交给 SQLite 判重
+        self._warm_task = asyncio.get_running_loop().run_in_executor(None, self.dedup.warm)
 
     async def close(self):
+        for task in list(self.active.values()) + list(self.prefetch.values()):
+            task.cancel()
         try:
-            self.writer.close()
+            if self.session and not self.session.closed:
+                await self.session.close()
+            if self.pool is not None:
+                # 先停子进程并收完在途记录，再关闭写入线程
+                await self.pool.close()
         finally:
-            self.conn.close()
+            self.crawler.close()
+            try:
+                # 退出前排空写队列
+                await asyncio.get_running_loop().run_in_executor(None, self.store.close)
+            finally:
+                self.reads.close()
+                self.conn.close()
 
-    async def add_keyword(self, kw: str):
+    async def add_keyword(self, kw: str, weight: Optional[float] = None):
         async with self._lock:
             self.keywords.append(kw)
+            # 手动添加的关键词立即可调度，不受自动循环间隔限制
+            self.not_before.pop(kw, None)
+            if weight is not None:
+                self.weights[kw] = max(0.01, weight)
+        self._changed.set()
 
-    async def switch_keyword(self, kw: str):
+    async def switch_keyword(self, kw: str, weight: Optional[float] = None):
         async with self._lock:
             self.keywords.appendleft(kw)
-            self.active_keyword = None  # 让调度器立刻切换
+            self.not_before.pop(kw, None)
+            if weight is not None:
+                self.weights[kw] = max(0.01, weight)
+            # 流水线已满时让最早启动的关键词让位，调度器立刻切换
+            if kw not in self.active and len(self.active) >= config.KEYWORD_CONCURRENCY:
+                oldest = next(iter(self.active))
+                self.active[oldest].cancel()
+        self._changed.set()
 
     async def pause(self):
         if self.paused:
             self.paused.set()
+        if self.pool is not None:
+            self.pool.set_paused(True)
+        if self.board is not None:
+            self.board.set_paused(True)
+        await self.store.aflush()
 
     async def resume(self):
         if self.paused:
             self.paused.clear()
+        if self.pool is not None:
+            self.pool.set_paused(False)
+        if self.board is not None:
+            self.board.set_paused(False)
+        self._changed.set()
 
-    async def export(self) -> str:
-        return export_snapshot()
+    async def export(self, incremental: bool = False, filters: Optional[Dict] = None, compress: bool = False,
+                     name: str = 'snapshot') -> Dict:
+        await self.store.aflush()
+        # 导出读库写文件，放到线程中执行，不阻塞事件循环
+        return await asyncio.get_running_loop().run_in_executor(
+            None, lambda: export_contacts(incremental, name, filters, compress))
+
+    @property
+    def runner(self):
+        # 实际执行抓取的对象：远程租约 / 本机子进程 / 本进程，三者 crawl_urls 签名一致
+        if self.board is not None:
+            return self.board
+        if self.pool is not None:
+            return self.pool
+        return self.crawler
 
     async def _on_record(self, rec: dict):
-        inserted = save_contact(self.conn, rec)
-        if inserted:
-            self.writer.write_record(rec)
+        if self.dedup.seen(rec):
+            return
+        await self.store.submit(rec)
+
+    def _fair_share(self, kw: str) -> int:
+        # 按权重分配全局并发预算，每个关键词至少 1 个名额
+        total = sum(self.weights.get(k, 1.0) for k in self.active) or 1.0
+        return max(1, int(round(config.GLOBAL_CONCURRENCY * self.weights.get(kw, 1.0) / total)))
+
+    async def _seeds(self, kw: str):
+        return await gather_seeds(kw, session=self.session, cache=self.serp_cache, resolver=self.resolver)
+
+    async def _run_keyword(self, kw: str):
+        prog = {'state': 'seeding', 'weight': self.weights.get(kw, 1.0), 'seeds': 0, 'pages': 0,
+                'records': 0, 'started': time.time()}
+        self.progress[kw] = prog
+
+        async def on_record(rec: dict):
+            prog['records'] += 1
+            await self._on_record(rec)
+
+        try:
+            # 优先使用预取好的种子
+            task = self.prefetch.pop(kw, None)
+            seeds = None
+            if task is not None:
+                try:
+                    seeds = await task
+                except Exception:
+                    logging.warning("seed prefetch for %r failed, retrying", kw, exc_info=True)
+                    metrics.ERRORS.labels('seeds').inc()
+                    seeds = None
+            if seeds is None:
+                seeds = await self._seeds(kw)
+            prog['seeds'] = len(seeds)
+            prog['state'] = 'crawling'
+            await self.runner.crawl_urls(kw, seeds, on_record, paused_event=self.paused, session=self.session,
+                                          slots=self.slots, share=lambda: self._fair_share(kw), progress=prog)
+            prog['state'] = 'done'
+        except asyncio.CancelledError:
+            prog['state'] = 'preempted'
+        except Exception:
+            # 单轮异常不影响后续关键词：记日志与计数后继续
+            logging.exception("keyword %r failed", kw)
+            metrics.ERRORS.labels('keyword').inc()
+            prog['state'] = 'failed'
+        finally:
+            prog['finished'] = time.time()
+            async with self._lock:
+                self.active.pop(kw, None)
+                now = asyncio.get_event_loop().time()
+                self._last_round_done_ts = now
+                # 自动循环：把刚才的关键词重新放回队列尾部，实现持续采集；
+                # 至少间隔 AUTO_LOOP_INTERVAL_SEC 再启动，失败或没有种子时指数退避，避免空转打搜索引擎。
+                # 被 switch_keyword 抢占的关键词无论是否自动循环都放回队尾，稍后补完这一轮；已在队列中的不重复追加
+                if (config.AUTO_LOOP or prog['state'] == 'preempted') and kw and kw not in self.keywords:
+                    delay = self._loop_delay(kw, prog)
+                    self.not_before[kw] = now + delay
+                    prog['next_run'] = prog['finished'] + delay
+                    self.keywords.append(kw)
+            self._changed.set()
+
+    def _loop_delay(self, kw: str, prog: Dict) -> float:
+        if prog['state'] == 'preempted':
+            # 被抢占的关键词没跑完，让位后尽快续上
+            return 0.0
+        if prog['state'] == 'done' and prog['seeds'] > 0:
+            self.failures.pop(kw, None)
+            return float(config.AUTO_LOOP_INTERVAL_SEC)
+        fails = self.failures[kw] = self.failures.get(kw, 0) + 1
+        base = max(config.AUTO_LOOP_INTERVAL_SEC, config.AUTO_LOOP_RETRY_MIN_SEC)
+        return float(min(config.AUTO_LOOP_RETRY_MAX_SEC, base * 2 ** (fails - 1)))
+
+    def _due(self, kw: str, now: float) -> bool:
+        return self.not_before.get(kw, 0.0) <= now
 
     async def scheduler(self):
         while True:
+            if self.board is not None:
+                self.board.expire()
             # 暂停期间不调度
             while self.paused and self.paused.is_set():
                 await asyncio.sleep(0.2)
-            # 取关键词
             async with self._lock:
-                if not self.active_keyword:
-                    if self.keywords:
-                        self.active_keyword = self.keywords.popleft()
-                    else:
-                        # 自动循环：未暂停、开启自动循环时，每隔固定时间再复用上一次关键词
-                        if config.AUTO_LOOP and (asyncio.get_event_loop().time() - self._last_round_done_ts) >= config.AUTO_LOOP_INTERVAL_SEC and self.keywords:
-                            # 有排队关键词时会被上面的逻辑拾取
-                            pass
-                        await asyncio.sleep(0.5)
+                # 启动新的关键词流水线，直到达到并行上限；还没到再次启动时间的关键词留在队列里
+                now = asyncio.get_event_loop().time()
+                waiting: Deque[str] = deque()
+                while self.keywords and len(self.active) < config.KEYWORD_CONCURRENCY:
+                    kw = self.keywords.popleft()
+                    # 仍在运行的关键词（运行中又被添加）留在队列里，本轮结束后再启动
+                    if kw in self.active or not self._due(kw, now):
+                        waiting.append(kw)
                         continue
-                kw = self.active_keyword
-            # 拉取种子并抓取
+                    self.active[kw] = asyncio.ensure_future(self._run_keyword(kw))
+                self.keywords.extendleft(reversed(waiting))
+                # 为接下来排队（且已到启动时间）的关键词预取种子，抓取期间搜索引擎不闲置
+                upcoming = []
+                for kw in self.keywords:
+                    if kw not in self.active and kw not in upcoming and self._due(kw, now):
+                        upcoming.append(kw)
+                    if len(upcoming) >= config.SEED_PREFETCH:
+                        break
+                for kw in upcoming:
+                    if kw not in self.prefetch:
+                        self.prefetch[kw] = asyncio.ensure_future(self._seeds(kw))
+            self._changed.clear()
             try:
-                seeds = await gather_seeds(kw)
-                await self.crawler.crawl_urls(kw, seeds, self._on_record, paused_event=self.paused)
-            except Exception:
-                # 简化：忽略单轮异常，继续下一轮
-                await asyncio.sleep(0.5)
-            # 一轮结束，清空 active
-            async with self._lock:
-                self.active_keyword = None
-                self._last_round_done_ts = asyncio.get_event_loop().time()
-                # 自动循环：把刚才的关键词重新放回队列尾部，实现持续采集
-                if config.AUTO_LOOP and kw:
-                    self.keywords.append(kw)
+                await asyncio.wait_for(self._changed.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    def status(self) -> Dict:
+        return {
+            'paused': self.paused.is_set(),
+            'active_keyword': self.active_keyword,
+            'active_keywords': list(self.active),
+            'queue_size': len(self.keywords),
+            'prefetching': list(self.prefetch),
+            'keywords': self.progress,
+            'dedup': self.dedup.stats(),
+            'workers': self.pool.stats() if self.pool is not None else None,
+            'coordinator': self.board.stats() if self.board is not None else None,
+        }
 
 
 async def create_app(mgr: CrawlManager) -> web.Application:
@@ -107,34 +287,38 @@ async def create_app(mgr: CrawlManager) -> web.Application:
     async def handle_root(request):
         raise web.HTTPFound('/ui')
 
-    async def handle_add_keyword(request):
+    async def _keyword_params(request):
         kw = None
+        weight = None
         if request.method == 'POST':
             try:
                 data = await request.json()
                 kw = (data or {}).get('keyword')
+                weight = (data or {}).get('weight')
             except Exception:
                 kw = None
         if not kw:
             kw = request.query.get('keyword')
+        if weight is None:
+            weight = request.query.get('weight')
+        try:
+            weight = float(weight) if weight is not None else None
+        except (TypeError, ValueError):
+            weight = None
+        return kw, weight
+
+    async def handle_add_keyword(request):
+        kw, weight = await _keyword_params(request)
         if not kw:
             return web.json_response({'ok': False, 'error': 'keyword required'}, status=400)
-        await mgr.add_keyword(kw)
+        await mgr.add_keyword(kw, weight)
         return web.json_response({'ok': True})
 
     async def handle_switch_keyword(request):
-        kw = None
-        if request.method == 'POST':
-            try:
-                data = await request.json()
-                kw = (data or {}).get('keyword')
-            except Exception:
-                kw = None
-        if not kw:
-            kw = request.query.get('keyword')
+        kw, weight = await _keyword_params(request)
         if not kw:
             return web.json_response({'ok': False, 'error': 'keyword required'}, status=400)
-        await mgr.switch_keyword(kw)
+        await mgr.switch_keyword(kw, weight)
         return web.json_response({'ok': True})
 
     async def handle_pause(request):
@@ -145,16 +329,181 @@ async def create_app(mgr: CrawlManager) -> web.Application:
         await mgr.resume()
         return web.json_response({'ok': True})
 
+    def _export_params(request):
+        q = request.query
+        filters = {k: q[k] for k in EXPORT_FILTERS if q.get(k)}
+        # 默认全量；incremental=1 时只导出上次水位之后的新记录（full=1 仍强制全量）
+        incremental = q.get('incremental') in ('1', 'true') and q.get('full') not in ('1', 'true')
+        return filters, incremental, q.get('gzip') in ('1', 'true'), q.get('name') or 'snapshot'
+
     async def handle_export(request):
-        path = await mgr.export()
-        return web.json_response({'ok': True, 'path': path})
+        filters, incremental, compress, name = _export_params(request)
+        result = await mgr.export(incremental, filters, compress, name)
+        return web.json_response({'ok': True, **result})
+
+    async def handle_export_stream(request):
+        # 分块流式下载：按 id 分批读库、编码（可 gzip）都在线程中完成，事件循环只负责写出
+        filters, incremental, compress, name = _export_params(request)
+        loop = asyncio.get_running_loop()
+        await mgr.store.aflush()
+        key = export_key(name, filters)
+        # 显式给出 after_id 时由客户端自行管理游标，不推进服务端水位
+        cursor = request.query.get('after_id')
+        conn = await loop.run_in_executor(None, get_read_conn)
+        try:
+            if cursor is not None:
+                try:
+                    after_id = int(cursor)
+                except ValueError:
+                    return web.json_response({'ok': False, 'error': 'after_id must be an integer'}, status=400)
+            else:
+                after_id = await loop.run_in_executor(None, load_export_watermark, conn, key) if incremental else 0
+            upper_id = await loop.run_in_executor(None, max_contact_id, conn)
+            resp = web.StreamResponse(headers={
+                'Content-Type': 'application/gzip' if compress else 'application/x-ndjson; charset=utf-8',
+                'Content-Disposition': f'attachment; filename="contacts_{after_id}_{upper_id}.jsonl'
+                                       + ('.gz"' if compress else '"'),
+                'X-Export-From-Id': str(after_id),
+                'X-Export-To-Id': str(upper_id),
+            })
+            resp.enable_chunked_encoding()
+            await resp.prepare(request)
+            batches = iter(contact_batches(conn, after_id, upper_id, filters))
+            gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+            def _next_chunk():
+                recs = next(batches, None)
+                if recs is None:
+                    return (gz.flush() if gz is not None else b''), True
+                data = encode_records(recs)
+                return (gz.compress(data) if gz is not None else data), False
+
+            while True:
+                chunk, done = await loop.run_in_executor(None, _next_chunk)
+                if chunk:
+                    await resp.write(chunk)
+                if done:
+                    break
+        finally:
+            conn.close()
+
+        def _save_watermark():
+            wconn = get_conn()
+            try:
+                save_export_watermark(wconn, key, upper_id)
+            finally:
+                wconn.close()
+
+        # 增量下载完整发送后才推进水位，中途断开的下载下次会重新包含这些记录；全量下载不动水位
+        if cursor is None and incremental:
+            await loop.run_in_executor(None, _save_watermark)
+        await resp.write_eof()
+        return resp
+
+    def _query_params(request):
+        q = request.query
+        filters = {k: q[k] for k in EXPORT_FILTERS if q.get(k)}
+        # 简写别名：type、domain
+        if q.get('type'):
+            filters['contact_type'] = q['type']
+        if q.get('domain'):
+            filters['site_domain'] = q['domain']
+        if q.get('q'):
+            filters['q'] = q['q']
+        try:
+            limit = int(q.get('limit') or config.API_PAGE_SIZE)
+        except ValueError:
+            limit = config.API_PAGE_SIZE
+        return filters, max(1, min(limit, config.API_MAX_PAGE_SIZE))
+
+    async def handle_contacts(request):
+        filters, limit = _query_params(request)
+        cursor = request.query.get('cursor')
+        try:
+            cursor = int(cursor) if cursor else None
+        except ValueError:
+            return web.json_response({'ok': False, 'error': 'cursor must be an integer'}, status=400)
+        desc = request.query.get('order') == 'desc'
+        items, next_cursor = await mgr.reads.run(query_contacts, filters, cursor, limit, desc, mgr.reads.has_fts)
+        return web.json_response({'ok': True, 'items': items, 'next_cursor': next_cursor})
+
+    async def handle_domains(request):
+        filters, limit = _query_params(request)
+        items, next_cursor = await mgr.reads.run(query_domains, filters, request.query.get('cursor') or None, limit,
+                                                 mgr.reads.has_fts)
+        return web.json_response({'ok': True, 'items': items, 'next_cursor': next_cursor})
 
     async def handle_status(request):
-        return web.json_response({
-            'paused': mgr.paused.is_set(),
-            'active_keyword': mgr.active_keyword,
-            'queue_size': len(mgr.keywords),
-        })
+        return web.json_response(mgr.status())
+
+    async def handle_metrics(request):
+        return web.Response(text=metrics.REGISTRY.render(), content_type='text/plain')
+
+    def _coord_denied(request):
+        if mgr.board is None:
+            return web.json_response({'ok': False, 'error': 'coordinator disabled'}, status=400)
+        if config.COORD_TOKEN and request.headers.get('X-Crawler-Token') != config.COORD_TOKEN:
+            return web.json_response({'ok': False, 'error': 'forbidden'}, status=403)
+        return None
+
+    async def _coord_body(request) -> Optional[Dict]:
+        # node 发来的 JSON；格式不对返回 None，由调用方回 400
+        try:
+            data = await request.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _coord_records(records) -> Optional[list]:
+        # 远程记录只保留 7 个入库字段，且各字段须为字符串或空；否则整批拒绝（回 400），坏值不会进入写入线程
+        if not isinstance(records, list):
+            return None
+        out = []
+        for rec in records:
+            if not isinstance(rec, dict):
+                return None
+            row = {f: rec.get(f) for f in EXPORT_FIELDS}
+            if not all(v is None or isinstance(v, str) for v in row.values()):
+                return None
+            out.append(row)
+        return out
+
+    async def handle_coord_lease(request):
+        denied = _coord_denied(request)
+        if denied is not None:
+            return denied
+        data = await _coord_body(request)
+        if data is None:
+            return web.json_response({'ok': False, 'error': 'JSON object body required'}, status=400)
+        try:
+            count = max(1, int(data.get('count') or 1))
+        except (TypeError, ValueError):
+            return web.json_response({'ok': False, 'error': 'count must be an integer'}, status=400)
+        node = str(data.get('node') or request.remote)
+        leases = mgr.board.lease(node, count)
+        return web.json_response({'ok': True, 'leases': leases})
+
+    async def handle_coord_report(request):
+        denied = _coord_denied(request)
+        if denied is not None:
+            return denied
+        data = await _coord_body(request)
+        if data is None:
+            return web.json_response({'ok': False, 'error': 'JSON object body required'}, status=400)
+        lease_id = data.get('lease_id')
+        if not lease_id:
+            return web.json_response({'ok': False, 'error': 'lease_id required'}, status=400)
+        records = _coord_records(data.get('records') or [])
+        if records is None:
+            return web.json_response({'ok': False, 'error': 'records must be a list of objects with string fields'},
+                                     status=400)
+        try:
+            pages = int(data.get('pages') or 0)
+        except (TypeError, ValueError):
+            return web.json_response({'ok': False, 'error': 'pages must be an integer'}, status=400)
+        reply = await mgr.board.report(str(data.get('node') or request.remote), str(lease_id), records, pages,
+                                       bool(data.get('done')))
+        return web.json_response(reply)
 
     async def handle_ui(request):
         html = """
@@ -198,7 +547,13 @@ async function statusNow(){const r= await fetch('/status'); document.getElementB
         web.post('/resume', handle_resume),
         web.get('/export', handle_export),
         web.post('/export', handle_export),
+        web.get('/export/stream', handle_export_stream),
         web.get('/status', handle_status),
+        web.get('/metrics', handle_metrics),
+        web.get('/contacts', handle_contacts),
+        web.get('/domains', handle_domains),
+        web.post('/coord/lease', handle_coord_lease),
+        web.post('/coord/report', handle_coord_report),
     ])
 
     return app
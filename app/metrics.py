@@ -0,0 +1,284 @@
+import abc
+import bisect
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 轻量指标注册表（Prometheus 文本格式）：不引入额外依赖；
+# 计数/观测只是字典查找 + 整数加法，二分定位桶，常开对吞吐几乎无影响。
+# 标签子项在首次使用时创建并缓存，热路径上建议提前 labels(...) 拿到子项复用。
+# 多进程抓取时子进程用 drain() 取出增量随记录批次回传，协调者 merge() 后由 /metrics 统一输出。
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric(abc.ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional['Registry'] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], '_Metric'] = {}
+        (registry or REGISTRY).register(self)
+
+    @abc.abstractmethod
+    def _new_child(self) -> '_Metric':
+        ...
+
+    @abc.abstractmethod
+    def _drain(self):
+        # 取出自上次 drain 以来的增量（无变化返回 None）
+        ...
+
+    @abc.abstractmethod
+    def _merge(self, delta):
+        ...
+
+    def labels(self, *values) -> '_Metric':
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _series(self):
+        if self.labelnames:
+            return sorted(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._samples(self.name, self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional['Registry'] = None):
+        self.value = 0.0
+        if registry is False:
+            return
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self) -> 'Counter':
+        return Counter(self.name, self.help, registry=False)
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def _drain(self):
+        delta, self.value = self.value, 0.0
+        return delta or None
+
+    def _merge(self, delta):
+        self.value += delta
+
+    def _samples(self, name, names, values):
+        return [f"{name}{_label_str(names, values)} {_fmt(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional['Registry'] = None):
+        self.value = 0.0
+        self._sent = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+        if registry is False:
+            return
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self) -> 'Gauge':
+        return Gauge(self.name, self.help, registry=False)
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, fn: Callable[[], float]):
+        # 抓取时才求值，适合队列长度、去重条目数等已有状态
+        self._fn = fn
+
+    def _drain(self):
+        # 回传变化量而非绝对值，多个子进程的同名指标可直接相加；按函数求值的是本进程状态，不回传
+        if self._fn is not None:
+            return None
+        delta, self._sent = self.value - self._sent, self.value
+        return delta or None
+
+    def _merge(self, delta):
+        self.value += delta
+
+    def _samples(self, name, names, values):
+        value = self.value
+        if self._fn is not None:
+            try:
+                value = float(self._fn())
+            except Exception:
+                value = math.nan
+        return [f"{name}{_label_str(names, values)} {_fmt(value) if value == value else 'NaN'}"]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        if registry is False:
+            return
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self) -> 'Histogram':
+        return Histogram(self.name, self.help, buckets=self.buckets, registry=False)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def time(self) -> '_Timer':
+        return _Timer(self)
+
+    def _drain(self):
+        if not any(self.counts):
+            return None
+        delta = (self.counts, self.sum)
+        self.counts, self.sum = [0] * (len(self.buckets) + 1), 0.0
+        return delta
+
+    def _merge(self, delta):
+        counts, total = delta
+        if len(counts) != len(self.counts):
+            return
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+
+    def _samples(self, name, names, values):
+        out = []
+        acc = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            acc += n
+            out.append(f"{name}_bucket{_label_str(names, values, ('le', _fmt(bound)))} {acc}")
+        out.append(f"{name}_sum{_label_str(names, values)} {_fmt(self.sum)}")
+        out.append(f"{name}_count{_label_str(names, values)} {acc}")
+        return out
+
+
+class _Timer:
+    __slots__ = ('hist', 'start')
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def drain(self) -> List[Tuple[str, Tuple[str, ...], object]]:
+        # 子进程用：[(指标名, 标签值, 增量)]，取出后本地清零
+        out = []
+        for metric in self._metrics.values():
+            for values, child in metric._series():
+                delta = child._drain()
+                if delta is not None:
+                    out.append((metric.name, values, delta))
+        return out
+
+    def merge(self, deltas: List[Tuple[str, Tuple[str, ...], object]]):
+        for name, values, delta in deltas:
+            metric = self._metrics.get(name)
+            if metric is not None:
+                (metric.labels(*values) if metric.labelnames else metric)._merge(delta)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# ---- 抓取 ----
+ROBOTS_WAIT = Histogram('crawler_robots_wait_seconds', 'Time spent resolving robots.txt before a fetch')
+RATELIMIT_WAIT = Histogram('crawler_ratelimit_wait_seconds', 'Time spent waiting for per-host rate limits',
+                           ['where'])
+FETCH_LATENCY = Histogram('crawler_fetch_seconds', 'Page fetch latency until headers received')
+FETCH_TOTAL = Counter('crawler_fetch_total', 'Page fetches by outcome', ['result'])
+FETCH_BYTES = Counter('crawler_fetch_bytes_total', 'Response body bytes read')
+PARSE_TIME = Histogram('crawler_parse_seconds', 'HTML parse time per page (in the parse worker)')
+EXTRACT_TIME = Histogram('crawler_extract_seconds', 'Contact extraction time per page (in the parse worker)')
+PAGE_TIME = Histogram('crawler_page_seconds', 'End-to-end time per page, fetch through records')
+INFLIGHT = Gauge('crawler_inflight_pages', 'Pages currently being fetched or processed')
+RECORDS = Counter('crawler_records_total', 'Contact records produced by the crawler')
+ERRORS = Counter('crawler_errors_total', 'Errors caught and skipped, by stage', ['stage'])
+
+# ---- 搜索 ----
+SERP_FETCH = Histogram('searcher_fetch_seconds', 'Search result page fetch latency', ['engine'])
+SERP_PAGES = Counter('searcher_pages_total', 'Search result pages by source', ['engine', 'source'])
+SEED_YIELD = Counter('searcher_seeds_total', 'Seed URLs produced per engine', ['engine'])
+REDIRECTS = Counter('searcher_redirects_total', 'Result redirect resolutions by source', ['source'])
+
+# ---- 存储与去重 ----
+INSERT_BATCH = Histogram('storage_insert_batch_seconds', 'Write-behind batch commit latency')
+INSERT_ROWS = Counter('storage_rows_total', 'Contact rows submitted to storage by outcome', ['result'])
+STORAGE_QUEUE = Gauge('storage_queue_depth', 'Records waiting in the write-behind queue')
+DEDUP_LOOKUPS = Counter('dedup_lookups_total', 'In-memory dedup lookups', ['result'])
+DEDUP_ENTRIES = Gauge('dedup_entries', 'Keys held by the in-memory dedup index')
+
+# ---- 页面归档 ----
+ARCHIVE_PAGES = Counter('archive_pages_total', 'Fetched pages handed to the raw page archive by outcome', ['result'])
+ARCHIVE_BYTES = Counter('archive_bytes_total', 'Compressed bytes appended to archive segments')
+
+# ---- 调度 ----
+ACTIVE_KEYWORDS = Gauge('scheduler_active_keywords', 'Keyword pipelines currently running')
+QUEUED_KEYWORDS = Gauge('scheduler_queued_keywords', 'Keywords waiting in the queue')
+PAUSED = Gauge('scheduler_paused', '1 when crawling is paused')
@@ -0,0 +1,196 @@
+import asyncio
+import concurrent.futures
+import time
+import urllib.parse
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup, NavigableString
+from bs4.element import Comment, Declaration, Doctype, ProcessingInstruction
+
+from . import config
+from .extractors import extract_all
+from .lang import classify_text
+from .utils import clean_text
+
+# lxml 可选：安装后使用更快的 C 解析器，否则回退到 html.parser
+try:
+    import lxml.html as lxml_html
+    from lxml import etree as lxml_etree
+except Exception:
+    lxml_html = None
+    lxml_etree = None
+
+# 不属于可见文本的标签；JSON-LD 里常有 email/telephone，单独保留
+HIDDEN_TAGS = {"script", "style", "template"}
+SKIP_HREF_PREFIXES = ("#", "javascript:", "mailto:", "tel:")
+
+
+class ParsedPage(NamedTuple):
+    title: str
+    links: List[Tuple[str, str]]
+    pairs: List[Tuple[str, str]]
+    # 在解析进程内计时，随结果带回主进程记指标
+    parse_time: float = 0.0
+    extract_time: float = 0.0
+    # 基于可见文本的语言判定，主进程再结合站点记忆决定最终 lang
+    lang: str = 'en'
+    lang_confidence: float = 0.0
+
+
+def _is_ld_json(tag_type: Optional[str]) -> bool:
+    return (tag_type or "").strip().lower() == "application/ld+json"
+
+
+def _keep_link(href: Optional[str]) -> bool:
+    return bool(href) and not href.startswith(SKIP_HREF_PREFIXES)
+
+
+def _parse_lxml(html: str, base_url: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+    doc = lxml_html.document_fromstring(html)
+    title_el = doc.find(".//title")
+    title = clean_text(title_el.text_content() if title_el is not None else "")
+    texts = [title]
+    links: List[Tuple[str, str]] = []
+    # start 事件取元素自身文本，end 事件取尾随文本，保证与文档顺序一致
+    for event, el in lxml_etree.iterwalk(doc, events=("start", "end", "comment", "pi")):
+        tag = el.tag
+        if not isinstance(tag, str):
+            # 注释/处理指令自身不算正文，只保留尾随文本
+            if el.tail and not el.tail.isspace():
+                texts.append(el.tail)
+            continue
+        if event == "end":
+            if el.tail and not el.tail.isspace():
+                texts.append(el.tail)
+            continue
+        tag = tag.lower()
+        if tag == "script":
+            if _is_ld_json(el.get("type")) and el.text:
+                texts.append(el.text)
+        elif tag not in HIDDEN_TAGS:
+            if el.text and not el.text.isspace():
+                texts.append(el.text)
+        if tag == "a":
+            href = (el.get("href") or "").strip()
+            if _keep_link(href):
+                links.append((urllib.parse.urljoin(base_url, href), clean_text(" ".join(el.itertext()))))
+    return title, "\n".join(texts), links
+
+
+def _parse_bs4(html: str, base_url: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+    soup = BeautifulSoup(html, "html.parser")
+    title = clean_text(soup.title.text if soup.title else "")
+    texts = [title]
+    links: List[Tuple[str, str]] = []
+    for node in soup.descendants:
+        if isinstance(node, NavigableString):
+            if isinstance(node, (Comment, Declaration, Doctype, ProcessingInstruction)):
+                continue
+            parent = node.parent.name if node.parent is not None else ""
+            if parent == "script":
+                if not _is_ld_json(node.parent.get("type")):
+                    continue
+            elif parent in HIDDEN_TAGS:
+                continue
+            if node and not node.isspace():
+                texts.append(str(node))
+        elif node.name == "a":
+            href = (node.get("href") or "").strip()
+            if _keep_link(href):
+                links.append((urllib.parse.urljoin(base_url, href), clean_text(node.get_text(" "))))
+    return title, "\n".join(texts), links
+
+
+def parse_html(html: str, base_url: str = "") -> Tuple[str, str, List[Tuple[str, str]]]:
+    # 单次遍历返回 (标题, 可见文本, [(链接, 锚文本)])
+    if lxml_html is not None:
+        try:
+            return _parse_lxml(html, base_url)
+        except Exception:
+            pass
+    return _parse_bs4(html, base_url)
+
+
+def analyze_page(html: str, base_url: str = "") -> ParsedPage:
+    started = time.perf_counter()
+    title, text, links = parse_html(html, base_url)
+    parsed = time.perf_counter()
+    pairs = extract_all(text)
+    lang, confidence = classify_text(text)
+    return ParsedPage(title, links, pairs, parsed - started, time.perf_counter() - parsed, lang, confidence)
+
+
+def analyze_batch(items: List[Tuple[str, str]]) -> List[ParsedPage]:
+    # 进程池任务入口：批量提交以摊薄进程间通信开销
+    return [analyze_page(html, url) for html, url in items]
+
+
+# 把解析与抽取放到进程池，避免大页面阻塞事件循环；PARSE_WORKERS=0 时退回线程池，负数时在本线程内同步执行
+class ParsePool:
+    def __init__(self, workers: Optional[int] = None, batch_size: Optional[int] = None):
+        self.workers = config.PARSE_WORKERS if workers is None else workers
+        self.batch_size = max(1, config.PARSE_BATCH_SIZE if batch_size is None else batch_size)
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._batch: List[Tuple[str, str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def analyze(self, html: str, url: str) -> ParsedPage:
+        if self.workers < 0:
+            # 负数：直接在事件循环线程内解析，仅用于剖析（cProfile 只统计当前线程）
+            return analyze_page(html, url)
+        loop = asyncio.get_running_loop()
+        if self.workers == 0:
+            return await loop.run_in_executor(None, analyze_page, html, url)
+        fut = loop.create_future()
+        self._batch.append((html, url, fut))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(config.PARSE_BATCH_DELAY, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        try:
+            cf = self._get_executor().submit(analyze_batch, [(h, u) for h, u, _ in batch])
+        except Exception as e:
+            # 进程池损坏（子进程被杀等）：丢弃后下次重建
+            self._executor = None
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        def _deliver(done: asyncio.Future):
+            exc = done.exception() if not done.cancelled() else asyncio.CancelledError()
+            if exc is not None:
+                if isinstance(exc, BrokenProcessPool):
+                    self._executor = None
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                return
+            for (_, _, fut), page in zip(batch, done.result()):
+                if not fut.done():
+                    fut.set_result(page)
+
+        asyncio.wrap_future(cf).add_done_callback(_deliver)
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
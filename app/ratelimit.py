@@ -0,0 +1,88 @@
+import email.utils
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from . import config
+from .utils import RateLimiter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After 可以是秒数或 HTTP 日期
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            dt = email.utils.parsedate_to_datetime(value)
+        except Exception:
+            return None
+        if dt is None:
+            return None
+        seconds = dt.timestamp() - time.time()
+    return min(max(seconds, 0.0), config.RATE_MAX_RETRY_AFTER)
+
+
+# 单主机自适应限速：遵守 robots Crawl-delay；429/503 乘性退避并按 Retry-After 暂停；
+# 响应快时加性提速，直到上限
+class HostLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__(config.PER_HOST_RATE_LIMIT)
+        self.ceiling = config.RATE_LIMIT_MAX_PER_HOST
+        self.crawl_delay: Optional[float] = None
+
+    def set_crawl_delay(self, delay: Optional[float]):
+        if delay is None or delay == self.crawl_delay:
+            return
+        self.crawl_delay = delay
+        if delay > 0:
+            self.ceiling = min(config.RATE_LIMIT_MAX_PER_HOST, 1.0 / delay)
+            if self.rate > self.ceiling:
+                self.set_rate(self.ceiling)
+
+    def on_response(self, status: int, latency: float, retry_after: Optional[str] = None):
+        now = time.monotonic()
+        if status in (429, 503):
+            self.set_rate(max(config.RATE_LIMIT_MIN_PER_HOST, self.rate * config.RATE_BACKOFF_FACTOR))
+            pause = parse_retry_after(retry_after)
+            if pause is None:
+                pause = 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+        elif status == 0 or latency >= config.RATE_SLOW_LATENCY:
+            # 超时/连接失败或响应很慢：适度降速
+            self.set_rate(max(config.RATE_LIMIT_MIN_PER_HOST, self.rate * config.RATE_SLOW_FACTOR))
+        elif status < 400 and latency <= config.RATE_FAST_LATENCY and self.rate < self.ceiling:
+            self.set_rate(min(self.ceiling, self.rate + config.RATE_SPEEDUP_STEP))
+
+
+# 主机 -> 限速器，LRU 有界并淘汰长时间空闲的主机
+class DomainLimiter:
+    def __init__(self, max_hosts: Optional[int] = None, idle_sec: Optional[float] = None):
+        self.max_hosts = config.RATE_LIMITER_MAX_HOSTS if max_hosts is None else max_hosts
+        self.idle_sec = config.RATE_IDLE_EVICT_SEC if idle_sec is None else idle_sec
+        self.limiters: "OrderedDict[str, HostLimiter]" = OrderedDict()
+
+    def get(self, host: str) -> HostLimiter:
+        lim = self.limiters.get(host)
+        if lim is None:
+            self._evict()
+            lim = HostLimiter()
+            self.limiters[host] = lim
+        else:
+            self.limiters.move_to_end(host)
+        return lim
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.limiters:
+            host, lim = next(iter(self.limiters.items()))
+            idle = now - lim.last_used > self.idle_sec and lim.blocked_until < now
+            if idle or len(self.limiters) >= self.max_hosts:
+                self.limiters.popitem(last=False)
+                continue
+            break
+
+    def __len__(self) -> int:
+        return len(self.limiters)
@@ -0,0 +1,317 @@
+import array
+import bisect
+import glob
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import config
+from .utils import pid_alive
+
+# 分段结果日志：中/英文各一个目录，每段仍是原来的 JSON 行格式（NNNNNNNN-<pid>.jsonl），
+# 写满 RESULTS_SEGMENT_BYTES 或超过 RESULTS_SEGMENT_SEC 后封段并换下一段。
+# 文件名带写入进程的 pid：服务、cli start、reextract 等多个写入方同时运行也不会写到同一段；
+# 按文件名排序即按序号先后（旧版迁移来的段没有 pid 后缀）。
+# 每段两个旁路文件：
+#   .pos  每条记录一对 float64（行偏移, 写入时间），随批次 flush 追加，未封段时也可按时间定位；
+#         段内时间按二分查找，因此写入时间取不小于上一条的值（系统时钟回拨期间沿用上一条的时间）
+#   .idx  封段时写出的 JSON：关键词 / 站点域名 -> 记录序号，以及首末时间（整段跳过用）
+# 读取方按索引挑出记录序号，再用 mmap 直接跳到对应行。
+
+LANGS = ('zh', 'en')
+IDX_VERSION = 1
+
+
+def lang_of(rec: Dict) -> str:
+    return 'zh' if (rec.get('lang') or '').lower().startswith('zh') else 'en'
+
+
+def _sidecar(path: str, ext: str) -> str:
+    return path[: -len('.jsonl')] + ext
+
+
+def _segment_pid(path: str) -> Optional[int]:
+    _, _, pid = os.path.basename(path)[: -len('.jsonl')].partition('-')
+    return int(pid) if pid.isdigit() else None
+
+
+def _written_elsewhere(path: str) -> bool:
+    # 其他仍在运行的进程正在写的段：不能替它补索引（会覆盖它的 .pos）
+    pid = _segment_pid(path)
+    return pid is not None and pid != os.getpid() and pid_alive(pid)
+
+
+def _load_pos(path: str) -> Tuple[array.array, array.array]:
+    # 返回 (偏移, 时间)；文件末尾的半条（写入中断）忽略
+    pos = array.array('d')
+    try:
+        with open(_sidecar(path, '.pos'), 'rb') as fp:
+            data = fp.read()
+        pos.frombytes(data[: len(data) // 16 * 16])
+    except FileNotFoundError:
+        pass
+    return pos[0::2], pos[1::2]
+
+
+def _write_index(path: str, ts: List[float], keyword: Dict[str, List[int]], site_domain: Dict[str, List[int]]):
+    idx = {'version': IDX_VERSION, 'count': len(ts), 'first_ts': ts[0] if ts else 0.0,
+           'last_ts': ts[-1] if ts else 0.0, 'keyword': keyword, 'site_domain': site_domain}
+    target = _sidecar(path, '.idx')
+    tmp = target + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fp:
+        json.dump(idx, fp, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, target)
+
+
+def rebuild_index(path: str):
+    # 为未正常封段的段（进程被杀、旧版单文件迁移）补写索引；.pos 缺失的记录按文件修改时间计
+    offsets, stamps = _load_pos(path)
+    known = dict(zip(offsets, stamps))
+    fallback = os.path.getmtime(path)
+    pos = array.array('d')
+    ts: List[float] = []
+    keyword: Dict[str, List[int]] = {}
+    site_domain: Dict[str, List[int]] = {}
+    offset = 0
+    last = 0.0
+    with open(path, 'rb') as fp:
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                offset += len(line)
+                continue
+            n = len(ts)
+            stamp = last = max(last, known.get(float(offset), fallback))
+            pos.extend((offset, stamp))
+            ts.append(stamp)
+            keyword.setdefault(rec.get('keyword') or '', []).append(n)
+            site_domain.setdefault(rec.get('site_domain') or '', []).append(n)
+            offset += len(line)
+    with open(_sidecar(path, '.pos'), 'wb') as fp:
+        pos.tofile(fp)
+    _write_index(path, ts, keyword, site_domain)
+
+
+class _ActiveSegment:
+    def __init__(self, path: str):
+        self.path = path
+        self.fp = open(path, 'ab', buffering=1 << 16)
+        self.pos_fp = open(_sidecar(path, '.pos'), 'ab')
+        self.size = self.fp.tell()
+        self.opened = time.time()
+        self.ts: List[float] = []
+        self.keyword: Dict[str, List[int]] = {}
+        self.site_domain: Dict[str, List[int]] = {}
+        self._pos = array.array('d')
+
+    def append(self, rec: Dict) -> bytes:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode('utf-8')
+        n = len(self.ts)
+        now = max(time.time(), self.ts[-1]) if self.ts else time.time()
+        self._pos.extend((self.size, now))
+        self.ts.append(now)
+        self.keyword.setdefault(rec.get('keyword') or '', []).append(n)
+        self.site_domain.setdefault(rec.get('site_domain') or '', []).append(n)
+        self.fp.write(line)
+        self.size += len(line)
+        return line
+
+    def flush(self):
+        # 先落记录再落位置，读取方看到的位置一定指向完整的行
+        self.fp.flush()
+        if self._pos:
+            self._pos.tofile(self.pos_fp)
+            self.pos_fp.flush()
+            self._pos = array.array('d')
+
+    def seal(self):
+        self.flush()
+        self.fp.close()
+        self.pos_fp.close()
+        _write_index(self.path, self.ts, self.keyword, self.site_domain)
+
+
+class ResultWriter:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or config.RESULTS_DIR
+        self.segment_bytes = config.RESULTS_SEGMENT_BYTES
+        self.segment_sec = config.RESULTS_SEGMENT_SEC
+        self.active: Dict[str, _ActiveSegment] = {}
+        self.mirror = config.RESULTS_LEGACY_MIRROR
+        self._legacy: Dict[str, List[bytes]] = {}
+        for lang in LANGS:
+            lang_dir = os.path.join(self.directory, lang)
+            os.makedirs(lang_dir, exist_ok=True)
+            self._adopt_legacy(lang, lang_dir)
+            for path in sorted(glob.glob(os.path.join(lang_dir, '*.jsonl'))):
+                # 上次未封段（异常退出）的段补写索引，本次从新段开始写
+                if not os.path.exists(_sidecar(path, '.idx')) and not _written_elsewhere(path):
+                    rebuild_index(path)
+            if self.mirror:
+                self._legacy[lang] = []
+
+    @staticmethod
+    def _legacy_path(lang: str) -> str:
+        return config.RESULTS_ZH if lang == 'zh' else config.RESULTS_EN
+
+    def _adopt_legacy(self, lang: str, lang_dir: str):
+        # 旧版的 results_zh.txt / results_en.txt 复制为首段再补索引；旧文件原样保留，
+        # 兼容镜像开启时继续追加，关闭时不再更新
+        legacy = self._legacy_path(lang)
+        if not os.path.exists(legacy) or glob.glob(os.path.join(lang_dir, '*.jsonl')):
+            return
+        if os.path.getsize(legacy) > 0:
+            target = os.path.join(lang_dir, f"{0:08d}.jsonl")
+            logging.info("copying %s to %s", legacy, target)
+            tmp = target + '.tmp'
+            shutil.copyfile(legacy, tmp)
+            os.replace(tmp, target)
+            rebuild_index(target)
+            if not self.mirror:
+                logging.warning("%s is no longer updated; results are written to %s (CRAWLER_RESULTS_LEGACY=0)",
+                                legacy, lang_dir)
+
+    def _next_path(self, lang: str) -> str:
+        # 序号取目录内现有段的最大值 + 1（其他写入方新开的段也计入），再带上本进程 pid
+        lang_dir = os.path.join(self.directory, lang)
+        names = [os.path.basename(p) for p in glob.glob(os.path.join(lang_dir, '*.jsonl'))]
+        seq = max((int(n[:8]) for n in names if n[:8].isdigit()), default=0) + 1
+        while True:
+            path = os.path.join(lang_dir, f"{seq:08d}-{os.getpid()}.jsonl")
+            if not os.path.exists(path):
+                return path
+            seq += 1
+
+    def _segment(self, lang: str) -> _ActiveSegment:
+        seg = self.active.get(lang)
+        if seg is not None and (seg.size >= self.segment_bytes or time.time() - seg.opened >= self.segment_sec):
+            seg.seal()
+            seg = None
+        if seg is None:
+            seg = _ActiveSegment(self._next_path(lang))
+            self.active[lang] = seg
+        return seg
+
+    def write_record(self, record: Dict):
+        lang = lang_of(record)
+        line = self._segment(lang).append(record)
+        if self.mirror:
+            self._legacy[lang].append(line)
+
+    def flush(self):
+        for seg in self.active.values():
+            seg.flush()
+        # 旧路径可能有多个写入方：每批整行一次追加写入，不会出现半行交错
+        for lang, lines in self._legacy.items():
+            if lines:
+                with open(self._legacy_path(lang), 'ab') as fp:
+                    fp.write(b''.join(lines))
+                lines.clear()
+
+    def close(self):
+        for seg in self.active.values():
+            try:
+                seg.seal()
+            except Exception:
+                logging.exception("sealing result segment %s failed", seg.path)
+        self.active.clear()
+        self.flush()
+        self._legacy.clear()
+
+
+def _intersect(a: List[int], b: List[int]) -> List[int]:
+    if len(a) > len(b):
+        a, b = b, a
+    members = set(b)
+    return [n for n in a if n in members]
+
+
+class ResultReader:
+    def __init__(self, directory: Optional[str] = None, cache_size: int = 64):
+        self.directory = directory or config.RESULTS_DIR
+        self.cache_size = cache_size
+        # 段路径 -> (idx, 偏移, 时间)；已封段不可变，可放心缓存
+        self._cache: "OrderedDict[str, Tuple[Dict, array.array, array.array]]" = OrderedDict()
+
+    def segments(self, lang: Optional[str] = None) -> List[str]:
+        langs = [lang] if lang else LANGS
+        return [p for l in langs for p in sorted(glob.glob(os.path.join(self.directory, l, '*.jsonl')))]
+
+    def _sealed(self, path: str) -> Optional[Tuple[Dict, array.array, array.array]]:
+        entry = self._cache.get(path)
+        if entry is not None:
+            self._cache.move_to_end(path)
+            return entry
+        try:
+            with open(_sidecar(path, '.idx'), encoding='utf-8') as fp:
+                idx = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return None
+        entry = (idx, *_load_pos(path))
+        self._cache[path] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    def query(self, keyword: Optional[str] = None, site_domain: Optional[str] = None, lang: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None, limit: Optional[int] = None) -> Iterator[Dict]:
+        # 时间为 unix 秒，区间 [since, until)
+        count = 0
+        for path in self.segments(lang):
+            sealed = self._sealed(path)
+            if sealed is not None:
+                idx, offsets, stamps = sealed
+                if not idx['count'] or (since is not None and idx['last_ts'] < since) or \
+                        (until is not None and idx['first_ts'] >= until):
+                    continue
+            else:
+                # 正在写的段没有 idx：按 .pos 定位时间，关键词/域名逐行核对
+                idx, (offsets, stamps) = None, _load_pos(path)
+            lo = bisect.bisect_left(stamps, since) if since is not None else 0
+            hi = bisect.bisect_left(stamps, until) if until is not None else len(stamps)
+            if lo >= hi:
+                continue
+            picks: Optional[List[int]] = None
+            if idx is not None:
+                for field, value in (('keyword', keyword), ('site_domain', site_domain)):
+                    if value is not None:
+                        postings = idx[field].get(value, [])
+                        picks = postings if picks is None else _intersect(picks, postings)
+                if picks is not None:
+                    picks = [n for n in picks if lo <= n < hi]
+            ordinals = picks if picks is not None else range(lo, hi)
+            for rec in self._read(path, offsets, ordinals):
+                if idx is None and ((keyword is not None and rec.get('keyword') != keyword) or
+                                    (site_domain is not None and rec.get('site_domain') != site_domain)):
+                    continue
+                yield rec
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+    @staticmethod
+    def _read(path: str, offsets: array.array, ordinals) -> Iterator[Dict]:
+        if not ordinals:
+            return
+        with open(path, 'rb') as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for n in ordinals:
+                    start = int(offsets[n])
+                    end = mm.find(b"\n", start)
+                    if end < 0:
+                        break
+                    try:
+                        yield json.loads(mm[start:end])
+                    except ValueError:
+                        continue
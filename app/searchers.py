@@ -1,12 +1,19 @@
 import asyncio
+import json
 import re
-from typing import List
+import sqlite3
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 from bs4 import BeautifulSoup
 
-from . import config
-from .utils import pick_user_agent
+from . import config, metrics
+from .storage import (load_redirect, load_serp_pages, prune_redirects, prune_serp_cache, save_redirects,
+                      save_serp_page)
+from .utils import pick_user_agent, create_session
 
 HEADERS_BASE = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
@@ -20,12 +27,102 @@ async def fetch_text(session: aiohttp.ClientSession, url: str) -> str:
         return await resp.text(errors="ignore")
 
 
-async def resolve_redirects(session: aiohttp.ClientSession, url: str) -> str:
+META_REFRESH_RE = re.compile(r"""(?:url\s*=\s*['"]?|location(?:\.href)?(?:\.replace\()?\s*=?\s*\(?['"])(https?://[^'"\s>)]+)""", re.I)
+
+
+async def resolve_redirects(session: aiohttp.ClientSession, url: str, max_hops: int = 5) -> str:
+    # 手动跟随跳转且不读取正文：一旦跳出搜索引擎域名就停止，目标页留给爬虫抓取
+    origin = urllib.parse.urlsplit(url).netloc.lower()
+    current = url
     try:
-        async with session.get(url, allow_redirects=True, timeout=10, headers={"User-Agent": pick_user_agent(), **HEADERS_BASE}) as resp:
-            return str(resp.url)
+        for _ in range(max_hops):
+            async with session.get(current, allow_redirects=False, timeout=10,
+                                   headers={"User-Agent": pick_user_agent(), **HEADERS_BASE}) as resp:
+                if resp.status in (301, 302, 303, 307, 308):
+                    location = resp.headers.get("Location")
+                    if not location:
+                        return current
+                    current = urllib.parse.urljoin(current, location)
+                    if urllib.parse.urlsplit(current).netloc.lower() != origin:
+                        return current
+                    continue
+                if resp.status == 200 and urllib.parse.urlsplit(current).netloc.lower() == origin:
+                    # 部分跳转页用 meta refresh / JS 跳转，只读开头一小段
+                    head = await resp.content.read(config.REDIRECT_SNIFF_BYTES)
+                    m = META_REFRESH_RE.search(head.decode("utf-8", errors="ignore"))
+                    if m:
+                        return m.group(1)
+                return current
     except Exception:
         return url
+    return current
+
+
+# 跳转解析器：按搜索源限制并发，src→target 映射内存 LRU + 持久化到 state.sqlite
+class RedirectResolver:
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        self.conn = conn
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._pending: List[Tuple[str, str, float]] = []
+
+    def _sem(self, engine: str) -> asyncio.Semaphore:
+        sem = self._sems.get(engine)
+        if sem is None:
+            sem = asyncio.Semaphore(config.REDIRECT_CONCURRENCY_PER_ENGINE)
+            self._sems[engine] = sem
+        return sem
+
+    def _lookup(self, src: str) -> Optional[str]:
+        target = self.cache.get(src)
+        if target is not None:
+            self.cache.move_to_end(src)
+            return target
+        if self.conn is None:
+            return None
+        try:
+            row = load_redirect(self.conn, src, config.REDIRECT_TTL)
+        except Exception:
+            return None
+        if row:
+            self._remember(src, row)
+            return row
+        return None
+
+    def _remember(self, src: str, target: str):
+        self.cache[src] = target
+        self.cache.move_to_end(src)
+        while len(self.cache) > config.REDIRECT_CACHE_MAX:
+            self.cache.popitem(last=False)
+
+    async def resolve(self, session: aiohttp.ClientSession, engine: str, src: str) -> str:
+        target = self._lookup(src)
+        if target is not None:
+            metrics.REDIRECTS.labels('cache').inc()
+            return target
+        async with self._sem(engine):
+            target = await resolve_redirects(session, src)
+        metrics.REDIRECTS.labels('resolved' if target != src else 'failed').inc()
+        if target != src:
+            # 解析失败（返回原链接）不缓存，下次再试
+            self._remember(src, target)
+            self._pending.append((src, target, time.time()))
+        return target
+
+    async def resolve_many(self, session: aiohttp.ClientSession, engine: str, urls: List[str]) -> List[str]:
+        res = await asyncio.gather(*[self.resolve(session, engine, u) for u in urls], return_exceptions=True)
+        self.flush()
+        return [r for r in res if isinstance(r, str)]
+
+    def flush(self):
+        if not self._pending or self.conn is None:
+            self._pending.clear()
+            return
+        rows, self._pending = self._pending, []
+        try:
+            save_redirects(self.conn, rows)
+        except Exception:
+            pass
 
 
 def extract_links_from_html(html: str) -> List[str]:
@@ -38,99 +135,224 @@ def extract_links_from_html(html: str) -> List[str]:
     return links
 
 
-async def search_duckduckgo(session: aiohttp.ClientSession, keyword: str) -> List[str]:
-    urls: List[str] = []
-    for page in range(1, 4):  # 前3页
-        q = aiohttp.helpers.quote(keyword)
-        url = f"https://duckduckgo.com/html/?q={q}&s={(page-1)*30}"
-        html = await fetch_text(session, url)
-        if not html:
-            continue
-        for link in extract_links_from_html(html):
-            if "duckduckgo.com" in link:
-                continue
-            urls.append(link)
-        if len(urls) >= config.MAX_SEED_RESULTS_PER_ENGINE:
-            break
-    return urls[: config.MAX_SEED_RESULTS_PER_ENGINE]
+# 各搜索源：结果页 URL 模板（page 从 1 开始）与结果链接解析
+def _duckduckgo_url(q: str, page: int) -> str:
+    return f"https://duckduckgo.com/html/?q={q}&s={(page-1)*30}"
 
 
-async def search_mojeek(session: aiohttp.ClientSession, keyword: str) -> List[str]:
-    urls: List[str] = []
-    for page in range(1, 4):
-        q = aiohttp.helpers.quote(keyword)
-        url = f"https://www.mojeek.com/search?q={q}&s={(page-1)*10}"
-        html = await fetch_text(session, url)
-        if not html:
-            continue
-        for link in extract_links_from_html(html):
-            if "mojeek.com" in link:
-                continue
-            urls.append(link)
-        if len(urls) >= config.MAX_SEED_RESULTS_PER_ENGINE:
-            break
-    return urls[: config.MAX_SEED_RESULTS_PER_ENGINE]
+def _mojeek_url(q: str, page: int) -> str:
+    return f"https://www.mojeek.com/search?q={q}&s={(page-1)*10}"
+
+
+def _baidu_url(q: str, page: int) -> str:
+    return f"https://www.baidu.com/s?wd={q}&pn={(page-1)*10}"
+
+
+def _sogou_url(q: str, page: int) -> str:
+    return f"https://www.sogou.com/web?query={q}&page={page}"
+
+
+async def _duckduckgo_links(session: aiohttp.ClientSession, html: str, resolver: "RedirectResolver") -> List[str]:
+    return [link for link in extract_links_from_html(html) if "duckduckgo.com" not in link]
+
+
+async def _mojeek_links(session: aiohttp.ClientSession, html: str, resolver: "RedirectResolver") -> List[str]:
+    return [link for link in extract_links_from_html(html) if "mojeek.com" not in link]
 
 
-async def search_baidu(session: aiohttp.ClientSession, keyword: str) -> List[str]:
+async def _resolve_results(session: aiohttp.ClientSession, engine: str, engine_host: str,
+                           hrefs: List[str], resolver: "RedirectResolver") -> List[str]:
+    # 只有搜索引擎自身的跳转链接才需要解析，站外直链直接使用
+    direct: List[str] = []
+    wrapped: List[str] = []
+    for href in hrefs:
+        if engine_host in urllib.parse.urlsplit(href).netloc.lower():
+            wrapped.append(href)
+        else:
+            direct.append(href)
+    resolved = await resolver.resolve_many(session, engine, wrapped) if wrapped else []
     urls: List[str] = []
-    for page in range(0, 3):  # pn=0,10,20
-        q = aiohttp.helpers.quote(keyword)
-        url = f"https://www.baidu.com/s?wd={q}&pn={page*10}"
-        html = await fetch_text(session, url)
-        if not html:
-            continue
-        soup = BeautifulSoup(html, "html.parser")
-        raw = []
-        for h3 in soup.select('h3 a[href]'):
-            href = h3.get('href')
-            if href and href.startswith('http'):
+    for r in direct + resolved:
+        if r.startswith('http') and engine_host not in r:
+            urls.append(r)
+    return urls
+
+
+async def _baidu_links(session: aiohttp.ClientSession, html: str, resolver: "RedirectResolver") -> List[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    raw = []
+    for h3 in soup.select('h3 a[href]'):
+        href = h3.get('href')
+        if href and href.startswith('http'):
+            raw.append(href)
+    # 解析跳转，拿到真实目标链接，避免命中 baidu.com/link 的 robots 限制
+    return await _resolve_results(session, 'baidu', 'baidu.com', raw, resolver)
+
+
+async def _sogou_links(session: aiohttp.ClientSession, html: str, resolver: "RedirectResolver") -> List[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    raw = []
+    # 只取结果标题链接（多为相对路径 /link?url=...），不再解析导航等全部 a[href]
+    for a in soup.select('h3 a[href]'):
+        href = a.get('href')
+        if href:
+            href = urllib.parse.urljoin("https://www.sogou.com/", href)
+            if href.startswith('http'):
                 raw.append(href)
-        # 解析跳转，拿到真实目标链接，避免命中 baidu.com/link 的 robots 限制
-        if raw:
-            resolved = await asyncio.gather(*[resolve_redirects(session, u) for u in raw], return_exceptions=True)
-            for r in resolved:
-                if isinstance(r, str) and r.startswith('http') and 'baidu.com' not in r:
-                    urls.append(r)
-        if len(urls) >= config.MAX_SEED_RESULTS_PER_ENGINE:
-            break
-    return urls[: config.MAX_SEED_RESULTS_PER_ENGINE]
+    return await _resolve_results(session, 'sogou', 'sogou.com', raw, resolver)
 
 
-async def search_sogou(session: aiohttp.ClientSession, keyword: str) -> List[str]:
-    urls: List[str] = []
-    for page in range(1, 4):
-        q = aiohttp.helpers.quote(keyword)
-        url = f"https://www.sogou.com/web?query={q}&page={page}"
-        html = await fetch_text(session, url)
+ENGINES: Dict[str, Tuple[Callable[[str, int], str], Callable[[aiohttp.ClientSession, str, RedirectResolver], Awaitable[List[str]]]]] = {
+    'duckduckgo': (_duckduckgo_url, _duckduckgo_links),
+    'mojeek': (_mojeek_url, _mojeek_links),
+    # 额外增加国内常用搜索源：百度与搜狗（HTML 结果页）
+    'baidu': (_baidu_url, _baidu_links),
+    'sogou': (_sogou_url, _sogou_links),
+}
+
+
+# 结果页缓存：按 (engine, keyword, page) 持久化到 state.sqlite，带 TTL 与行数上限
+class SerpCache:
+    def __init__(self, conn: Optional[sqlite3.Connection] = None):
+        self.conn = conn
+        self._puts = 0
+
+    def fresh_pages(self, engine: str, keyword: str) -> Dict[int, List[str]]:
+        if self.conn is None:
+            return {}
+        now = time.time()
+        pages: Dict[int, List[str]] = {}
+        try:
+            for page, urls_json, fetched_at in load_serp_pages(self.conn, engine, keyword):
+                urls = json.loads(urls_json)
+                # 空页（到底标记）用短 TTL，临时拦截不会让该引擎整天停用
+                if fetched_at >= now - (config.SERP_CACHE_TTL if urls else config.SERP_EMPTY_TTL):
+                    pages[page] = urls
+        except Exception:
+            return {}
+        return pages
+
+    def put(self, engine: str, keyword: str, page: int, urls: List[str]):
+        if self.conn is None:
+            return
+        try:
+            save_serp_page(self.conn, engine, keyword, page, json.dumps(urls, ensure_ascii=False))
+            self._puts += 1
+            if self._puts % 100 == 0:
+                prune_serp_cache(self.conn, config.SERP_CACHE_TTL, config.SERP_CACHE_MAX_ROWS)
+                # 跳转映射表同一节奏清理（同一个 state.sqlite 连接）
+                prune_redirects(self.conn, config.REDIRECT_TTL, config.REDIRECT_MAX_ROWS)
+        except Exception:
+            pass
+
+
+_default_resolver = RedirectResolver()
+
+
+BLOCK_MARKERS = ('captcha', 'unusual traffic', 'verify you are', 'are you a robot', 'antispider', '验证码', '安全验证',
+                 '异常流量', '访问过于频繁')
+
+
+def _looks_blocked(html: str) -> bool:
+    # 无结果的 SERP 是否更像拦截页：内容过短或带验证码/风控字样
+    if len(html) < config.SERP_BLOCK_MIN_BYTES:
+        return True
+    head = html[:20000].lower()
+    return any(m in head for m in BLOCK_MARKERS)
+
+
+def _pages_to_fetch(fresh: Dict[int, List[str]]) -> List[int]:
+    # 前几页未缓存（或已过期）时先补齐；都命中后每轮向更深处推进若干页。
+    # 缓存里的空页是“已到底”标记：SERP_EMPTY_TTL 内不再请求它及更深的页
+    end = min((p for p, links in fresh.items() if not links), default=config.SERP_MAX_PAGE + 1)
+    missing = [p for p in range(1, min(config.SERP_BASE_PAGES + 1, end)) if p not in fresh]
+    if missing or end <= config.SERP_MAX_PAGE:
+        return missing
+    deepest = max(fresh)
+    return [p for p in range(deepest + 1, deepest + 1 + config.SERP_NEW_PAGES_PER_ROUND) if p <= config.SERP_MAX_PAGE]
+
+
+async def search_engine(session: aiohttp.ClientSession, engine: str, keyword: str,
+                        cache: Optional[SerpCache] = None, resolver: Optional[RedirectResolver] = None) -> List[str]:
+    page_url, parse_links = ENGINES[engine]
+    resolver = resolver or _default_resolver
+    q = aiohttp.helpers.quote(keyword)
+    fresh = cache.fresh_pages(engine, keyword) if cache else {}
+    metrics.SERP_PAGES.labels(engine, 'cache').inc(len(fresh))
+    fetch_hist = metrics.SERP_FETCH.labels(engine)
+    new_urls: List[str] = []
+    for page in _pages_to_fetch(fresh):
+        started = time.perf_counter()
+        try:
+            html = await fetch_text(session, page_url(q, page))
+        except Exception:
+            metrics.ERRORS.labels('search').inc()
+            html = ""
+        fetch_hist.observe(time.perf_counter() - started)
         if not html:
+            metrics.SERP_PAGES.labels(engine, 'empty').inc()
             continue
-        soup = BeautifulSoup(html, "html.parser")
-        raw = []
-        for a in soup.select('a[href]'):
-            href = a.get('href')
-            if href and href.startswith('http'):
-                raw.append(href)
-        if raw:
-            resolved = await asyncio.gather(*[resolve_redirects(session, u) for u in raw], return_exceptions=True)
-            for r in resolved:
-                if isinstance(r, str) and r.startswith('http') and 'sogou.com' not in r:
-                    urls.append(r)
-        if len(urls) >= config.MAX_SEED_RESULTS_PER_ENGINE:
+        metrics.SERP_PAGES.labels(engine, 'fetched').inc()
+        links = await parse_links(session, html, resolver)
+        if not links:
+            # 空页：像验证码/拦截页的不缓存；其余视为到底，缓存为短 TTL 的到底标记。都不再往深处翻
+            if _looks_blocked(html):
+                metrics.SERP_PAGES.labels(engine, 'blocked').inc()
+            elif cache:
+                cache.put(engine, keyword, page, [])
+            fresh[page] = []
+            break
+        if cache:
+            cache.put(engine, keyword, page, links)
+        fresh[page] = links
+        new_urls.extend(links)
+        if not cache and len(new_urls) >= config.MAX_SEED_RESULTS_PER_ENGINE:
             break
-    return urls[: config.MAX_SEED_RESULTS_PER_ENGINE]
+    # 新翻到的页面优先，其余由缓存补足
+    urls = list(new_urls)
+    for page in sorted(fresh):
+        urls.extend(fresh[page])
+    seen = set()
+    uniq = []
+    for u in urls:
+        if u not in seen:
+            uniq.append(u)
+            seen.add(u)
+    uniq = uniq[: config.MAX_SEED_RESULTS_PER_ENGINE]
+    metrics.SEED_YIELD.labels(engine).inc(len(uniq))
+    return uniq
+
 
+async def search_duckduckgo(session: aiohttp.ClientSession, keyword: str, cache: Optional[SerpCache] = None) -> List[str]:
+    return await search_engine(session, 'duckduckgo', keyword, cache)
 
-async def gather_seeds(keyword: str) -> List[str]:
-    async with aiohttp.ClientSession() as session:
+
+async def search_mojeek(session: aiohttp.ClientSession, keyword: str, cache: Optional[SerpCache] = None) -> List[str]:
+    return await search_engine(session, 'mojeek', keyword, cache)
+
+
+async def search_baidu(session: aiohttp.ClientSession, keyword: str, cache: Optional[SerpCache] = None) -> List[str]:
+    return await search_engine(session, 'baidu', keyword, cache)
+
+
+async def search_sogou(session: aiohttp.ClientSession, keyword: str, cache: Optional[SerpCache] = None) -> List[str]:
+    return await search_engine(session, 'sogou', keyword, cache)
+
+
+async def gather_seeds(keyword: str, session: Optional[aiohttp.ClientSession] = None,
+                       cache: Optional[SerpCache] = None, resolver: Optional[RedirectResolver] = None) -> List[str]:
+    # 未传入共享会话时自建并在结束时关闭
+    own_session = session is None
+    if own_session:
+        session = create_session()
+    try:
         res = await asyncio.gather(
-            search_duckduckgo(session, keyword),
-            search_mojeek(session, keyword),
-            # 额外增加国内常用搜索源：百度与搜狗（HTML 结果页）
-            search_baidu(session, keyword),
-            search_sogou(session, keyword),
+            *[search_engine(session, engine, keyword, cache, resolver) for engine in ENGINES],
             return_exceptions=True,
         )
+    finally:
+        if own_session:
+            await session.close()
     seeds: List[str] = []
     for r in res:
         if isinstance(r, list):
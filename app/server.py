@@ -1,4 +1,5 @@
 import asyncio
+import multiprocessing
 from aiohttp import web
 import webbrowser
 import socket
@@ -43,7 +44,7 @@ def _message_box(title: str, text: str):
     print(f"{title}: {text}")
 
 
-def run_server():
+def run_server(workers=None, coordinator=False):
     # 提前配置日志，避免异常丢失
     try:
         os.makedirs(config.DATA_DIR, exist_ok=True)
@@ -52,7 +53,7 @@ def run_server():
         logging.basicConfig(level=logging.INFO)
 
     async def main():
-        mgr = CrawlManager()
+        mgr = CrawlManager(workers=workers, coordinator=coordinator)
         app = await create_app(mgr)
         app['mgr'] = mgr
         app.on_startup.append(_on_startup)
@@ -97,4 +98,5 @@ def run_server():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     run_server()
@@ -1,10 +1,17 @@
+import asyncio
+import gzip
 import json
+import logging
 import os
+import queue
 import sqlite3
+import threading
 import time
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
-from . import config
+from . import config, metrics
+from .results import ResultWriter
 
 os.makedirs(os.path.dirname(config.STATE_DB), exist_ok=True)
 
@@ -21,46 +28,155 @@ CREATE TABLE IF NOT EXISTS contacts (
   first_seen_utc TEXT DEFAULT (datetime('now')),
   UNIQUE(contact_type, contact_value, site_domain)
 );
+CREATE TABLE IF NOT EXISTS fetch_state (
+  url TEXT PRIMARY KEY,
+  etag TEXT,
+  last_modified TEXT,
+  status INTEGER,
+  content_hash TEXT,
+  links TEXT,
+  fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS serp_cache (
+  engine TEXT,
+  keyword TEXT,
+  page INTEGER,
+  urls TEXT,
+  fetched_at REAL,
+  PRIMARY KEY(engine, keyword, page)
+);
+CREATE INDEX IF NOT EXISTS idx_serp_cache_fetched ON serp_cache(fetched_at);
+CREATE TABLE IF NOT EXISTS redirects (
+  src TEXT PRIMARY KEY,
+  target TEXT,
+  resolved_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_redirects_resolved ON redirects(resolved_at);
+CREATE TABLE IF NOT EXISTS export_state (
+  name TEXT PRIMARY KEY,
+  last_id INTEGER,
+  exported_at REAL
+);
+CREATE TABLE IF NOT EXISTS robots (
+  base TEXT PRIMARY KEY,
+  status INTEGER,
+  body TEXT,
+  fetched_at REAL,
+  expires_at REAL
+);
 """
 
 
+# 结构升级按 PRAGMA user_version 逐级执行；大库首次升级建索引需要一些时间，只发生一次
+SCHEMA_VERSION = 1
+MIGRATIONS = {
+    1: [
+        "CREATE INDEX IF NOT EXISTS idx_contacts_domain ON contacts(site_domain, id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_keyword ON contacts(keyword, id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_type ON contacts(contact_type, id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_lang ON contacts(lang, id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_first_seen ON contacts(first_seen_utc, id)",
+    ],
+}
+# page_title 全文索引（外部内容表）；trigram 分词支持中文子串检索。
+# 新增行由 save_contacts 在同一事务内批量写入（比逐行触发器快约 3 倍），删改较少见，交给触发器
+FTS_TOKENIZERS = ("trigram", "unicode61")
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+  INSERT INTO contacts_fts(contacts_fts, rowid, page_title) VALUES ('delete', old.id, old.page_title);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF page_title ON contacts BEGIN
+  INSERT INTO contacts_fts(contacts_fts, rowid, page_title) VALUES ('delete', old.id, old.page_title);
+  INSERT INTO contacts_fts(rowid, page_title) VALUES (new.id, new.page_title);
+END""",
+]
+
+
+def _create_fts(conn: sqlite3.Connection) -> bool:
+    for tokenizer in FTS_TOKENIZERS:
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+                         f"page_title, content='contacts', content_rowid='id', tokenize='{tokenizer}')")
+            break
+        except sqlite3.OperationalError:
+            continue
+    else:
+        # 未编译 FTS5 的 SQLite：标题检索退回 LIKE
+        logging.warning("sqlite has no fts5, title search falls back to LIKE")
+        return False
+    for stmt in FTS_TRIGGERS:
+        conn.execute(stmt)
+    conn.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+    return True
+
+
+def migrate(conn: sqlite3.Connection):
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    # 写锁内复查版本，多个进程/线程同时启动时只有一个执行升级
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            logging.info("migrating %s to schema version 1 (contacts indexes + title fts)", config.STATE_DB)
+            for stmt in MIGRATIONS[1]:
+                conn.execute(stmt)
+            _create_fts(conn)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
 def get_conn() -> sqlite3.Connection:
     conn = sqlite3.connect(config.STATE_DB)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.executescript(SCHEMA)
+    migrate(conn)
     return conn
 
 
-class ResultWriter:
-    def __init__(self):
-        os.makedirs(os.path.dirname(config.RESULTS_ZH), exist_ok=True)
-        os.makedirs(os.path.dirname(config.RESULTS_EN), exist_ok=True)
-        self.fp_zh = open(config.RESULTS_ZH, 'a', encoding='utf-8')
-        self.fp_en = open(config.RESULTS_EN, 'a', encoding='utf-8')
+INSERT_CONTACT_SQL = """
+INSERT OR IGNORE INTO contacts(keyword, lang, contact_type, contact_value, source_url, page_title, site_domain)
+VALUES(?,?,?,?,?,?,?)
+"""
 
-    def close(self):
-        try:
-            self.fp_zh.close()
-        except Exception:
-            pass
-        try:
-            self.fp_en.close()
-        except Exception:
-            pass
 
-    def write_record(self, record: Dict):
-        line = json.dumps(record, ensure_ascii=False)
-        lang = (record.get('lang') or '').lower()
-        if lang.startswith('zh'):
-            self.fp_zh.write(line + "\n"); self.fp_zh.flush()
-        else:
-            self.fp_en.write(line + "\n"); self.fp_en.flush()
+def _contact_params(rec: Dict) -> Tuple:
+    return (
+        rec.get('keyword'), rec.get('lang'), rec.get('contact_type'), rec.get('contact_value'),
+        rec.get('source_url'), rec.get('page_title'), rec.get('site_domain'),
+    )
+
+
+def has_title_fts(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name='contacts_fts'").fetchone() is not None
+
+
+def _index_titles(conn: sqlite3.Connection, rows: List[Tuple[int, str]]):
+    if rows and has_title_fts(conn):
+        conn.executemany("INSERT INTO contacts_fts(rowid, page_title) VALUES(?,?)", rows)
+
+
+def save_contacts(conn: sqlite3.Connection, recs: List[Dict]) -> List[Dict]:
+    # 单事务批量插入，返回真正新增的记录（重复项被 OR IGNORE 跳过）
+    inserted = []
+    titles = []
+    for rec in recs:
+        cur = conn.execute(INSERT_CONTACT_SQL, _contact_params(rec))
+        if cur.rowcount == 1:
+            inserted.append(rec)
+            titles.append((cur.lastrowid, rec.get('page_title')))
+    _index_titles(conn, titles)
+    conn.commit()
+    return inserted
 
 
 def save_contact(conn: sqlite3.Connection, rec: Dict) -> bool:
     try:
-        conn.execute(
+        cur = conn.execute(
             """
             INSERT INTO contacts(keyword, lang, contact_type, contact_value, source_url, page_title, site_domain)
             VALUES(?,?,?,?,?,?,?)
@@ -70,20 +186,409 @@ def save_contact(conn: sqlite3.Connection, rec: Dict) -> bool:
                 rec.get('source_url'), rec.get('page_title'), rec.get('site_domain'),
             ),
         )
+        _index_titles(conn, [(cur.lastrowid, rec.get('page_title'))])
         conn.commit()
         return True
     except sqlite3.IntegrityError:
         return False
 
 
-def export_snapshot() -> str:
-    ts = time.strftime('%Y%m%d_%H%M%S')
-    os.makedirs(config.EXPORT_DIR, exist_ok=True)
-    out_path = os.path.join(config.EXPORT_DIR, f'snapshot_{ts}.txt')
-    with open(out_path, 'w', encoding='utf-8') as out:
-        for p in (config.RESULTS_ZH, config.RESULTS_EN):
-            if os.path.exists(p):
-                with open(p, 'r', encoding='utf-8') as fp:
-                    for line in fp:
-                        out.write(line)
-    return out_path
+_STOP = object()
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+# 写后存储流水线：记录进入有界队列，由专用线程批量 INSERT OR IGNORE 并组提交，
+# 新增记录随后以缓冲块追加到中/英文 JSONL。
+# on_failed：批次写入失败回滚后以该批记录回调（在写入线程中），供去重索引撤销登记
+class StorageWriter:
+    def __init__(self, writer: Optional[ResultWriter] = None,
+                 on_failed: Optional[Callable[[List[Dict]], None]] = None):
+        self.on_failed = on_failed
+        self.queue: "queue.Queue" = queue.Queue(maxsize=config.STORAGE_QUEUE_SIZE)
+        self.writer = writer or ResultWriter()
+        self.batch_size = max(1, config.STORAGE_BATCH_SIZE)
+        self.flush_interval = config.STORAGE_FLUSH_MS / 1000.0
+        self.inserted_total = 0
+        metrics.STORAGE_QUEUE.set_function(self.queue.qsize)
+        self._thread = threading.Thread(target=self._run, name='storage-writer', daemon=True)
+        self._thread.start()
+
+    def _check_alive(self):
+        # 写入线程已退出时拒绝接收，避免调用方误以为记录会落盘
+        if not self._thread.is_alive():
+            raise RuntimeError("storage writer thread is not running")
+
+    def put(self, rec: Dict):
+        self._check_alive()
+        self.queue.put(rec)
+
+    async def submit(self, rec: Dict):
+        self._check_alive()
+        try:
+            self.queue.put_nowait(rec)
+        except queue.Full:
+            # 队列满时在线程中等待，避免阻塞事件循环
+            await asyncio.get_running_loop().run_in_executor(None, self.queue.put, rec)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # 等待此前提交的记录全部落盘（暂停/导出/退出前调用，保证快照一致）；写入线程已退出时抛 RuntimeError
+        self._check_alive()
+        req = _FlushRequest()
+        self.queue.put(req)
+        if timeout is not None:
+            return req.done.wait(timeout)
+        while not req.done.wait(1.0):
+            self._check_alive()
+        return True
+
+    async def aflush(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        self.writer.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Dict]):
+        # 任何异常都只影响本批，写入线程继续运行
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            inserted = save_contacts(conn, batch)
+        except Exception:
+            logging.exception("storage batch failed (%d records)", len(batch))
+            metrics.ERRORS.labels('storage').inc()
+            metrics.INSERT_ROWS.labels('failed').inc(len(batch))
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if self.on_failed is not None:
+                try:
+                    self.on_failed(batch)
+                except Exception:
+                    logging.exception("storage on_failed callback failed")
+            return
+        self.inserted_total += len(inserted)
+        metrics.INSERT_ROWS.labels('inserted').inc(len(inserted))
+        metrics.INSERT_ROWS.labels('duplicate').inc(len(batch) - len(inserted))
+        # 已入库的记录再追加到结果日志；单条写失败记日志后跳过
+        for rec in inserted:
+            try:
+                self.writer.write_record(rec)
+            except Exception:
+                logging.exception("results write failed for %r", rec.get('contact_value'))
+                metrics.ERRORS.labels('results').inc()
+        try:
+            self.writer.flush()
+        except Exception:
+            logging.exception("results flush failed")
+            metrics.ERRORS.labels('results').inc()
+        metrics.INSERT_BATCH.observe(time.perf_counter() - started)
+
+    def _run(self):
+        conn = get_conn()
+        batch: List[Dict] = []
+        deadline = 0.0
+        try:
+            while True:
+                timeout = None if not batch else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._commit(conn, batch)
+                    batch = []
+                    continue
+                if item is _STOP:
+                    self._commit(conn, batch)
+                    return
+                if isinstance(item, _FlushRequest):
+                    self._commit(conn, batch)
+                    batch = []
+                    item.done.set()
+                    continue
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._commit(conn, batch)
+                    batch = []
+        finally:
+            conn.close()
+
+
+def load_robots(conn: sqlite3.Connection, base: str) -> Optional[Tuple[int, str, float]]:
+    row = conn.execute("SELECT status, body, expires_at FROM robots WHERE base=?", (base,)).fetchone()
+    return row if row else None
+
+
+def save_robots(conn: sqlite3.Connection, rows: Iterable[Tuple[str, int, str, float, float]]):
+    # rows: (base, status, body, fetched_at, expires_at)；顺带清理已过期条目
+    conn.executemany(
+        "INSERT OR REPLACE INTO robots(base, status, body, fetched_at, expires_at) VALUES(?,?,?,?,?)",
+        list(rows),
+    )
+    conn.execute("DELETE FROM robots WHERE expires_at < ?", (time.time(),))
+    conn.commit()
+
+
+def load_fetch_state(conn: sqlite3.Connection, url: str) -> Optional[Tuple[str, str, int, str, str, float]]:
+    # 返回 (etag, last_modified, status, content_hash, links_json, fetched_at)
+    return conn.execute(
+        "SELECT etag, last_modified, status, content_hash, links, fetched_at FROM fetch_state WHERE url=?",
+        (url,),
+    ).fetchone()
+
+
+def save_fetch_states(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str, int, str, str, float]]):
+    # rows: (url, etag, last_modified, status, content_hash, links_json, fetched_at)
+    conn.executemany(
+        "INSERT OR REPLACE INTO fetch_state(url, etag, last_modified, status, content_hash, links, fetched_at) "
+        "VALUES(?,?,?,?,?,?,?)",
+        list(rows),
+    )
+    conn.commit()
+
+
+def load_serp_pages(conn: sqlite3.Connection, engine: str, keyword: str) -> List[Tuple[int, str, float]]:
+    return conn.execute(
+        "SELECT page, urls, fetched_at FROM serp_cache WHERE engine=? AND keyword=? ORDER BY page",
+        (engine, keyword),
+    ).fetchall()
+
+
+def save_serp_page(conn: sqlite3.Connection, engine: str, keyword: str, page: int, urls_json: str):
+    conn.execute(
+        "INSERT OR REPLACE INTO serp_cache(engine, keyword, page, urls, fetched_at) VALUES(?,?,?,?,?)",
+        (engine, keyword, page, urls_json, time.time()),
+    )
+    conn.commit()
+
+
+def prune_serp_cache(conn: sqlite3.Connection, ttl: float, max_rows: int):
+    # 先删过期页，再按抓取时间淘汰最旧的超额行
+    conn.execute("DELETE FROM serp_cache WHERE fetched_at < ?", (time.time() - ttl,))
+    total = conn.execute("SELECT COUNT(*) FROM serp_cache").fetchone()[0]
+    if total > max_rows:
+        conn.execute(
+            "DELETE FROM serp_cache WHERE rowid IN (SELECT rowid FROM serp_cache ORDER BY fetched_at LIMIT ?)",
+            (total - max_rows,),
+        )
+    conn.commit()
+
+
+def load_redirect(conn: sqlite3.Connection, src: str, ttl: Optional[float] = None) -> Optional[str]:
+    # 超过 ttl 的映射视为未命中，由调用方重新解析
+    cutoff = time.time() - ttl if ttl else 0.0
+    row = conn.execute("SELECT target FROM redirects WHERE src=? AND resolved_at>=?", (src, cutoff)).fetchone()
+    return row[0] if row else None
+
+
+def save_redirects(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, float]]):
+    # rows: (src, target, resolved_at)
+    conn.executemany("INSERT OR REPLACE INTO redirects(src, target, resolved_at) VALUES(?,?,?)", list(rows))
+    conn.commit()
+
+
+def prune_redirects(conn: sqlite3.Connection, ttl: float, max_rows: int):
+    # 与 prune_serp_cache 相同：先删过期映射，再按解析时间淘汰最旧的超额行
+    conn.execute("DELETE FROM redirects WHERE resolved_at < ?", (time.time() - ttl,))
+    total = conn.execute("SELECT COUNT(*) FROM redirects").fetchone()[0]
+    if total > max_rows:
+        conn.execute(
+            "DELETE FROM redirects WHERE rowid IN (SELECT rowid FROM redirects ORDER BY resolved_at LIMIT ?)",
+            (total - max_rows,),
+        )
+    conn.commit()
+
+
+EXPORT_FIELDS = ('keyword', 'lang', 'contact_type', 'contact_value', 'source_url', 'page_title', 'site_domain')
+EXPORT_FILTERS = ('keyword', 'lang', 'contact_type', 'site_domain', 'since', 'until')
+CONTACT_COLUMNS = ('id',) + EXPORT_FIELDS + ('first_seen_utc',)
+
+
+def get_read_conn() -> sqlite3.Connection:
+    # 只读连接，可交给线程池逐批读取（调用方保证同一时刻只有一个线程使用）；WAL 下读不阻塞写
+    conn = sqlite3.connect(f"file:{config.STATE_DB}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+class ReadPool:
+    # 查询接口专用的只读连接池：固定线程数的执行器，每个线程同一时刻占用一个连接
+    def __init__(self, size: Optional[int] = None):
+        self.size = max(1, size or config.READ_POOL_SIZE)
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sqlite-read')
+        # 需在 get_conn() 建库/升级之后创建
+        conn = get_read_conn()
+        self.has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name='contacts_fts'").fetchone() is not None
+        self._idle.put(conn)
+
+    def _call(self, fn: Callable, args: Tuple):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = get_read_conn()
+        try:
+            return fn(conn, *args)
+        finally:
+            self._idle.put(conn)
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _utc_text(value) -> str:
+    # first_seen_utc 为 'YYYY-MM-DD HH:MM:SS'；也接受 unix 时间戳
+    try:
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(float(value)))
+    except (TypeError, ValueError):
+        return str(value).replace('T', ' ')
+
+
+def contact_where(filters: Dict, fts: bool = False) -> Tuple[List[str], List]:
+    # 筛选条件 -> (WHERE 子句, 参数)；q 为标题检索，有 FTS 且不短于 3 个字符时走全文索引
+    where, params = [], []
+    for col in ('keyword', 'lang', 'contact_type', 'site_domain'):
+        if filters.get(col):
+            where.append(f"{col}=?")
+            params.append(filters[col])
+    if filters.get('since'):
+        where.append("first_seen_utc>=?")
+        params.append(_utc_text(filters['since']))
+    if filters.get('until'):
+        where.append("first_seen_utc<?")
+        params.append(_utc_text(filters['until']))
+    q = filters.get('q')
+    if q:
+        if fts and len(q) >= 3:
+            where.append("id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)")
+            params.append('"' + q.replace('"', '""') + '"')
+        else:
+            where.append("page_title LIKE ? ESCAPE '\\'")
+            params.append('%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    return where, params
+
+
+def query_contacts(conn: sqlite3.Connection, filters: Dict, cursor: Optional[int], limit: int,
+                   desc: bool = False, fts: bool = False) -> Tuple[List[Dict], Optional[int]]:
+    # keyset 分页：按 id 排序，cursor 为上一页最后一条的 id；返回 (记录, 下一页 cursor)
+    where, params = contact_where(filters, fts)
+    if cursor is not None:
+        where.append("id<?" if desc else "id>?")
+        params.append(cursor)
+    sql = (f"SELECT {', '.join(CONTACT_COLUMNS)} FROM contacts"
+           + (" WHERE " + " AND ".join(where) if where else "")
+           + f" ORDER BY id {'DESC' if desc else 'ASC'} LIMIT ?")
+    rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+    items = [dict(zip(CONTACT_COLUMNS, row)) for row in rows[:limit]]
+    return items, (items[-1]['id'] if len(rows) > limit else None)
+
+
+def query_domains(conn: sqlite3.Connection, filters: Dict, cursor: Optional[str], limit: int,
+                  fts: bool = False) -> Tuple[List[Dict], Optional[str]]:
+    # 按站点域名聚合（可沿 site_domain 索引顺序扫描）；cursor 为上一页最后一个域名
+    where, params = contact_where({k: v for k, v in filters.items() if k != 'site_domain'}, fts)
+    if cursor is not None:
+        where.append("site_domain>?")
+        params.append(cursor)
+    sql = ("SELECT site_domain, COUNT(*), COUNT(DISTINCT contact_type), MIN(first_seen_utc), MAX(first_seen_utc) "
+           "FROM contacts"
+           + (" WHERE " + " AND ".join(where) if where else "")
+           + " GROUP BY site_domain ORDER BY site_domain LIMIT ?")
+    rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+    items = [{'site_domain': r[0], 'contacts': r[1], 'contact_types': r[2], 'first_seen_utc': r[3],
+              'last_seen_utc': r[4]} for r in rows[:limit]]
+    return items, (items[-1]['site_domain'] if len(rows) > limit else None)
+
+
+def export_key(name: str, filters: Dict) -> str:
+    # 每组筛选条件单独记水位，避免被筛掉的记录在换条件后也被跳过
+    parts = [f"{k}={filters[k]}" for k in EXPORT_FILTERS if filters.get(k)]
+    return name + ('?' + '&'.join(parts) if parts else '')
+
+
+def load_export_watermark(conn: sqlite3.Connection, key: str) -> int:
+    row = conn.execute("SELECT last_id FROM export_state WHERE name=?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def save_export_watermark(conn: sqlite3.Connection, key: str, last_id: int):
+    conn.execute("INSERT OR REPLACE INTO export_state(name, last_id, exported_at) VALUES(?,?,?)",
+                 (key, last_id, time.time()))
+    conn.commit()
+
+
+def max_contact_id(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM contacts").fetchone()[0]
+
+
+def contact_batches(conn: sqlite3.Connection, after_id: int, upper_id: int, filters: Optional[Dict] = None,
+                    batch_size: int = 2000) -> Iterable[List[Dict]]:
+    # 按主键 id 分批（keyset）读取 (after_id, upper_id] 区间内满足筛选条件的记录，内存占用与总量无关
+    where, params = contact_where(filters or {})
+    sql = (f"SELECT id, {', '.join(EXPORT_FIELDS)} FROM contacts WHERE id>? AND id<=?"
+           + ''.join(' AND ' + w for w in where) + " ORDER BY id LIMIT ?")
+    last = after_id
+    while last < upper_id:
+        rows = conn.execute(sql, (last, upper_id, *params, batch_size)).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield [dict(zip(EXPORT_FIELDS, row[1:])) for row in rows]
+
+
+def encode_records(recs: List[Dict]) -> bytes:
+    # 与 results_*.txt 相同的 JSON 行格式
+    return ''.join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in recs).encode('utf-8')
+
+
+def export_contacts(incremental: bool = False, name: str = 'snapshot', filters: Optional[Dict] = None,
+                    compress: bool = False) -> Dict:
+    # 从状态库导出，默认全量；增量模式只导出上次水位之后的新记录，且只有增量导出推进水位
+    # （全量快照不一定被下游收取，不能让之后的增量跳过这些记录）。会阻塞，需在线程中调用
+    filters = {k: v for k, v in (filters or {}).items() if k in EXPORT_FILTERS and v}
+    key = export_key(name, filters)
+    conn = get_conn()
+    try:
+        after_id = load_export_watermark(conn, key) if incremental else 0
+        upper_id = max_contact_id(conn)
+        ts = time.strftime('%Y%m%d_%H%M%S')
+        os.makedirs(config.EXPORT_DIR, exist_ok=True)
+        ext = '.txt.gz' if compress else '.txt'
+        # 文件名带 id 区间；同一秒内多次导出时加序号，不覆盖已有快照
+        base = os.path.join(config.EXPORT_DIR, f'snapshot_{ts}_{after_id}-{upper_id}')
+        out_path, n = base + ext, 1
+        while os.path.exists(out_path):
+            out_path, n = f"{base}_{n}{ext}", n + 1
+        count = 0
+        with (gzip.open(out_path, 'wb', compresslevel=6) if compress else open(out_path, 'wb')) as out:
+            for recs in contact_batches(conn, after_id, upper_id, filters):
+                out.write(encode_records(recs))
+                count += len(recs)
+        if incremental:
+            save_export_watermark(conn, key, upper_id)
+    finally:
+        conn.close()
+    return {'path': out_path, 'records': count, 'from_id': after_id, 'to_id': upper_id}
+
+
+def export_snapshot(incremental: bool = False, name: str = 'snapshot', filters: Optional[Dict] = None,
+                    compress: bool = False) -> str:
+    # 兼容旧接口：默认全量导出，返回快照路径
+    return export_contacts(incremental, name, filters, compress)['path']
@@ -0,0 +1,256 @@
+import contextvars
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import IO, List, Optional, Tuple
+
+import aiohttp
+
+from . import config
+
+# 逐页阶段追踪：_crawl_one 开始时按采样率创建 PageTrace 并放进 contextvar，
+# 抓取链路上的各处只需调用 span()/add()，未采样时仅一次 contextvar 读取，开销可忽略。
+# 连接相关阶段（排队等连接、DNS、建连）通过 aiohttp TraceConfig 回调记录。
+
+_current: contextvars.ContextVar = contextvars.ContextVar('page_trace', default=None)
+
+
+class PageTrace:
+    __slots__ = ('tracer', 'page_id', 'url', 'start', 'wall', 'spans', '_open')
+
+    def __init__(self, tracer: 'Tracer', page_id: int, url: str, start: Optional[float] = None):
+        self.tracer = tracer
+        self.page_id = page_id
+        self.url = url
+        now = time.perf_counter()
+        # start 可早于创建时刻（页面在调度器里等限速的时间也算在本页内）
+        self.start = now if start is None else start
+        self.wall = time.time() - (now - self.start)
+        self.spans: List[Tuple[str, float, float]] = []
+        self._open = {}
+
+    def add(self, name: str, start: float, duration: float):
+        # start 为 perf_counter 绝对值
+        self.spans.append((name, start - self.start, duration))
+
+    def begin(self, name: str):
+        self._open[name] = time.perf_counter()
+
+    def end(self, name: str):
+        started = self._open.pop(name, None)
+        if started is not None:
+            self.add(name, started, time.perf_counter() - started)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace: Optional[PageTrace], name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add(self.name, self.started, time.perf_counter() - self.started)
+        return False
+
+
+def current() -> Optional[PageTrace]:
+    return _current.get()
+
+
+def span(name: str) -> _Span:
+    return _Span(_current.get(), name)
+
+
+def add(name: str, start: float, duration: float):
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, duration)
+
+
+class Tracer:
+    def __init__(self, rate: Optional[float] = None, fmt: Optional[str] = None, path: Optional[str] = None):
+        self.configure(rate, fmt, path)
+        self._ids = itertools.count(1)
+        self._fp: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.written = 0
+
+    def configure(self, rate: Optional[float] = None, fmt: Optional[str] = None, path: Optional[str] = None):
+        self.rate = max(0.0, min(1.0, config.TRACE_SAMPLE_RATE if rate is None else rate))
+        self.fmt = (fmt or config.TRACE_FORMAT or 'jsonl').lower()
+        if self.fmt not in ('jsonl', 'chrome'):
+            self.fmt = 'jsonl'
+        self.path = path or config.TRACE_PATH or os.path.join(
+            config.DATA_DIR, 'trace.json' if self.fmt == 'chrome' else 'trace.jsonl')
+        if multiprocessing.parent_process() is not None:
+            # 子进程各写各的文件，避免交错
+            root, ext = os.path.splitext(self.path)
+            self.path = f"{root}.{os.getpid()}{ext}"
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0.0
+
+    def start_page(self, url: str, start: Optional[float] = None) -> Optional[contextvars.Token]:
+        # 返回 token 供 finish_page 复位；未采样返回 None。start 为 perf_counter 绝对值，缺省为当前时刻
+        if self.rate <= 0.0 or (self.rate < 1.0 and random.random() >= self.rate):
+            return None
+        return _current.set(PageTrace(self, next(self._ids), url, start))
+
+    def finish_page(self, token: Optional[contextvars.Token], **info):
+        if token is None:
+            return
+        trace = _current.get()
+        _current.reset(token)
+        if trace is None:
+            return
+        total = time.perf_counter() - trace.start
+        self._write(trace, total, info)
+
+    def _open_file(self) -> IO[str]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fresh = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        fp = open(self.path, 'a', encoding='utf-8', buffering=1 << 16)
+        if self.fmt == 'chrome' and fresh:
+            # Chrome trace 的 JSON 数组格式允许缺少结尾的 ]，便于追加写
+            fp.write('[\n')
+        return fp
+
+    def _write(self, trace: PageTrace, total: float, info: dict):
+        if self.fmt == 'chrome':
+            pid = os.getpid()
+            base_us = trace.wall * 1e6
+            events = [{'name': 'page', 'cat': 'page', 'ph': 'X', 'pid': pid, 'tid': trace.page_id,
+                       'ts': round(base_us, 1), 'dur': round(total * 1e6, 1), 'args': {'url': trace.url, **info}}]
+            for name, offset, dur in trace.spans:
+                events.append({'name': name, 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': trace.page_id,
+                               'ts': round(base_us + offset * 1e6, 1), 'dur': round(dur * 1e6, 1)})
+            text = ''.join(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + ',\n' for e in events)
+        else:
+            rec = {'url': trace.url, 'ts': round(trace.wall, 3), 'ms': round(total * 1000, 2),
+                   'spans': [[name, round(offset * 1000, 2), round(dur * 1000, 2)] for name, offset, dur in trace.spans]}
+            rec.update(info)
+            text = json.dumps(rec, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._fp is None:
+                self._fp = self._open_file()
+            self._fp.write(text)
+            self.written += 1
+            self._pending += 1
+            if self._pending >= 100:
+                self._fp.flush()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+
+TRACER = Tracer()
+
+
+def aiohttp_trace_config() -> aiohttp.TraceConfig:
+    # 记录连接池排队、DNS 与建连耗时；回调在发起请求的任务内执行，能读到当前页的 contextvar
+    tc = aiohttp.TraceConfig()
+
+    def _begin(name):
+        async def cb(session, ctx, params):
+            trace = _current.get()
+            if trace is not None:
+                trace.begin(name)
+        return cb
+
+    def _end(name):
+        async def cb(session, ctx, params):
+            trace = _current.get()
+            if trace is not None:
+                trace.end(name)
+        return cb
+
+    tc.on_connection_queued_start.append(_begin('pool_wait'))
+    tc.on_connection_queued_end.append(_end('pool_wait'))
+    tc.on_dns_resolvehost_start.append(_begin('dns'))
+    tc.on_dns_resolvehost_end.append(_end('dns'))
+    tc.on_connection_create_start.append(_begin('connect'))
+    tc.on_connection_create_end.append(_end('connect'))
+    tc.on_request_start.append(_begin('ttfb'))
+    tc.on_request_end.append(_end('ttfb'))
+    return tc
+
+
+# ---- 采样式调用栈（火焰图） ----
+
+class StackSampler:
+    # 后台线程定期抓取目标线程的调用栈，汇总为 folded 格式（flamegraph.pl / speedscope 可直接读取）
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, 'w', encoding='utf-8') as fp:
+            for stack, count in self.stacks.most_common():
+                fp.write(f"{stack} {count}\n")
+
+
+def top_functions(stats, modules=('crawler', 'extractors', 'storage'), limit: int = 15):
+    # 从 pstats.Stats 中挑出指定模块（app/<module>.py）里自身耗时最高的函数
+    out = {m: [] for m in modules}
+    for (filename, lineno, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        base = os.path.basename(filename)
+        parent = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+        for m in modules:
+            if base == f"{m}.py" and parent == 'app':
+                out[m].append({'function': f"{func}:{lineno}", 'calls': nc, 'tottime': round(tt, 4),
+                               'cumtime': round(ct, 4)})
+    for m in modules:
+        out[m].sort(key=lambda r: r['tottime'], reverse=True)
+        out[m] = out[m][:limit]
+    return out
@@ -1,38 +1,108 @@
 import asyncio
+import os
 import random
-import re
+import time
 from typing import Optional
 
-from . import config
+import aiohttp
+import aiohttp.abc
+
+from . import config, tracing
+from .lang import classify_text
 
 
 def pick_user_agent() -> str:
     return random.choice(config.DEFAULT_USER_AGENTS)
 
 
-def is_probably_chinese(text: str) -> bool:
-    # 粗略中文判断：包含中文字符或常见中文词
-    if re.search(r"[\u4e00-\u9fff]", text or ""):
+def pid_alive(pid: int) -> bool:
+    # 判断本机进程是否仍在运行（分段文件名带 pid，用来区分仍在写的段与已废弃的段）
+    if pid == os.getpid():
         return True
-    for w in config.LANG_ZH_HINTS:
-        if w.lower() in (text or "").lower():
-            return True
-    return False
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        # Windows 上 os.kill 会直接结束目标进程，改用 OpenProcess 查询退出码
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_probably_chinese(text: str) -> bool:
+    # 与抓取时的页面语言判定一致（见 lang.classify_text）
+    return classify_text(text or "")[0] == 'zh'
 
 
 class RateLimiter:
-    def __init__(self, rate_per_sec: float):
-        self._interval = 1.0 / max(rate_per_sec, 0.001)
-        self._last = 0.0
-        self._lock = asyncio.Lock()
-
-    async def acquire(self):
-        async with self._lock:
-            now = asyncio.get_event_loop().time()
-            delta = now - self._last
-            if delta < self._interval:
-                await asyncio.sleep(self._interval - delta)
-            self._last = asyncio.get_event_loop().time()
+    # 令牌桶：预约令牌后在锁外等待，等待期间其他协程可继续预约后续时间片
+    def __init__(self, rate_per_sec: float, burst: float = 1.0):
+        self.rate = max(rate_per_sec, 0.001)
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self.last_used = self._updated
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate_per_sec: float):
+        self._refill(time.monotonic())
+        self.rate = max(rate_per_sec, 0.001)
+
+    def delay(self) -> float:
+        # 距离下一个可用令牌还需等待的秒数（不消耗令牌）
+        now = time.monotonic()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def reserve(self) -> float:
+        # 消耗一个令牌（允许透支），返回需要等待的秒数
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1.0
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        wait = max(wait, self.blocked_until - now)
+        self.last_used = now + wait
+        return wait
+
+    async def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def create_session(resolver: Optional[aiohttp.abc.AbstractResolver] = None) -> aiohttp.ClientSession:
+    # 需在事件循环内调用；由调用方负责关闭。resolver 可替换 DNS 解析（如基准测试把域名指向本地夹具）
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_POOL_LIMIT,
+        limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=config.DNS_CACHE_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=config.KEEPALIVE_TIMEOUT,
+        resolver=resolver,
+    )
+    timeout = aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT, connect=config.CONNECT_TIMEOUT)
+    # 开启逐页追踪时才挂 TraceConfig，未开启不增加任何回调开销
+    trace_configs = [tracing.aiohttp_trace_config()] if tracing.TRACER.enabled else None
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=trace_configs)
 
 
 def clean_text(s: Optional[str]) -> str:
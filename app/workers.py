@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import logging
+import math
+import multiprocessing
+import queue
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from . import config, metrics
+from .crawler import Crawler
+from .parser import ParsePool
+from .storage import get_conn
+from .utils import create_session
+
+# 多进程抓取：协调者（CrawlManager 所在进程）按注册域名把种子分到 N 个子进程，
+# 每个子进程有独立的事件循环、连接池与主机限速器；爬虫只跟进同站链接，
+# 因此同一主机只会在一个进程内被访问，礼貌性约束依旧成立。
+# 记录批量回传给协调者，由唯一的去重索引与 StorageWriter 写入 state.sqlite 与 JSONL。
+# 全局并发预算 GLOBAL_CONCURRENCY 平分给各子进程；每个关键词的公平份额再平分给持有其分片的子进程，
+# 份额随并行关键词变化时由协调者下发更新。
+# 子进程里的抓取/解析/抽取指标以增量形式随记录批次回传，合并进协调者的 /metrics。
+
+
+def shard_of(domain: str, workers: int) -> int:
+    # 稳定哈希（不受 PYTHONHASHSEED 影响），同一注册域名总落在同一进程
+    return zlib.crc32(domain.encode('utf-8', 'surrogatepass')) % workers
+
+
+def _next(q, timeout: float = 0.5):
+    try:
+        return q.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+async def _run_job(crawler: Crawler, session, slots: asyncio.Semaphore, share: Callable[[], int], results, paused,
+                   index: int, job_id: int, keyword: str, urls: List[str]):
+    buf: List[dict] = []
+    prog = {'pages': 0}
+    sent = {'pages': 0}
+
+    def flush():
+        deltas = metrics.REGISTRY.drain()
+        if buf or prog['pages'] != sent['pages'] or deltas:
+            results.put(('records', job_id, index, list(buf), prog['pages'], deltas))
+            buf.clear()
+            sent['pages'] = prog['pages']
+
+    async def on_record(rec: dict):
+        buf.append(rec)
+        if len(buf) >= config.WORKER_RECORD_BATCH:
+            flush()
+
+    async def ticker():
+        # 批次未满也定期回传，进度与记录不会长时间滞留在子进程
+        while True:
+            await asyncio.sleep(config.WORKER_FLUSH_SEC)
+            flush()
+
+    tick = asyncio.ensure_future(ticker())
+    try:
+        await crawler.crawl_urls(keyword, urls, on_record, paused_event=paused, session=session,
+                                 slots=slots, share=share, progress=prog)
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        logging.exception("worker %d: job %d failed", index, job_id)
+    finally:
+        tick.cancel()
+        flush()
+        results.put(('done', job_id, index))
+
+
+async def _worker_loop(index: int, jobs, results, paused, budget: int):
+    loop = asyncio.get_running_loop()
+    conn = get_conn()
+    crawler = Crawler(conn=conn)
+    # 子进程本身就是并行单元，解析在进程内线程池完成，不再嵌套进程池
+    crawler.parser = ParsePool(workers=0)
+    slots = asyncio.Semaphore(budget)
+    session = create_session()
+    tasks: Dict[int, asyncio.Task] = {}
+    shares: Dict[int, int] = {}
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            msg = await loop.run_in_executor(None, _next, jobs)
+            if msg is None:
+                # 协调者异常退出时子进程随之结束
+                if parent is not None and not parent.is_alive():
+                    break
+                continue
+            kind = msg[0]
+            if kind == 'stop':
+                break
+            if kind == 'cancel':
+                task = tasks.get(msg[1])
+                if task is not None:
+                    task.cancel()
+            elif kind == 'share':
+                if msg[1] in tasks:
+                    shares[msg[1]] = msg[2]
+            elif kind == 'crawl':
+                _, job_id, keyword, urls, share = msg
+                shares[job_id] = share
+                task = asyncio.ensure_future(
+                    _run_job(crawler, session, slots, lambda j=job_id: shares.get(j, budget), results, paused,
+                             index, job_id, keyword, urls))
+                tasks[job_id] = task
+                task.add_done_callback(lambda _t, j=job_id: (tasks.pop(j, None), shares.pop(j, None)))
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        await session.close()
+        crawler.close()
+        conn.close()
+
+
+def _worker_main(index: int, jobs, results, paused, budget: int):
+    try:
+        asyncio.run(_worker_loop(index, jobs, results, paused, budget))
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerPool:
+    def __init__(self, workers: int, domain_of: Callable[[str], str]):
+        self.workers = max(1, workers)
+        self.domain_of = domain_of
+        # 每个子进程的并发名额，合计约等于 GLOBAL_CONCURRENCY
+        self.budget = max(1, math.ceil(config.GLOBAL_CONCURRENCY / self.workers))
+        # spawn 在各平台行为一致，也适用于打包后的 exe（需 freeze_support）
+        self._ctx = multiprocessing.get_context('spawn')
+        self._procs: List[multiprocessing.Process] = []
+        self._jobs: List = []
+        self._results = None
+        self.paused = None
+        self._pending: Dict[int, Dict] = {}
+        self._ids = itertools.count(1)
+        self._pump_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.restarts = 0
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        proc = self._ctx.Process(target=_worker_main,
+                                 args=(index, self._jobs[index], self._results, self.paused, self.budget),
+                                 name=f"crawl-worker-{index}", daemon=True)
+        proc.start()
+        return proc
+
+    def start(self):
+        self._results = self._ctx.Queue()
+        self.paused = self._ctx.Event()
+        self._jobs = [self._ctx.Queue() for _ in range(self.workers)]
+        self._procs = [self._spawn(i) for i in range(self.workers)]
+        self._pump_task = asyncio.ensure_future(self._pump())
+
+    def set_paused(self, paused: bool):
+        if self.paused is None:
+            return
+        if paused:
+            self.paused.set()
+        else:
+            self.paused.clear()
+
+    def _finish(self, job: Dict, index: int):
+        job['waiting'].discard(index)
+        if not job['waiting'] and not job['done'].done():
+            job['done'].set_result(None)
+
+    def _check_workers(self):
+        # 子进程意外退出：重新拉起，分给它的任务重新下发（重复记录由去重吸收）；
+        # 重试用完的任务按结束处理，避免协调者一直等待
+        for i, proc in enumerate(self._procs):
+            if self._closing or proc.is_alive():
+                continue
+            logging.warning("crawl worker %d exited with %s, restarting", i, proc.exitcode)
+            self.restarts += 1
+            # 被杀的进程可能正持有任务队列的读锁，沿用旧队列新进程会一直卡在 get 上，换一个新队列
+            self._jobs[i] = self._ctx.Queue()
+            self._procs[i] = self._spawn(i)
+            for job_id, job in list(self._pending.items()):
+                if i not in job['waiting']:
+                    continue
+                attempts = job['attempts'][i] = job['attempts'].get(i, 0) + 1
+                if attempts > config.WORKER_JOB_RETRIES:
+                    logging.warning("job %d: worker %d crashed %d times, giving up its shard", job_id, i, attempts)
+                    self._finish(job, i)
+                else:
+                    self._jobs[i].put(('crawl', job_id, job['keyword'], job['shards'][i], job['sent_share']))
+
+    @staticmethod
+    def _job_share(job: Dict) -> int:
+        # 关键词的份额平分给持有其分片的子进程
+        total = job['share']() if job['share'] is not None else config.GLOBAL_CONCURRENCY
+        return max(1, math.ceil(total / len(job['shards'])))
+
+    def _update_shares(self):
+        for job_id, job in self._pending.items():
+            share = self._job_share(job)
+            if share != job['sent_share']:
+                job['sent_share'] = share
+                for i in job['waiting']:
+                    self._jobs[i].put(('share', job_id, share))
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        checked = time.monotonic()
+        while True:
+            # 存活检查按固定间隔进行：结果队列持续繁忙时崩溃的子进程也能被发现
+            if time.monotonic() - checked >= config.WORKER_CHECK_SEC:
+                checked = time.monotonic()
+                self._check_workers()
+                self._update_shares()
+            msg = await loop.run_in_executor(None, _next, self._results)
+            if msg is None:
+                # 关闭时等子进程全部退出且队列取空后再结束，避免丢失最后一批记录
+                if self._closing and not any(p.is_alive() for p in self._procs):
+                    break
+                continue
+            if msg[0] == 'records':
+                metrics.REGISTRY.merge(msg[5])
+            job = self._pending.get(msg[1])
+            if job is None:
+                continue
+            if msg[0] == 'records':
+                _, _, index, recs, pages, _ = msg
+                job['pages'][index] = pages
+                if job['progress'] is not None:
+                    job['progress']['pages'] = sum(job['pages'].values())
+                for rec in recs:
+                    try:
+                        await job['on_record'](rec)
+                    except Exception:
+                        logging.exception("worker record handling failed")
+            elif msg[0] == 'done':
+                self._finish(job, msg[2])
+
+    async def crawl_urls(self, keyword: str, urls: List[str], on_record, paused_event: Optional[asyncio.Event] = None,
+                         session=None, slots: Optional[asyncio.Semaphore] = None,
+                         share: Optional[Callable[[], int]] = None, progress: Optional[Dict] = None):
+        # 与 Crawler.crawl_urls 同签名；连接池与并发名额由各子进程自行管理（share 按分片平分后下发），暂停通过 set_paused 同步
+        shards: Dict[int, List[str]] = {}
+        for u in urls:
+            shards.setdefault(shard_of(self.domain_of(u), self.workers), []).append(u)
+        if not shards:
+            return
+        job_id = next(self._ids)
+        job = {
+            'on_record': on_record,
+            'waiting': set(shards),
+            'keyword': keyword,
+            'shards': shards,
+            'attempts': {},
+            'share': share,
+            'sent_share': 0,
+            'pages': {},
+            'progress': progress,
+            'done': asyncio.get_running_loop().create_future(),
+        }
+        job['sent_share'] = self._job_share(job)
+        self._pending[job_id] = job
+        try:
+            for i, part in shards.items():
+                self._jobs[i].put(('crawl', job_id, keyword, part, job['sent_share']))
+            await job['done']
+        except asyncio.CancelledError:
+            # 切换关键词时取消：通知仍在抓取的子进程停止该任务
+            for i in job['waiting']:
+                self._jobs[i].put(('cancel', job_id))
+            raise
+        finally:
+            self._pending.pop(job_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'slots_per_worker': self.budget,
+            'alive': sum(1 for p in self._procs if p.is_alive()),
+            'jobs': len(self._pending),
+            'restarts': self.restarts,
+        }
+
+    async def close(self):
+        self._closing = True
+        loop = asyncio.get_running_loop()
+        for q in self._jobs:
+            q.put(('stop',))
+        for proc in self._procs:
+            await loop.run_in_executor(None, proc.join, 5)
+            if proc.is_alive():
+                proc.terminate()
+        if self._pump_task is not None:
+            try:
+                await asyncio.wait_for(self._pump_task, 10)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
@@ -0,0 +1,16 @@
+"""Offline benchmarks for the crawler.
+
+Importing this package points CRAWLER_DATA_DIR at a throwaway directory
+(unless it is already set) before any ``app`` module reads its config, so
+benchmarks never touch the real ``data/`` folder.
+
+    python -m bench all --out bench-results.json
+"""
+import os
+import tempfile
+
+DATA_DIR = os.environ.get('CRAWLER_BENCH_DIR') or tempfile.mkdtemp(prefix='crawler-bench-')
+os.environ.setdefault('CRAWLER_DATA_DIR', os.path.join(DATA_DIR, 'data'))
+os.environ.setdefault('CRAWLER_EXPORT_DIR', os.path.join(DATA_DIR, 'export'))
+os.environ.setdefault('CRAWLER_AUTO_LOOP', '0')
+os.environ.setdefault('CRAWLER_NO_BROWSER', '1')
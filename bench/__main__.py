@@ -0,0 +1,136 @@
+"""Benchmark runner with machine-readable output.
+
+    python -m bench micro --out micro.json
+    python -m bench e2e --sites 100 --latency 0.02 --out e2e.json
+    python -m bench lang
+    python -m bench coord
+    python -m bench distributed --nodes 1,2,4
+    python -m bench all --out bench-results.json --baseline last-release.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Dict, Iterator, Tuple
+
+import bench
+from bench.coord import run_coord
+from bench.distributed import run_distributed
+from bench.e2e import run_e2e
+from bench.lang import run_lang
+from bench.micro import run_micro
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ''
+
+
+def meta() -> Dict:
+    try:
+        import lxml  # noqa: F401
+        has_lxml = True
+    except ImportError:
+        has_lxml = False
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'git_rev': _git_rev(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'lxml': has_lxml,
+        'data_dir': bench.DATA_DIR,
+    }
+
+
+def _flatten(prefix: str, obj) -> Iterator[Tuple[str, float]]:
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(f"{prefix}.{k}" if prefix else k, v)
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+
+# 只比较性能指标：吞吐越大越好，耗时/延迟/内存越小越好；页数、记录数等工作量不参与比较
+_HIGHER_IS_BETTER = ('ops_per_sec', 'mb_per_sec', 'pages_per_sec', 'contacts_per_sec', 'accuracy')
+_LOWER_IS_BETTER = ('us_per_op', 'us_per_page', 'p50', 'p99', 'max', 'crawl_seconds', 'seed_seconds', 'self', 'children')
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10) -> Dict:
+    base = dict(_flatten('', baseline.get('results', {})))
+    out = {}
+    for key, value in _flatten('', current.get('results', {})):
+        name = key.rsplit('.', 1)[-1]
+        higher = name in _HIGHER_IS_BETTER
+        if not (higher or name in _LOWER_IS_BETTER) or not base.get(key):
+            continue
+        change = (value - base[key]) / base[key]
+        regressed = change < -threshold if higher else change > threshold
+        out[key] = {'baseline': base[key], 'current': value, 'change': round(change, 4), 'regressed': regressed}
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m bench', description='offline crawler benchmarks')
+    ap.add_argument('suite', choices=['micro', 'e2e', 'lang', 'coord', 'distributed', 'all'])
+    ap.add_argument('--out', help='write JSON results to this file (default: stdout only)')
+    ap.add_argument('--baseline', help='previous results JSON to compare against')
+    ap.add_argument('--threshold', type=float, default=0.10, help='relative change counted as regression')
+    ap.add_argument('--min-seconds', type=float, default=1.0, help='micro: minimum time per case')
+    ap.add_argument('--docs', type=int, default=200, help='micro/lang: corpus size')
+    ap.add_argument('--keyword', default='bench keyword')
+    ap.add_argument('--sites', type=int, default=60)
+    ap.add_argument('--pages', type=int, default=20, help='pages per site')
+    ap.add_argument('--page-kb', type=int, default=8)
+    ap.add_argument('--out-links', type=int, default=5)
+    ap.add_argument('--contact-density', type=float, default=0.2)
+    ap.add_argument('--latency', type=float, default=0.01, help='fixture latency per response (s)')
+    ap.add_argument('--jitter', type=float, default=0.0)
+    ap.add_argument('--crawl-delay', type=float, default=0.0, help='Crawl-delay advertised in robots.txt')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--nodes', default='1,2,4', type=lambda s: [int(x) for x in s.split(',') if x],
+                    help='distributed: node counts to compare')
+    ap.add_argument('--min-efficiency', type=float, default=0.7, help='distributed: minimum scaling efficiency')
+    args = ap.parse_args(argv)
+
+    report = {'meta': meta(), 'results': {}}
+    if args.suite in ('micro', 'all'):
+        report['results']['micro'] = run_micro(docs=args.docs, page_kb=args.page_kb, min_seconds=args.min_seconds)
+    if args.suite in ('lang', 'all'):
+        report['results']['lang'] = run_lang(docs=args.docs)
+    if args.suite in ('coord', 'all'):
+        report['results']['coord'] = asyncio.run(run_coord())
+    if args.suite in ('distributed', 'all'):
+        report['results']['distributed'] = asyncio.run(run_distributed(nodes=args.nodes,
+                                                                        min_efficiency=args.min_efficiency))
+    if args.suite in ('e2e', 'all'):
+        report['results']['e2e'] = asyncio.run(run_e2e(
+            keyword=args.keyword, sites=args.sites, pages=args.pages, page_kb=args.page_kb,
+            out_links=args.out_links, contact_density=args.contact_density, latency=args.latency,
+            jitter=args.jitter, crawl_delay=args.crawl_delay, seed=args.seed))
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as fp:
+            report['comparison'] = compare(report, json.load(fp), args.threshold)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fp:
+            fp.write(text + '\n')
+    print(text)
+    if report.get('comparison') and any(c['regressed'] for c in report['comparison'].values()):
+        sys.exit(1)
+    # 协议检查、扩展性检查失败同样以退出码 1 报告
+    if not all(report['results'].get(suite, {}).get('ok', True) for suite in ('coord', 'distributed')):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Coordinator protocol check: one lease/report round trip over HTTP.
+
+Starts the control app in coordinator mode in this process, plays a single
+node by hand (lease -> report records -> done) and checks that the lease
+covers the seeds, the records are stored and the round finishes. Malformed
+node requests must get a 400 rather than a 500, and requests without the
+coordinator token a 403.
+
+    python -m bench coord
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict
+
+import aiohttp
+from aiohttp import web
+
+import bench  # noqa: F401  (sets CRAWLER_DATA_DIR before app.config is read)
+from app import config
+from app.manager import CrawlManager, create_app
+
+SEEDS = [f'http://site{i}.coord-check.example/' for i in range(3)]
+TOKEN = 'coord-check'
+
+
+def _records(keyword: str, count: int) -> list:
+    run = uuid.uuid4().hex[:8]
+    return [{
+        'keyword': keyword, 'lang': 'en', 'contact_type': 'email',
+        'contact_value': f'user{i}.{run}@site0.coord-check.example', 'source_url': SEEDS[0],
+        'page_title': 'coord check', 'site_domain': 'coord-check.example',
+    } for i in range(count)]
+
+
+async def _wait_state(mgr: CrawlManager, keyword: str, states, timeout: float) -> Dict:
+    deadline = time.monotonic() + timeout
+    prog: Dict = {}
+    while time.monotonic() < deadline:
+        prog = mgr.progress.get(keyword) or {}
+        if prog.get('state') in states:
+            break
+        await asyncio.sleep(0.05)
+    return prog
+
+
+async def run_coord(records: int = 20, timeout: float = 10.0) -> Dict:
+    config.COORD_TOKEN = TOKEN
+    mgr = CrawlManager(coordinator=True)
+    mgr.board.domains_per_lease = len(SEEDS)
+
+    async def fake_seeds(_kw):
+        return list(SEEDS)
+
+    mgr._seeds = fake_seeds
+    app = await create_app(mgr)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f'http://127.0.0.1:{port}'
+    mgr.init_async()
+    sched = asyncio.ensure_future(mgr.scheduler())
+    keyword = 'coord check'
+    checks: Dict[str, bool] = {}
+    started = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession(headers={'X-Crawler-Token': TOKEN}) as session:
+            async def post(path: str, **kwargs):
+                async with session.post(base + path, **kwargs) as resp:
+                    try:
+                        body = await resp.json()
+                    except (aiohttp.ContentTypeError, ValueError):
+                        body = None
+                    return resp.status, body
+
+            await mgr.add_keyword(keyword)
+            await _wait_state(mgr, keyword, ('crawling',), timeout)
+            leases = []
+            deadline = time.monotonic() + timeout
+            while not leases and time.monotonic() < deadline:
+                status, body = await post('/coord/lease', json={'node': 'check-node', 'count': 1})
+                leases = (body or {}).get('leases') or []
+                if not leases:
+                    await asyncio.sleep(0.05)
+            checks['lease_granted'] = len(leases) == 1
+            lease = leases[0] if leases else {}
+            checks['lease_covers_seeds'] = sorted(lease.get('urls') or []) == sorted(SEEDS)
+            checks['lease_keyword'] = lease.get('keyword') == keyword
+
+            status, body = await post('/coord/report', json={
+                'node': 'check-node', 'lease_id': lease.get('lease_id', ''), 'records': _records(keyword, records),
+                'pages': len(SEEDS), 'done': True})
+            checks['report_ok'] = status == 200 and bool(body and body.get('ok')) and not body.get('cancel')
+            prog = await _wait_state(mgr, keyword, ('done', 'failed'), timeout)
+            checks['round_done'] = prog.get('state') == 'done'
+            checks['progress_counts'] = prog.get('pages') == len(SEEDS) and prog.get('records') == records
+            await mgr.store.aflush()
+            checks['records_stored'] = mgr.store.inserted_total == records
+            round_trip = time.perf_counter() - started
+
+            # node 发来的坏请求应得到 400，而不是 500
+            status, _ = await post('/coord/lease', data=b'not json', headers={'Content-Type': 'application/json'})
+            checks['bad_json_400'] = status == 400
+            status, _ = await post('/coord/lease', json={'count': 'many'})
+            checks['bad_count_400'] = status == 400
+            status, _ = await post('/coord/report', json={'lease_id': 'x', 'pages': 'lots'})
+            checks['bad_pages_400'] = status == 400
+            bad = _records(keyword, 2)
+            bad[1]['lang'] = 5
+            status, _ = await post('/coord/report', json={'lease_id': 'x', 'records': bad})
+            checks['bad_record_field_400'] = status == 400
+            bad[1]['lang'] = {'zh': True}
+            status, _ = await post('/coord/report', json={'lease_id': 'x', 'records': bad})
+            checks['nested_record_field_400'] = status == 400
+            status, _ = await post('/coord/lease', json={'count': 1}, headers={'X-Crawler-Token': 'wrong'})
+            checks['bad_token_403'] = status == 403
+    finally:
+        sched.cancel()
+        await mgr.close()
+        await runner.cleanup()
+    return {
+        'ok': all(checks.values()),
+        'checks': checks,
+        'records': records,
+        'round_trip_ms': round(round_trip * 1000, 1),
+    }
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(asyncio.run(run_coord()), ensure_ascii=False, indent=2))
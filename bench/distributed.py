@@ -0,0 +1,161 @@
+"""Localhost scaling check for coordinator + node mode.
+
+Starts fake sites on 127.0.0.N, a coordinator (control app with LeaseBoard)
+in this process and K node subprocesses, then measures pages/s for each K.
+Scaling efficiency is pages/s relative to K times the single-node rate; the
+check fails when any K > 1 is below ``min_efficiency`` or a round does not
+finish.
+
+    python -m bench.distributed --nodes 1,2,4
+    python -m bench distributed
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Sequence
+
+from aiohttp import web
+
+from app import config
+from app.manager import CrawlManager, create_app
+from bench import DATA_DIR as _DATA
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATE = {'trial': 0}
+TOKEN = 'bench-distributed'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def start_sites(count: int, pages: int, latency: float, port: int) -> web.AppRunner:
+    async def handle(request):
+        if request.path == '/robots.txt':
+            return web.Response(status=404)
+        await asyncio.sleep(latency)
+        site = request.host.split(':')[0].rsplit('.', 1)[-1]
+        links = ''.join(f'<a href="/p{i}">page {i}</a>' for i in range(1, pages)) if request.path == '/' else ''
+        page = request.path.strip('/') or 'index'
+        body = (f"<html><head><title>site {site}</title></head><body>"
+                f"<p>mail: {page}.t{STATE['trial']}@site{site}.example.com</p>{links}</body></html>")
+        return web.Response(text=body, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    for i in range(count):
+        await web.TCPSite(runner, f'127.0.0.{i + 2}', port).start()
+    return runner
+
+
+async def run_trial(nodes: int, site_port: int, sites: int, concurrency: int, domains_per_lease: int,
+                    timeout: float) -> dict:
+    STATE['trial'] += 1
+    config.COORD_TOKEN = TOKEN
+    mgr = CrawlManager(coordinator=True)
+    mgr.board.domains_per_lease = domains_per_lease
+    seeds = [f'http://127.0.0.{i + 2}:{site_port}/' for i in range(sites)]
+
+    async def fake_seeds(_kw):
+        return seeds
+
+    mgr._seeds = fake_seeds
+    app = await create_app(mgr)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    mgr.init_async()
+    sched = asyncio.ensure_future(mgr.scheduler())
+    procs = []
+    for i in range(nodes):
+        env = dict(os.environ, CRAWLER_DATA_DIR=os.path.join(_DATA, f"t{STATE['trial']}-node{i}"),
+                   CRAWLER_PARSE_WORKERS='0', CRAWLER_COORD_TOKEN=TOKEN)
+        procs.append(subprocess.Popen(
+            [sys.executable, '-m', 'app.cli', 'node', '--coordinator', f'http://127.0.0.1:{port}',
+             '--concurrency', str(concurrency)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    keyword = f"bench-{STATE['trial']}"
+    started = time.monotonic()
+    await mgr.add_keyword(keyword)
+    prog = {}
+    try:
+        while time.monotonic() - started < timeout:
+            await asyncio.sleep(0.2)
+            prog = mgr.progress.get(keyword) or {}
+            if prog.get('state') in ('done', 'failed'):
+                break
+        elapsed = time.monotonic() - started
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+        sched.cancel()
+        await mgr.close()
+        await runner.cleanup()
+    pages = prog.get('pages', 0)
+    return {
+        'nodes': nodes,
+        'state': prog.get('state'),
+        'pages': pages,
+        'records': prog.get('records', 0),
+        'seconds': round(elapsed, 2),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def run_distributed(nodes: Sequence[int] = (1, 2, 4), sites: int = 48, pages: int = 10, latency: float = 0.2,
+                          concurrency: int = 4, domains_per_lease: int = 2, timeout: float = 300,
+                          min_efficiency: float = 0.7) -> Dict:
+    site_port = _free_port()
+    runner = await start_sites(sites, pages, latency, site_port)
+    results = []
+    try:
+        for n in nodes:
+            results.append(await run_trial(n, site_port, sites, concurrency, domains_per_lease, timeout))
+            print(json.dumps(results[-1], ensure_ascii=False), file=sys.stderr, flush=True)
+    finally:
+        await runner.cleanup()
+    base = results[0]['pages_per_sec'] / results[0]['nodes'] if results and results[0]['pages_per_sec'] else 0
+    for r in results:
+        r['efficiency'] = round(r['pages_per_sec'] / (base * r['nodes']), 2) if base else 0.0
+    ok = bool(results) and all(r['state'] == 'done' for r in results) and \
+        all(r['efficiency'] >= min_efficiency for r in results if r['nodes'] > 1)
+    return {'ok': ok, 'min_efficiency': min_efficiency, 'scaling': results}
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description='coordinator/node scaling benchmark')
+    ap.add_argument('--nodes', default='1,2,4', type=lambda s: [int(x) for x in s.split(',') if x])
+    ap.add_argument('--sites', type=int, default=48)
+    ap.add_argument('--pages', type=int, default=10, help='pages per site')
+    ap.add_argument('--latency', type=float, default=0.2, help='fake server latency per page (s)')
+    ap.add_argument('--concurrency', type=int, default=4, help='per-node concurrency')
+    ap.add_argument('--domains-per-lease', type=int, default=2)
+    ap.add_argument('--timeout', type=float, default=300)
+    ap.add_argument('--min-efficiency', type=float, default=0.7, help='fail below this scaling efficiency')
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run_distributed(args.nodes, args.sites, args.pages, args.latency, args.concurrency,
+                                         args.domains_per_lease, args.timeout, args.min_efficiency))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not report['ok']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""End-to-end benchmark: seeds from fake engines, crawl the fixture web, store.
+
+Reports pages/s, contacts/s, p50/p99 page latency and peak RSS.
+
+    python -m bench e2e --sites 100 --pages 20 --latency 0.02
+"""
+import asyncio
+import sys
+import time
+from typing import Dict, List, Optional
+
+import bench  # noqa: F401  (sets CRAWLER_DATA_DIR before app.config is read)
+from app.crawler import Crawler
+from app.dedup import DedupIndex
+from app.searchers import RedirectResolver, SerpCache, gather_seeds
+from app.storage import StorageWriter, get_conn
+from bench.fixture import FixtureWeb, point_engines
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class TimedCrawler(Crawler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+
+    async def _crawl_one(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super()._crawl_one(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    if resource is None:
+        return {'self': None, 'children': None}
+    # Linux 单位为 KB，macOS 为字节
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+async def run_e2e(keyword: str = 'bench keyword', **fixture_kwargs) -> Dict:
+    fixture = FixtureWeb(**fixture_kwargs)
+    await fixture.start()
+    conn = get_conn()
+    crawler = TimedCrawler(conn=conn)
+    dedup = DedupIndex()
+    store = StorageWriter(on_failed=dedup.forget)
+    records = 0
+
+    async def on_record(rec: dict):
+        nonlocal records
+        records += 1
+        if not dedup.seen(rec):
+            await store.submit(rec)
+
+    try:
+        with point_engines(fixture):
+            async with fixture.session() as session:
+                started = time.perf_counter()
+                seeds = await gather_seeds(keyword, session=session, cache=SerpCache(conn),
+                                           resolver=RedirectResolver(conn))
+                seeded = time.perf_counter()
+                progress: Dict = {}
+                await crawler.crawl_urls(keyword, seeds, on_record, session=session, progress=progress)
+                await asyncio.get_running_loop().run_in_executor(None, store.flush)
+                finished = time.perf_counter()
+    finally:
+        crawler.close()
+        store.close()
+        conn.close()
+        await fixture.stop()
+    crawl_secs = finished - seeded
+    pages = progress.get('pages', 0)
+    lat = crawler.latencies
+    return {
+        'fixture': fixture.params(),
+        'seeds': len(seeds),
+        'seed_seconds': round(seeded - started, 3),
+        'pages': pages,
+        'bytes': crawler.bytes_read,
+        'records': records,
+        'contacts_inserted': store.inserted_total,
+        'crawl_seconds': round(crawl_secs, 3),
+        'pages_per_sec': round(pages / crawl_secs, 2) if crawl_secs else 0.0,
+        'contacts_per_sec': round(store.inserted_total / crawl_secs, 2) if crawl_secs else 0.0,
+        'page_latency_ms': {
+            'p50': round(percentile(lat, 50) * 1000, 2) if lat else None,
+            'p99': round(percentile(lat, 99) * 1000, 2) if lat else None,
+            'max': round(max(lat) * 1000, 2) if lat else None,
+        },
+        'fixture_requests': fixture.requests,
+        'peak_rss_mb': peak_rss_mb(),
+    }
@@ -0,0 +1,283 @@
+"""Local fixture web: synthetic sites plus stand-ins for the four search engines.
+
+Everything is served by one aiohttp app on 127.0.0.1 and routed by Host
+header. ``FixtureResolver`` maps the fixture hostnames to that address and
+refuses everything else, so a benchmark cannot reach the real network.
+``point_engines`` swaps the URL builders in ``searchers.ENGINES`` so the
+unchanged result parsers (and Baidu/Sogou redirect resolution) run against
+the fixture.
+"""
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import socket
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import aiohttp.abc
+from aiohttp import web
+
+from app import searchers
+from app.utils import create_session
+
+ENGINE_HOSTS = {
+    'duckduckgo': 'duckduckgo.com',
+    'mojeek': 'www.mojeek.com',
+    'baidu': 'www.baidu.com',
+    'sogou': 'www.sogou.com',
+}
+
+WORDS = (
+    "service product company solution quality customer support industry market team project design "
+    "network system data cloud security platform partner global local office business development "
+    "服务 产品 公司 方案 质量 客户 支持 行业 市场 团队 项目 设计 网络 系统 数据 平台 合作 发展"
+).split()
+
+
+def site_host(i: int) -> str:
+    return f"bench-site{i:04d}.com"
+
+
+def render_page(site: int, page: int, pages: int = 20, page_kb: int = 8, out_links: int = 5,
+                contact_density: float = 0.2, seed: int = 1) -> str:
+    # 纯函数：同样的参数总生成同样的页面，微基准也可直接复用
+    rng = random.Random(seed * 1_000_003 + site * 10_007 + page)
+    host = site_host(site)
+    parts = [f"<html><head><title>{host} page {page}</title></head><body>"]
+    parts.append('<nav><a href="/">home</a> <a href="/contact">contact us 联系我们</a></nav>')
+    size = 0
+    target = page_kb * 1024
+    while size < target:
+        para = " ".join(rng.choice(WORDS) for _ in range(40))
+        parts.append(f"<p>{para}</p>")
+        size += len(para) + 7
+    if page == 0 or page == pages or rng.random() < contact_density:
+        parts.append(f'<div class="contact">Email: info{page}@{host} '
+                     f'电话: +86 138{rng.randrange(10 ** 8):08d} '
+                     f'<a href="mailto:sales{page}@{host}">sales</a></div>')
+    for _ in range(out_links):
+        parts.append(f'<a href="/p{rng.randrange(1, max(2, pages))}">more {rng.choice(WORDS)}</a>')
+    if rng.random() < 0.2:
+        parts.append(f'<a href="/private/p{page}">internal</a>')
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+class FixtureResolver(aiohttp.abc.AbstractResolver):
+    def __init__(self, hostmap: Dict[str, str]):
+        self.hostmap = hostmap
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict]:
+        ip = self.hostmap.get(host.lower())
+        if ip is None:
+            raise OSError(f"fixture resolver: {host} is not part of the fixture web")
+        return [{'hostname': host, 'host': ip, 'port': port, 'family': socket.AF_INET,
+                 'proto': 0, 'flags': socket.AI_NUMERICHOST}]
+
+    async def close(self):
+        pass
+
+
+class FixtureWeb:
+    def __init__(self, sites: int = 50, pages: int = 20, page_kb: int = 8, out_links: int = 5,
+                 contact_density: float = 0.2, latency: float = 0.0, jitter: float = 0.0,
+                 crawl_delay: float = 0.0, results_per_page: int = 10, seed: int = 1,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.sites = sites
+        self.pages = pages
+        self.page_kb = page_kb
+        self.out_links = out_links
+        self.contact_density = contact_density
+        self.latency = latency
+        self.jitter = jitter
+        self.crawl_delay = crawl_delay
+        self.results_per_page = results_per_page
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._site_index = {site_host(i): i for i in range(sites)}
+
+    def params(self) -> Dict:
+        return {k: getattr(self, k) for k in ('sites', 'pages', 'page_kb', 'out_links', 'contact_density',
+                                               'latency', 'jitter', 'crawl_delay', 'results_per_page', 'seed')}
+
+    @property
+    def hostmap(self) -> Dict[str, str]:
+        hosts = dict.fromkeys(self._site_index, self.host)
+        hosts.update(dict.fromkeys(ENGINE_HOSTS.values(), self.host))
+        return hosts
+
+    def url(self, host: str, path: str = '/') -> str:
+        return f"http://{host}:{self.port}{path}"
+
+    def seeds(self) -> List[str]:
+        return [self.url(site_host(i)) for i in range(self.sites)]
+
+    def session(self) -> aiohttp.ClientSession:
+        return create_session(resolver=FixtureResolver(self.hostmap))
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        host = request.host.rsplit(':', 1)[0].lower()
+        if host in self._site_index:
+            return await self._site(request, self._site_index[host])
+        for engine, engine_host in ENGINE_HOSTS.items():
+            if host == engine_host:
+                return await self._engine(request, engine)
+        return web.Response(status=404)
+
+    async def _site(self, request: web.Request, site: int) -> web.StreamResponse:
+        path = request.path
+        if path == '/robots.txt':
+            rules = "User-agent: *\nDisallow: /private/\n"
+            if self.crawl_delay:
+                rules += f"Crawl-delay: {self.crawl_delay}\n"
+            return web.Response(text=rules, content_type='text/plain')
+        await self._delay()
+        if path == '/':
+            page = 0
+        elif path == '/contact':
+            page = self.pages
+        elif path.startswith('/p') and path[2:].isdigit() and int(path[2:]) < self.pages:
+            page = int(path[2:])
+        else:
+            return web.Response(status=404)
+        html = render_page(site, page, self.pages, self.page_kb, self.out_links, self.contact_density, self.seed)
+        return web.Response(text=html, content_type='text/html', charset='utf-8',
+                            headers={'ETag': f'"{site}-{page}-{self.seed}"'})
+
+    def _results(self, engine: str, keyword: str, page: int) -> List[int]:
+        digest = hashlib.blake2b(f"{engine}\x1f{keyword}".encode('utf-8'), digest_size=8).digest()
+        rng = random.Random(int.from_bytes(digest, 'little'))
+        order = list(range(self.sites))
+        rng.shuffle(order)
+        start = (page - 1) * self.results_per_page
+        return order[start:start + self.results_per_page]
+
+    async def _engine(self, request: web.Request, engine: str) -> web.StreamResponse:
+        await self._delay()
+        q = request.query
+        engine_url = self.url(ENGINE_HOSTS[engine])
+        if request.path == '/link':
+            target = q.get('url', '')
+            if engine == 'baidu':
+                raise web.HTTPFound(target)
+            # 搜狗式：200 + meta refresh
+            return web.Response(text=f'<html><head><meta http-equiv="refresh" content="0;URL=\'{target}\'">'
+                                     f'</head></html>', content_type='text/html')
+        keyword = q.get('q') or q.get('wd') or q.get('query') or ''
+        if engine == 'duckduckgo':
+            page = int(q.get('s', '0') or 0) // 30 + 1
+        elif engine == 'sogou':
+            page = int(q.get('page', '1') or 1)
+        else:
+            page = int(q.get('s', q.get('pn', '0')) or 0) // 10 + 1
+        items = []
+        for i in self._results(engine, keyword, page):
+            target = self.url(site_host(i))
+            if engine in ('baidu', 'sogou'):
+                href = f"{engine_url}/link?url={urllib.parse.quote(target, safe='')}"
+                items.append(f'<div class="result"><h3><a href="{href}">{site_host(i)}</a></h3></div>')
+            else:
+                items.append(f'<div class="result"><a class="result__a" href="{target}">{site_host(i)}</a></div>')
+        nav = f'<a href="{engine_url}/next">next</a>'
+        return web.Response(text=f"<html><body>{''.join(items)}{nav}</body></html>", content_type='text/html')
+
+
+class ReplayWeb(FixtureWeb):
+    # 回放录制的页面：语料为 JSON 行 {"url": ..., "html": ...}；协议统一改为 http，按 (主机, 路径+查询) 命中
+    def __init__(self, pages: Dict[Tuple[str, str], str], latency: float = 0.0, host: str = '127.0.0.1',
+                 port: int = 0):
+        super().__init__(sites=0, latency=latency, host=host, port=port)
+        self.recorded = pages
+        self._hosts = {h for h, _ in pages}
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> 'ReplayWeb':
+        pages: Dict[Tuple[str, str], str] = {}
+        with open(path, encoding='utf-8') as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                parts = urllib.parse.urlsplit(rec['url'])
+                path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+                pages[((parts.hostname or '').lower(), path)] = rec.get('html') or ''
+        return cls(pages, **kwargs)
+
+    def params(self) -> Dict:
+        return {'recorded_pages': len(self.recorded), 'hosts': len(self._hosts), 'latency': self.latency}
+
+    @property
+    def hostmap(self) -> Dict[str, str]:
+        return dict.fromkeys(self._hosts, self.host)
+
+    def seeds(self) -> List[str]:
+        return [self.url(h, p) for h, p in self.recorded]
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        host = request.host.rsplit(':', 1)[0].lower()
+        if request.path == '/robots.txt':
+            return web.Response(status=404)
+        await self._delay()
+        html = self.recorded.get((host, request.path_qs))
+        if html is None:
+            return web.Response(status=404)
+        return web.Response(text=html, content_type='text/html', charset='utf-8')
+
+
+def engine_builders(fixture: FixtureWeb) -> Dict:
+    def ddg(q: str, page: int) -> str:
+        return fixture.url(ENGINE_HOSTS['duckduckgo'], f"/html/?q={q}&s={(page - 1) * 30}")
+
+    def mojeek(q: str, page: int) -> str:
+        return fixture.url(ENGINE_HOSTS['mojeek'], f"/search?q={q}&s={(page - 1) * 10}")
+
+    def baidu(q: str, page: int) -> str:
+        return fixture.url(ENGINE_HOSTS['baidu'], f"/s?wd={q}&pn={(page - 1) * 10}")
+
+    def sogou(q: str, page: int) -> str:
+        return fixture.url(ENGINE_HOSTS['sogou'], f"/web?query={q}&page={page}")
+
+    return {'duckduckgo': ddg, 'mojeek': mojeek, 'baidu': baidu, 'sogou': sogou}
+
+
+@contextlib.contextmanager
+def point_engines(fixture: FixtureWeb):
+    # 只替换结果页 URL 构造，结果解析与跳转解析仍走 searchers 里的原实现
+    saved = dict(searchers.ENGINES)
+    builders = engine_builders(fixture)
+    try:
+        for engine, (_, parse_links) in saved.items():
+            if engine in builders:
+                searchers.ENGINES[engine] = (builders[engine], parse_links)
+        yield fixture
+    finally:
+        searchers.ENGINES.clear()
+        searchers.ENGINES.update(saved)
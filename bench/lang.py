@@ -0,0 +1,93 @@
+"""Language routing benchmark: old raw-HTML regex vs the text classifier.
+
+Builds a labelled corpus of zh/en pages, including the cases the old rule
+got wrong (English pages with a CJK footer or CJK strings inside scripts),
+and reports accuracy per case plus time per page for each method.
+
+    python -m bench lang --docs 400
+"""
+import random
+import re
+import time
+from typing import Callable, Dict, List, Tuple
+
+import bench  # noqa: F401  (sets CRAWLER_DATA_DIR before app.config is read)
+from app.lang import classify_text
+from app.parser import parse_html
+
+ZH_WORDS = ("我们 公司 专业 生产 销售 服务 产品 质量 客户 欢迎 来电 咨询 合作 技术 研发 设备 工厂 "
+            "市场 价格 优惠 售后 保障 团队 经验 行业 领先 品牌 地址 电话 邮箱 联系").split()
+EN_WORDS = ("we are a professional manufacturer of quality products and services for customers worldwide "
+            "contact our team today for pricing support delivery warranty factory equipment design").split()
+BRANDS = "iPhone Android Bluetooth USB-C HDMI LED OEM ODM ISO9001 CE RoHS".split()
+
+
+def _zh(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(ZH_WORDS) for _ in range(n)) + "。"
+
+
+def _en(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(EN_WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _page(title: str, body: List[str], head: str = "", footer: str = "") -> str:
+    paras = "".join(f"<p>{p}</p>" for p in body)
+    return (f"<html><head><title>{title}</title>{head}</head><body><nav><a href='/'>Home</a></nav>"
+            f"{paras}<footer>{footer}</footer></body></html>")
+
+
+# 每种情况：(标签, 生成函数)；最后两种英文页是旧规则（原始 HTML 里有汉字即判中文）会判错的典型
+CASES: Dict[str, Tuple[str, Callable[[random.Random], str]]] = {
+    'zh_plain': ('zh', lambda r: _page(_zh(r, 4), [_zh(r, 40) for _ in range(8)])),
+    'zh_mixed': ('zh', lambda r: _page(_zh(r, 4), [_zh(r, 25) + " " + " ".join(r.sample(BRANDS, 4)) + " "
+                                                   + _en(r, 6) for _ in range(8)])),
+    'zh_short': ('zh', lambda r: _page("联系我们", ["电话：0755-12345678 邮箱：info@example.cn", _zh(r, 3)])),
+    'en_plain': ('en', lambda r: _page(_en(r, 5), [_en(r, 60) for _ in range(8)])),
+    'en_short': ('en', lambda r: _page("Contact", ["Tel: +1 555 0100 Email: info@example.com"])),
+    'en_cjk_footer': ('en', lambda r: _page(_en(r, 5), [_en(r, 60) for _ in range(6)],
+                                            footer="<a href='/zh'>简体中文</a> | <a href='/ja'>日本語</a>")),
+    'en_cjk_script': ('en', lambda r: _page(_en(r, 5), [_en(r, 60) for _ in range(6)],
+                                            head="<script>var i18n={zh:{buy:'立即购买',cart:'购物车'}};</script>")),
+}
+
+_OLD_RE = re.compile(r"[\u4e00-\u9fff]")  # 旧规则：原始 HTML 里出现汉字即判中文
+
+
+def corpus(docs: int = 400, seed: int = 11) -> List[Tuple[str, str, str]]:
+    rng = random.Random(seed)
+    names = list(CASES)
+    out = []
+    for i in range(docs):
+        name = names[i % len(names)]
+        label, make = CASES[name]
+        out.append((name, label, make(rng)))
+    return out
+
+
+def _score(items: List[Tuple[str, str, object]], predict: Callable[[object], str], rounds: int) -> Dict:
+    per_case: Dict[str, List[int]] = {}
+    started = time.perf_counter()
+    for _ in range(rounds):
+        preds = [predict(x) for _, _, x in items]
+    elapsed = time.perf_counter() - started
+    for (name, label, _), pred in zip(items, preds):
+        hit = per_case.setdefault(name, [0, 0])
+        hit[0] += pred == label
+        hit[1] += 1
+    correct = sum(h[0] for h in per_case.values())
+    return {
+        'accuracy': round(correct / len(items), 4),
+        'us_per_page': round(elapsed / (rounds * len(items)) * 1e6, 2),
+        'cases': {name: round(h[0] / h[1], 3) for name, h in per_case.items()},
+    }
+
+
+def run_lang(docs: int = 400, rounds: int = 20) -> Dict:
+    pages = corpus(docs)
+    # 新方法在解析阶段已拿到可见文本，只计分类本身的耗时
+    texts = [(name, label, parse_html(html)[1]) for name, label, html in pages]
+    return {
+        'docs': len(pages),
+        'html_regex': _score(pages, lambda html: 'zh' if _OLD_RE.search(html) else 'en', rounds),
+        'text_classifier': _score(texts, lambda text: classify_text(text)[0], rounds),
+    }
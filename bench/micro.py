@@ -0,0 +1,122 @@
+"""Microbenchmarks for the hot per-page functions.
+
+Each case reports ops/s and microseconds per op over a synthetic corpus
+built with ``fixture.render_page`` (no server needed).
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import bench  # noqa: F401  (sets CRAWLER_DATA_DIR before app.config is read)
+from app.crawler import Crawler
+from app.domains import registered_domain
+from app.extractors import extract_all
+from app.parser import parse_html
+from app.storage import SCHEMA, migrate, save_contact, save_contacts
+from bench.fixture import render_page
+
+
+def _measure(fn: Callable[[], int], min_seconds: float) -> Dict:
+    # fn 跑完一轮语料并返回处理的条目数；至少重复到 min_seconds
+    fn()  # 预热（lru_cache、正则编译等）
+    ops = 0
+    rounds = 0
+    started = time.perf_counter()
+    while True:
+        ops += fn()
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+    return {
+        'ops': ops,
+        'rounds': rounds,
+        'seconds': round(elapsed, 3),
+        'ops_per_sec': round(ops / elapsed, 1),
+        'us_per_op': round(elapsed / ops * 1e6, 2),
+    }
+
+
+def corpus(docs: int = 200, page_kb: int = 8, contact_density: float = 0.5, seed: int = 7) -> List[str]:
+    return [render_page(i % 50, i, pages=docs, page_kb=page_kb, contact_density=contact_density, seed=seed)
+            for i in range(docs)]
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.executescript(SCHEMA)
+    migrate(conn)  # 与线上库相同的二级索引与标题全文索引，插入开销才有可比性
+    return conn
+
+
+def run_micro(docs: int = 200, page_kb: int = 8, min_seconds: float = 1.0, records: int = 2000) -> Dict:
+    pages = corpus(docs, page_kb)
+    texts = [parse_html(html)[1] for html in pages]
+    crawler = Crawler()
+    results: Dict[str, Dict] = {}
+
+    def bench_extract():
+        for text in texts:
+            extract_all(text)
+        return len(texts)
+
+    def bench_parse_contacts():
+        for html in pages:
+            crawler.parse_contacts(html)
+        return len(pages)
+
+    results['extract_all'] = _measure(bench_extract, min_seconds)
+    text_bytes = sum(len(t) for t in texts)
+    ex = results['extract_all']
+    ex['mb_per_sec'] = round(text_bytes * ex['rounds'] / ex['seconds'] / 1e6, 2)
+    results['parse_contacts'] = _measure(bench_parse_contacts, min_seconds)
+
+    # 每个页面的每条链接都要取注册域名做同站判断
+    links = [link for i, html in enumerate(pages)
+             for link, _ in parse_html(html, f"http://bench-site{i % 50:04d}.com/")[2]]
+
+    def bench_registered_domain():
+        for link in links:
+            registered_domain(link)
+        return len(links)
+
+    results['registered_domain'] = _measure(bench_registered_domain, min_seconds)
+
+    tmp = tempfile.mkdtemp(prefix='crawler-micro-')
+    state = {'n': 0}
+
+    def _recs(count: int) -> List[Dict]:
+        base = state['n']
+        state['n'] += count
+        return [{
+            'keyword': 'bench', 'lang': 'en', 'contact_type': 'email',
+            'contact_value': f'user{base + i}@bench-site{i % 50:04d}.com', 'source_url': 'http://bench/',
+            'page_title': 'bench', 'site_domain': f'bench-site{i % 50:04d}.com',
+        } for i in range(count)]
+
+    conn = _open_db(os.path.join(tmp, 'single.sqlite'))
+
+    def bench_save_contact():
+        for rec in _recs(records // 10):
+            save_contact(conn, rec)
+        return records // 10
+
+    results['save_contact'] = _measure(bench_save_contact, min_seconds)
+    conn.close()
+
+    conn = _open_db(os.path.join(tmp, 'batch.sqlite'))
+
+    def bench_save_contacts():
+        batch = _recs(records)
+        save_contacts(conn, batch)
+        return len(batch)
+
+    results['save_contacts_batch'] = _measure(bench_save_contacts, min_seconds)
+    conn.close()
+    crawler.close()
+    results['corpus'] = {'docs': docs, 'page_kb': page_kb, 'text_bytes': text_bytes}
+    return results
@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 
@@ -10,6 +11,8 @@ except Exception:
 from app.server import run_server
 
 if __name__ == '__main__':
+    # 解析进程池在打包后的 exe 中需要 freeze_support
+    multiprocessing.freeze_support()
     run_server()
 
 